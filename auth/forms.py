@@ -1,5 +1,5 @@
 import streamlit as st
-from utils.supabase_client import supabase
+from utils.supabase_client import get_supabase
 
 def registration_form():
     st.subheader("Register")
@@ -10,7 +10,7 @@ def registration_form():
     if st.button("Register"):
         if password == confirm_password:
             try:
-                res = supabase.auth.sign_up({"email": email, "password": password})
+                res = get_supabase().auth.sign_up({"email": email, "password": password})
                 st.success("Registration successful! Please check your email to verify your account.")
             except Exception as e:
                 st.error(f"Registration failed: {str(e)}")
@@ -24,7 +24,7 @@ def login_form():
     
     if st.button("Login"):
         try:
-            res = supabase.auth.sign_in_with_password({"email": email, "password": password})
+            res = get_supabase().auth.sign_in_with_password({"email": email, "password": password})
             st.session_state.user = res.user
             st.success("Login successful!")
             st.rerun()
@@ -37,7 +37,7 @@ def password_reset_form():
     
     if st.button("Send Reset Link"):
         try:
-            res = supabase.auth.reset_password_email(email)
+            res = get_supabase().auth.reset_password_email(email)
             st.success("Password reset link sent to your email!")
         except Exception as e:
             st.error(f"Failed to send reset link: {str(e)}")
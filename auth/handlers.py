@@ -1,12 +1,12 @@
 import streamlit as st
-from utils.supabase_client import supabase
+from utils.supabase_client import get_supabase
 
 def handle_confirmation():
     token = st.query_params.get("confirmation_token")
     
     if token:
         try:
-            res = supabase.auth.verify_otp({"token": token[0], "type": "signup"})
+            res = get_supabase().auth.verify_otp({"token": token[0], "type": "signup"})
             st.success("Email confirmed successfully! You can now log in.")
         except Exception as e:
             st.error(f"Confirmation failed: {str(e)}")
@@ -14,7 +14,7 @@ def handle_confirmation():
         st.warning("No confirmation token found in the URL.")
 
 def logout():
-    supabase.auth.sign_out()
+    get_supabase().auth.sign_out()
     st.session_state.clear()
     st.session_state.logged_out = True
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,155 @@
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Signs in many browser sessions concurrently against a local stub of the Supabase auth
+# and REST APIs, once with a client per session over one shared connection pool (what
+# utils/supabase_client.py does now) and once with one client shared by every session
+# (what it used to do). Each session then reads its profile and checks it got its own;
+# tests/test_supabase_client.py asserts that per-session clients never mix users up:
+#   python -m benchmarks.auth_sessions --sessions 20 [--json]
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Every session connects at once; the default backlog of 5 would reset connections
+    request_queue_size = 256
+
+
+def make_handler(latency: float, connections: list, lock: threading.Lock):
+    class StubSupabase(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body=None):
+            payload = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _track(self):
+            with lock:
+                connections.append(self.client_address)
+            time.sleep(latency)
+
+        def _user(self, email: str) -> dict:
+            return {
+                "id": f"id-{email}",
+                "aud": "authenticated",
+                "role": "authenticated",
+                "email": email,
+                "app_metadata": {},
+                "user_metadata": {},
+                "created_at": "2024-01-01T00:00:00Z",
+            }
+
+        def do_POST(self):
+            self._track()
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            path = urlparse(self.path).path
+            if path == "/auth/v1/token":
+                email = body["email"]
+                self._reply(200, {
+                    "access_token": f"token-{email}",
+                    "refresh_token": f"refresh-{email}",
+                    "token_type": "bearer",
+                    "expires_in": 3600,
+                    "expires_at": int(time.time()) + 3600,
+                    "user": self._user(email),
+                })
+            elif path == "/auth/v1/logout":
+                self._reply(204)
+            else:
+                self._reply(404, {"message": "not found"})
+
+        def do_GET(self):
+            self._track()
+            path = urlparse(self.path).path
+            token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+            email = token.removeprefix("token-") if token.startswith("token-") else None
+            if path == "/rest/v1/profiles":
+                # Like row level security: the caller only sees the row of the token's user
+                self._reply(200, [{"user_id": f"id-{email}"}] if email else [])
+            elif path == "/auth/v1/user" and email:
+                self._reply(200, self._user(email))
+            else:
+                self._reply(401 if path == "/auth/v1/user" else 404, {"message": "unauthorized"})
+
+    return StubSupabase
+
+
+def run_mode(mode: str, url: str, sessions: int, connections: list, lock: threading.Lock) -> dict:
+    from utils.supabase_client import create_http_client, create_session_client
+
+    http_client = create_http_client()
+    shared_client = create_session_client(url, "anon-key", http_client) if mode == "shared-client" else None
+    barrier = threading.Barrier(sessions)
+    mismatches = []
+
+    def session(i: int):
+        email = f"user{i}@example.com"
+        client = shared_client or create_session_client(url, "anon-key", http_client)
+        barrier.wait()
+        client.auth.sign_in_with_password({"email": email, "password": "secret"})
+        time.sleep(0.01)
+        rows = client.table("profiles").select("*").execute().data
+        current = client.auth.get_session()
+        if rows != [{"user_id": f"id-{email}"}] or current is None or current.user.email != email:
+            mismatches.append(email)
+
+    with lock:
+        connections.clear()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    http_client.close()
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "wrong_user": len(mismatches),
+        "requests": len(connections),
+        "tcp_connections": len(set(connections)),
+        "seconds": round(elapsed, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-session Supabase clients vs one shared client")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    connections = []
+    lock = threading.Lock()
+    server = StubServer(("127.0.0.1", 0), make_handler(args.latency_ms / 1000, connections, lock))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        results = [run_mode(mode, url, args.sessions, connections, lock) for mode in ("per-session", "shared-client")]
+    finally:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(f"{result['mode']:<14} sessions={result['sessions']} wrong_user={result['wrong_user']} "
+                  f"requests={result['requests']} tcp_connections={result['tcp_connections']} seconds={result['seconds']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from typing import List
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from utils.embedding_cache import EmbeddingCache, CachedEmbedding
+from utils.local_index import build_index
+
+# Builds the local index twice against a fresh cache file and counts upstream embedding
+# calls; the warm rebuild should make none:
+#   python -m benchmarks.embedding_cache --docs 200 [--data-dir ./data] [--json]
+
+
+class CountingEmbedding(MockEmbedding):
+    calls: int = 0
+    texts: int = 0
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        return [self._get_vector() for _ in texts]
+
+
+def write_corpus(data_dir: str, docs: int):
+    for i in range(docs):
+        with open(os.path.join(data_dir, f"doc-{i}.md"), "w") as file:
+            file.write(f"# Document {i}\n\n" + " ".join(f"sentence {i}-{j} about topic {j % 7}." for j in range(200)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upstream embedding calls for a cold and a warm index build")
+    parser.add_argument("--data-dir", help="index this directory instead of a synthetic corpus")
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="embedding-cache-bench-")
+    try:
+        data_dir = args.data_dir
+        if data_dir is None:
+            data_dir = os.path.join(workdir, "data")
+            os.makedirs(data_dir)
+            write_corpus(data_dir, args.docs)
+
+        cache = EmbeddingCache(os.path.join(workdir, "embeddings.sqlite3"))
+        upstream = CountingEmbedding(embed_dim=1536)
+        Settings.embed_model = CachedEmbedding(upstream, cache)
+
+        builds = []
+        for label in ("cold", "warm"):
+            calls, texts = upstream.calls, upstream.texts
+            started = time.perf_counter()
+            build_index(data_dir)
+            builds.append({
+                "build": label,
+                "seconds": round(time.perf_counter() - started, 3),
+                "upstream_calls": upstream.calls - calls,
+                "upstream_texts": upstream.texts - texts,
+            })
+        output = {"builds": builds, "cache": cache.stats()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(output, indent=2))
+    else:
+        for build in builds:
+            print(f"{build['build']:<5} {build['seconds']}s  upstream calls={build['upstream_calls']}  texts={build['upstream_texts']}")
+        print(f"cache hit rate {output['cache']['hit_rate']}, {output['cache']['entries']} entries")
+    return 0 if builds[1]["upstream_calls"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
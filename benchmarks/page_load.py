@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+# Import time and first paint of the anonymous login page, with the chat page loaded
+# lazily (current main.py) or eagerly (how main.py used to import pages.chat and build
+# the index on every cold start). Each run uses a fresh interpreter:
+#   python -m benchmarks.page_load --runs 5 [--json]
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+APP_FILES = ["main.py", "src", "auth", "utils", "data"]
+
+# Reproduces the old start-up path in front of the current main.py
+EAGER_ENTRY = """
+import os
+import sys
+import runpy
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+import pages.chat
+pages.chat.load_data()
+runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"), run_name="__main__")
+"""
+
+IMPORTS = {
+    "lazy": "import auth.handlers, pages.registry, utils.supabase_client",
+    "eager": "import auth.handlers, auth.forms, pages.home, pages.profile, pages.settings, pages.chat, utils.supabase_client",
+}
+
+MEASURE_IMPORT = """
+import sys, time, json
+sys.path[:0] = ["{root}", "{root}/src"]
+started = time.perf_counter()
+{imports}
+print(json.dumps({{"import_s": time.perf_counter() - started, "llama_index_loaded": "llama_index.core" in sys.modules}}))
+"""
+
+MEASURE_PAINT = """
+import time, json
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("{entry}", default_timeout=300)
+app.run()
+first = time.perf_counter() - started
+assert not app.exception, app.exception
+started = time.perf_counter()
+AppTest.from_file("{entry}", default_timeout=300).run()
+print(json.dumps({{"first_paint_s": first, "next_session_s": time.perf_counter() - started}}))
+"""
+
+
+def prepare_workspace() -> str:
+    workdir = tempfile.mkdtemp(prefix="page-load-bench-")
+    for name in APP_FILES:
+        source = os.path.join(REPO_ROOT, name)
+        target = os.path.join(workdir, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, target, ignore=shutil.ignore_patterns("__pycache__"))
+        else:
+            shutil.copy(source, target)
+    with open(os.path.join(workdir, "eager_main.py"), "w") as file:
+        file.write(EAGER_ENTRY)
+
+    # Pre-build the index with a local embedder so neither mode calls the embeddings API
+    build = (
+        "import sys; sys.path.insert(0, '.');"
+        "from llama_index.core import Settings;"
+        "from llama_index.core.embeddings import MockEmbedding;"
+        "Settings.embed_model = MockEmbedding(embed_dim=1536);"
+        "from utils.local_index import load_or_refresh_index; load_or_refresh_index()"
+    )
+    subprocess.run([sys.executable, "-c", build], cwd=workdir, env=bench_env(workdir), check=True, capture_output=True)
+    return workdir
+
+
+def bench_env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    env.setdefault("SUPABASE_KEY", "benchmark")
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    env["EMBED_CACHE_PATH"] = os.path.join(workdir, "embeddings.sqlite3")
+    env["CHAT_WARM_UP"] = "false"
+    return env
+
+
+def run_json(code: str, workdir: str) -> dict:
+    result = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=bench_env(workdir), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time and first paint with lazy and eager page loading")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    workdir = prepare_workspace()
+    try:
+        results = []
+        for mode, entry in (("lazy", "main.py"), ("eager", "eager_main.py")):
+            imports = [run_json(MEASURE_IMPORT.format(root=workdir, imports=IMPORTS[mode]), workdir) for _ in range(args.runs)]
+            paints = [run_json(MEASURE_PAINT.format(entry=os.path.join(workdir, entry)), workdir) for _ in range(args.runs)]
+            results.append({
+                "mode": mode,
+                "import_s": round(statistics.median(run["import_s"] for run in imports), 3),
+                "llama_index_loaded": imports[0]["llama_index_loaded"],
+                "first_paint_s": round(statistics.median(run["first_paint_s"] for run in paints), 3),
+                "next_session_s": round(statistics.median(run["next_session_s"] for run in paints), 3),
+            })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"runs": args.runs, "results": results}, indent=2))
+        return 0
+    for result in results:
+        print(f"{result['mode']:<6} import={result['import_s']}s first_paint={result['first_paint_s']}s "
+              f"next_session={result['next_session_s']}s llama_index_loaded={result['llama_index_loaded']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from typing import List
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+# End-to-end retrieval benchmark for the chat index (utils/local_index.py, what load_data()
+# in pages/chat.py builds and loads) and, with SUPABASE_DB_URL set, for the pgvector store
+# behind query_user_index in the FastAPI app: its pooled store in shared mode, queried
+# with the same user_id filter. For each corpus size and backend it reports
+# build, persist and cold load time, first and warm query latency through a llama_index
+# retriever, recall@k against exact search, disk size and peak memory:
+#   python -m benchmarks.retrieval --chunks 1k,10k,100k [--backends simple,mmap-int8] [--output out.json]
+#
+# The corpus is synthetic: each chunk mixes words from one topic with general vocabulary,
+# and a deterministic bag-of-words embedder maps it to a vector, so related chunks land
+# near each other without any network calls. Build and query run in separate fresh
+# processes per backend, so load times are cold (apart from the OS page cache) and
+# memory figures belong to one backend only.
+#
+# Backends: simple is the JSON store; mmap-<quantization> stores float32 and scans a
+# float32, float16 or int8 copy (LOCAL_VECTOR_QUANTIZATION); mmap-dtype-float16 stores
+# the matrix itself as float16 (LOCAL_VECTOR_DTYPE) and scans it directly.
+#
+# In the pgvector collection, --pgvector-tenants other users each hold a copy of the
+# corpus, so the benchmark user owns a small share of the rows and every true neighbour
+# has exact duplicates that the user_id filter has to discard. short_results counts the
+# queries that came back with fewer than top-k rows.
+
+BACKENDS = ("simple", "mmap-none", "mmap-float16", "mmap-int8", "mmap-dtype-float16", "pgvector")
+DEFAULT_BACKENDS = "simple,mmap-none,mmap-float16,mmap-int8,mmap-dtype-float16"
+FASTAPI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "fastapi"))
+# Owner of every benchmark chunk in the shared pgvector collection
+PGVECTOR_USER = "retrieval-bench"
+VOCABULARY_SIZE = 20000
+TOPIC_WORDS = 25
+CHUNK_WORDS = 40
+TOPIC_SHARE = 0.6
+
+
+def parse_size(value: str) -> int:
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", value.strip())
+    if not match:
+        raise ValueError(f"Not a corpus size: {value}")
+    scale = {"": 1, "k": 1000, "m": 1000000}[match.group(2).lower()]
+    return int(float(match.group(1)) * scale)
+
+
+def vocabulary() -> List[str]:
+    return [f"w{i:05d}" for i in range(VOCABULARY_SIZE)]
+
+
+def make_chunks(count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    words = np.array(vocabulary())
+    topics = max(10, count // 200)
+    topic_words = rng.integers(0, VOCABULARY_SIZE, (topics, TOPIC_WORDS))
+    labels = rng.integers(0, topics, count)
+    from_topic = rng.random((count, CHUNK_WORDS)) < TOPIC_SHARE
+    picks = np.where(
+        from_topic,
+        topic_words[labels[:, None], rng.integers(0, TOPIC_WORDS, (count, CHUNK_WORDS))],
+        rng.integers(0, VOCABULARY_SIZE, (count, CHUNK_WORDS)),
+    )
+    return [" ".join(words[row]) for row in picks], labels, topic_words
+
+
+def make_queries(texts: List[str], count: int, seed: int) -> List[str]:
+    # A query repeats a handful of words from one chunk, like a user paraphrasing it
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    for i in rng.integers(0, len(texts), count):
+        words = texts[i].split()
+        queries.append(" ".join(rng.choice(words, 8, replace=False)))
+    return queries
+
+
+# Deterministic local embedder: the mean of fixed random word vectors, normalized
+class BagOfWordsEmbedding(BaseEmbedding):
+    embed_dim: int = 384
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        rng = np.random.default_rng(12345)
+        self._word_vectors = rng.standard_normal((VOCABULARY_SIZE, self.embed_dim)).astype(np.float32)
+        self._rows = {word: i for i, word in enumerate(vocabulary())}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BagOfWordsEmbedding"
+
+    def _vector(self, text: str) -> List[float]:
+        rows = [self._rows.get(word, zlib.crc32(word.encode()) % VOCABULARY_SIZE) for word in text.split()] or [0]
+        vector = self._word_vectors[rows].mean(axis=0)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._vector(text)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as file:
+        return round(int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+
+
+def dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def backend_env(backend: str) -> dict:
+    if backend == "simple":
+        return {"LOCAL_VECTOR_FORMAT": "json"}
+    if backend == "mmap-dtype-float16":
+        return {"LOCAL_VECTOR_FORMAT": "mmap", "LOCAL_VECTOR_DTYPE": "float16", "LOCAL_VECTOR_QUANTIZATION": "none"}
+    if backend.startswith("mmap-"):
+        return {"LOCAL_VECTOR_FORMAT": "mmap", "LOCAL_VECTOR_DTYPE": "float32", "LOCAL_VECTOR_QUANTIZATION": backend.removeprefix("mmap-")}
+    # The worker imports the FastAPI service as `app`, from fastapi/ like the service itself.
+    # app.db.supabase refuses to import without SUPABASE_URL/KEY; the REST API is never called.
+    return {
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.getenv("PYTHONPATH"), FASTAPI_DIR])),
+        "SUPABASE_URL": os.getenv("SUPABASE_URL", "http://localhost:54321"),
+        "SUPABASE_KEY": os.getenv("SUPABASE_KEY", "unused"),
+    }
+
+
+def collection_name(args) -> str:
+    return f"retrieval_bench_{args.chunks}_{args.dim}_{args.seed}"
+
+
+# The service's shared-mode store on its connection pool, in a collection of its own
+def pgvector_store(args, dimension: int):
+    from app.services.llama_index import PooledSupabaseVectorStore
+    return PooledSupabaseVectorStore(collection_name=collection_name(args), dimension=dimension)
+
+
+# Exact cosine top-k of every query over the whole corpus, shared by all backends
+def run_truth(args) -> dict:
+    texts, _, _ = make_chunks(args.chunks, args.seed)
+    queries = make_queries(texts, args.queries, args.seed)
+    embed_model = BagOfWordsEmbedding(embed_dim=args.dim)
+    truth = [[] for _ in queries]
+    query_matrix = np.asarray([embed_model.get_query_embedding(query) for query in queries], dtype=np.float32)
+    scores = np.full((args.queries, 0), -np.inf, dtype=np.float32)
+    ids = np.zeros((args.queries, 0), dtype=np.int64)
+    block = 50000
+    for start in range(0, len(texts), block):
+        matrix = np.asarray([embed_model._vector(text) for text in texts[start:start + block]], dtype=np.float32)
+        scores = np.concatenate([scores, query_matrix @ matrix.T], axis=1)
+        ids = np.concatenate([ids, np.broadcast_to(np.arange(start, start + len(matrix)), (args.queries, len(matrix)))], axis=1)
+        keep = np.argsort(-scores, axis=1)[:, :args.top_k]
+        scores, ids = np.take_along_axis(scores, keep, 1), np.take_along_axis(ids, keep, 1)
+    for i in range(args.queries):
+        truth[i] = [f"chunk-{row}" for row in ids[i]]
+    return {"queries": queries, "truth": truth}
+
+
+def run_build(args) -> dict:
+    from llama_index.core import Settings, StorageContext, VectorStoreIndex
+    from llama_index.core.schema import TextNode
+    from utils.local_index import new_vector_store, persist_index
+
+    embed_model = BagOfWordsEmbedding(embed_dim=args.dim)
+    Settings.embed_model = embed_model
+    texts, _, _ = make_chunks(args.chunks, args.seed)
+    # Shared-mode rows carry their owner, as ingestion writes them
+    metadata = {"user_id": PGVECTOR_USER} if args.backend == "pgvector" else {}
+    nodes = [TextNode(id_=f"chunk-{i}", text=text, metadata=metadata) for i, text in enumerate(texts)]
+    if args.backend == "pgvector":
+        for tenant in range(args.pgvector_tenants):
+            nodes.extend(TextNode(id_=f"other-{tenant}-{i}", text=text, metadata={"user_id": f"other-{tenant}"})
+                         for i, text in enumerate(texts))
+    del texts
+
+    # Embedding is timed on its own: the fake embedder says nothing about API cost
+    started = time.perf_counter()
+    for node in nodes:
+        node.embedding = embed_model._vector(node.text)
+    embed_s = time.perf_counter() - started
+
+    vector_store = pgvector_store(args, args.dim) if args.backend == "pgvector" else new_vector_store()
+    started = time.perf_counter()
+    index = VectorStoreIndex(nodes, storage_context=StorageContext.from_defaults(vector_store=vector_store))
+    if args.backend == "pgvector":
+        from app.services.llama_index import ensure_vector_index
+        ensure_vector_index(vector_store._collection)
+    build_s = time.perf_counter() - started
+
+    result = {"embed_s": round(embed_s, 3), "build_s": round(build_s, 3), "build_peak_rss_mb": peak_rss_mb()}
+    if args.backend != "pgvector":
+        started = time.perf_counter()
+        persist_index(index, {}, args.index_dir)
+        result["persist_s"] = round(time.perf_counter() - started, 3)
+        result["disk_mb"] = round(dir_bytes(args.index_dir) / 2 ** 20, 1)
+    return result
+
+
+def run_query(args) -> dict:
+    from llama_index.core import Settings, VectorStoreIndex
+    from utils.local_index import load_index
+
+    with open(args.truth_file) as file:
+        truth = json.load(file)
+    Settings.embed_model = BagOfWordsEmbedding(embed_dim=args.dim)
+    baseline_rss = rss_mb()
+
+    started = time.perf_counter()
+    if args.backend == "pgvector":
+        index = VectorStoreIndex.from_vector_store(pgvector_store(args, args.dim))
+    else:
+        index = load_index(args.index_dir)
+    load_s = time.perf_counter() - started
+    loaded_rss = rss_mb()
+    filters = None
+    if args.backend == "pgvector":
+        from app.services.llama_index import user_filters
+        filters = user_filters(PGVECTOR_USER)
+    retriever = index.as_retriever(similarity_top_k=args.top_k, filters=filters)
+
+    # The first query pays for lazy set-up (mmap page faults, building the quantized copy)
+    started = time.perf_counter()
+    retriever.retrieve(truth["queries"][0])
+    first_query_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    found = 0
+    short = 0
+    for query, expected in zip(truth["queries"], truth["truth"]):
+        started = time.perf_counter()
+        results = retriever.retrieve(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += len({result.node.node_id for result in results} & set(expected))
+        short += len(results) < args.top_k
+
+    if args.backend == "pgvector" and not args.keep:
+        index.vector_store._client.delete_collection(collection_name(args))
+
+    result = {
+        "cold_load_s": round(load_s, 3),
+        "load_rss_mb": round(loaded_rss - baseline_rss, 1),
+        "first_query_ms": round(first_query_ms, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        f"recall@{args.top_k}": round(found / (len(latencies) * args.top_k), 4),
+        "query_peak_rss_mb": peak_rss_mb(),
+    }
+    if args.backend == "pgvector":
+        result["user_share"] = round(1 / (args.pgvector_tenants + 1), 4)
+        result["short_results"] = short
+    return result
+
+
+def run_worker(step: str, args, backend: str, workdir: str, index_dir: str, truth_file: str) -> dict:
+    command = [sys.executable, "-m", "benchmarks.retrieval", "--worker", step, "--backend", backend,
+               "--chunks", str(args.chunk_counts[0]), "--dim", str(args.dim), "--queries", str(args.queries),
+               "--top-k", str(args.top_k), "--seed", str(args.seed), "--pgvector-tenants", str(args.pgvector_tenants),
+               "--index-dir", index_dir, "--truth-file", truth_file]
+    if args.keep:
+        command.append("--keep")
+    env = dict(os.environ, **backend_env(backend))
+    result = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{step} for {backend} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build, load, query latency, memory and recall of the retrieval backends")
+    parser.add_argument("--chunks", default="1k,10k", help="comma separated corpus sizes, e.g. 1k,100k,1M")
+    parser.add_argument("--backends", default=DEFAULT_BACKENDS, help=f"any of {','.join(BACKENDS)} (pgvector needs SUPABASE_DB_URL)")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the generated indexes (and pgvector collections)")
+    parser.add_argument("--pgvector-tenants", type=int, default=20,
+                        help="other users holding a copy of the corpus in the pgvector collection")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--json", action="store_true")
+    # Used by the per-backend subprocesses
+    parser.add_argument("--worker", choices=("truth", "build", "query"), help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--index-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--truth-file", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.chunk_counts = [parse_size(size) for size in args.chunks.split(",")]
+
+    if args.worker:
+        args.chunks = args.chunk_counts[0]
+        step = {"truth": run_truth, "build": run_build, "query": run_query}[args.worker]
+        result = step(args)
+        if args.worker == "truth":
+            with open(args.truth_file, "w") as file:
+                json.dump(result, file)
+            result = {"queries": len(result["queries"])}
+        print(json.dumps(result))
+        return 0
+
+    backends = [backend.strip() for backend in args.backends.split(",")]
+    for backend in backends:
+        if backend not in BACKENDS:
+            parser.error(f"unknown backend {backend}")
+        if backend == "pgvector" and not os.getenv("SUPABASE_DB_URL"):
+            parser.error("the pgvector backend needs SUPABASE_DB_URL")
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    workdir = tempfile.mkdtemp(prefix="retrieval-bench-")
+    results = []
+    try:
+        for chunks in args.chunk_counts:
+            size_args = argparse.Namespace(**{**vars(args), "chunk_counts": [chunks]})
+            truth_file = os.path.join(workdir, f"truth-{chunks}.json")
+            run_worker("truth", size_args, "simple", repo_root, "", truth_file)
+            for backend in backends:
+                index_dir = os.path.join(workdir, f"index-{chunks}-{backend}")
+                result = {"chunks": chunks, "backend": backend}
+                result.update(run_worker("build", size_args, backend, repo_root, index_dir, truth_file))
+                result.update(run_worker("query", size_args, backend, repo_root, index_dir, truth_file))
+                results.append(result)
+                if not args.keep:
+                    shutil.rmtree(index_dir, ignore_errors=True)
+                if not args.json:
+                    line = "  ".join(f"{key}={value}" for key, value in result.items() if key not in ("chunks", "backend"))
+                    print(f"{chunks:>8} {backend:<13} {line}", flush=True)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {"dim": args.dim, "queries": args.queries, "top_k": args.top_k, "seed": args.seed, "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(output, file, indent=2)
+    if args.json:
+        print(json.dumps(output, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
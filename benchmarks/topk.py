@@ -0,0 +1,106 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.simple import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from utils.vector_store import MmapVectorStore, SUPPORTED_QUANTIZATION
+
+# Compares chat-index retrieval backends on a synthetic corpus:
+#   python -m benchmarks.topk --rows 20000 --dim 1536 --queries 50 [--json]
+# Recall is measured against exact cosine ranking.
+
+
+def make_corpus(rows: int, dim: int, clusters: int, seed: int):
+    # Clustered vectors make near-ties common, which is where quantization loses recall
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    matrix = centers[labels] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def make_queries(matrix: np.ndarray, count: int, seed: int):
+    rng = np.random.default_rng(seed + 1)
+    picks = matrix[rng.integers(0, matrix.shape[0], count)]
+    queries = picks + 0.3 * rng.standard_normal(picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def nodes_for(matrix: np.ndarray):
+    return [TextNode(id_=f"node-{i}", text="", embedding=row.tolist()) for i, row in enumerate(matrix)]
+
+
+def percentile(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def run_backend(name, store, queries, top_k, truth):
+    latencies = []
+    found = 0
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=top_k))
+        latencies.append(time.perf_counter() - started)
+        found += len(set(result.ids) & truth[i])
+    report = {
+        "backend": name,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        f"recall@{top_k}": round(found / (len(queries) * top_k), 4),
+    }
+    if isinstance(store, MmapVectorStore):
+        _, _, scan = store._prepare()
+        report["scan_bytes"] = int(scan.nbytes)
+        started = time.perf_counter()
+        store.query_many(queries, top_k)
+        report["batched_ms_per_query"] = round((time.perf_counter() - started) * 1000 / len(queries), 3)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency and recall of the local vector store backends")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-simple", action="store_true", help="skip SimpleVectorStore, which is slow on large corpora")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    matrix = make_corpus(args.rows, args.dim, args.clusters, args.seed)
+    queries = make_queries(matrix, args.queries, args.seed)
+    exact = np.argsort(-(matrix @ queries.T), axis=0)[:args.top_k]
+    truth = [{f"node-{row}" for row in exact[:, i]} for i in range(args.queries)]
+
+    nodes = nodes_for(matrix)
+    backends = []
+    if not args.skip_simple:
+        simple = SimpleVectorStore()
+        simple.add(nodes)
+        backends.append(("simple", simple))
+    for quantization in SUPPORTED_QUANTIZATION:
+        store = MmapVectorStore(quantization=quantization, rerank_factor=args.rerank_factor)
+        store.add(nodes)
+        backends.append((f"mmap-{quantization}", store))
+
+    results = [run_backend(name, store, queries, args.top_k, truth) for name, store in backends]
+    output = {"rows": args.rows, "dim": args.dim, "queries": args.queries, "top_k": args.top_k, "results": results}
+    if args.json:
+        print(json.dumps(output, indent=2))
+        return 0
+
+    print(f"{args.rows} rows x {args.dim} dims, {args.queries} queries, top_k={args.top_k}")
+    for result in results:
+        line = "  ".join(f"{key}={value}" for key, value in result.items() if key != "backend")
+        print(f"{result['backend']:<14} {line}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
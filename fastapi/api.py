@@ -1,19 +1,24 @@
+import sys
 import uvicorn
 import logging
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
-from app.api import auth, profile
+from app.api import auth, profile, health
+from app.lifespan import lifespan
+import serve
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def redirect_to_docs():
     return RedirectResponse(url="/docs")
 
+app.include_router(health.router)
 app.include_router(auth.router)
 app.include_router(profile.router)
 
 if __name__ == "__main__":
 #    logging.basicConfig(level=logging.DEBUG)
 #    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="debug")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Single worker on 0.0.0.0:8000 by default; see python serve.py --help
+    serve.main(["--app", "api:app", "--workers", "1"] + sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,93 @@
+import os
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from supabase import AsyncClient
+from app.models.user import AuthUser, BulkSettingsRequest
+from app.api.auth import get_current_admin
+from app.db.supabase import get_supabase
+from app.services.profiles import parse_user_ids, parse_fields, fetch_profiles, iter_profiles, bulk_update_settings
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+PROFILES_MAX_IDS = int(os.getenv("PROFILES_MAX_IDS", "1000"))
+PROFILES_EXPORT_PAGE_SIZE = int(os.getenv("PROFILES_EXPORT_PAGE_SIZE", "1000"))
+SETTINGS_BULK_MAX_UPDATES = int(os.getenv("SETTINGS_BULK_MAX_UPDATES", "5000"))
+
+# Profiles of several users at once: ?ids=<uuid>,<uuid>&fields=full_name,email
+@router.get("/profiles")
+async def read_profiles(ids: str, fields: str = None, current_user: AuthUser = Depends(get_current_admin), supabase: AsyncClient = Depends(get_supabase)):
+    try:
+        user_ids = parse_user_ids(ids.split(","))
+        columns = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(user_ids) > PROFILES_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {PROFILES_MAX_IDS} ids per request")
+    try:
+        profiles = await fetch_profiles(supabase, user_ids, columns)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to fetch profiles: {str(e)}")
+    found = {profile["user_id"] for profile in profiles}
+    return {"profiles": profiles, "missing": [user_id for user_id in user_ids if user_id not in found]}
+
+# Every profile as newline-delimited JSON, one row per line, fetched page by page and
+# ending with {"event": "done", "count": ...}. If the export breaks off, the last line is
+# {"event": "error", "cursor": ...}; pass that cursor as ?after= to resume.
+@router.get("/profiles/export")
+async def export_profiles(request: Request, fields: str = None, after: str = None,
+                          page_size: int = Query(PROFILES_EXPORT_PAGE_SIZE, ge=1, le=10000),
+                          current_user: AuthUser = Depends(get_current_admin), supabase: AsyncClient = Depends(get_supabase)):
+    try:
+        columns = parse_fields(fields)
+        cursor = parse_user_ids([after])[0] if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        nonlocal cursor
+        count = 0
+        try:
+            async for page in iter_profiles(supabase, columns, page_size, cursor):
+                yield "".join(json.dumps(row) + "\n" for row in page)
+                count += len(page)
+                cursor = page[-1]["user_id"]
+                if await request.is_disconnected():
+                    logger.info(f"Client disconnected from profile export after {count} rows")
+                    return
+        except Exception as e:
+            logger.exception("Profile export failed")
+            yield json.dumps({"event": "error", "detail": str(e), "cursor": cursor, "count": count}) + "\n"
+            return
+        yield json.dumps({"event": "done", "count": count}) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+# Partial settings updates for many users: {"updates": [{"user_id": ..., "settings": {...}}]}.
+# Only the fields given are changed; updates for the same user are merged in order.
+@router.patch("/settings/bulk")
+async def update_settings_bulk(request: BulkSettingsRequest, current_user: AuthUser = Depends(get_current_admin), supabase: AsyncClient = Depends(get_supabase)):
+    if len(request.updates) > SETTINGS_BULK_MAX_UPDATES:
+        raise HTTPException(status_code=400, detail=f"At most {SETTINGS_BULK_MAX_UPDATES} updates per request")
+    updates = {}
+    invalid = []
+    for update in request.updates:
+        try:
+            user_id = parse_user_ids([update.user_id])[0]
+        except ValueError:
+            invalid.append({"user_id": update.user_id, "status": "invalid", "error": "user_id is not a UUID"})
+            continue
+        updates.setdefault(user_id, {}).update(update.settings.dict(exclude_unset=True))
+    try:
+        results = await bulk_update_settings(supabase, updates) if updates else {}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to update settings: {str(e)}")
+    ordered = invalid + [results[user_id] for user_id in updates]
+    return {
+        "updated": sum(1 for result in ordered if result["status"] == "updated"),
+        "failed": sum(1 for result in ordered if result["status"] in ("failed", "invalid", "not_found")),
+        "results": ordered,
+    }
@@ -1,55 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from app.db.supabase import supabase
-from app.models.user import UserCreate, User
+import os
+import logging
+from supabase import AsyncClient
+from supabase_auth import AsyncGoTrueClient
+from app.db.supabase import get_supabase, get_auth_client
+from app.models.user import UserCreate, User, AuthUser
+from app.services.token_verifier import token_verifier, LocalVerificationUnavailable
+from app.services.rate_limit import check_rate_limit, auth_upstream_limit
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+logger = logging.getLogger(__name__)
+
+# When set, every request is checked against the auth server as before
+SUPABASE_AUTH_STRICT = os.getenv("SUPABASE_AUTH_STRICT", "false").lower() == "true"
+
+# Asks the auth server directly, so revoked sessions and deleted users are rejected
+async def get_current_user_strict(token: str = Depends(oauth2_scheme), supabase: AsyncClient = Depends(get_supabase)):
     try:
-        user = supabase.auth.get_user(token)
+        user = await supabase.auth.get_user(token)
         return user.user
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
-@router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def get_current_user(token: str = Depends(oauth2_scheme), supabase: AsyncClient = Depends(get_supabase)):
+    if SUPABASE_AUTH_STRICT:
+        return await get_current_user_strict(token, supabase)
     try:
-        res = supabase.auth.sign_in_with_password({"email": form_data.username, "password": form_data.password})
-        return {"access_token": res.session.access_token, "token_type": "bearer"}
+        claims = await token_verifier.verify(token)
+        return AuthUser.from_claims(claims)
+    except LocalVerificationUnavailable:
+        logger.debug("Local token verification is not configured, falling back to the auth server")
+        return await get_current_user_strict(token, supabase)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Login failed: {str(e)}")
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+# Admins are users whose app_metadata.role is ADMIN_ROLE (app_metadata can only be set
+# with the service key, unlike user_metadata) or whose id is listed in ADMIN_USER_IDS
+ADMIN_ROLE = os.getenv("ADMIN_ROLE", "admin")
+ADMIN_USER_IDS = {user_id.strip() for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
+# Checked against the auth server, so a signed-out session or a revoked role loses admin
+# access immediately rather than when the access token expires
+async def get_current_admin(current_user: AuthUser = Depends(get_current_user_strict)):
+    app_metadata = getattr(current_user, "app_metadata", None) or {}
+    if current_user.id not in ADMIN_USER_IDS and app_metadata.get("role") != ADMIN_ROLE:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+# Rate limits are checked before anything is sent to GoTrue; see app/services/rate_limit.py
+@router.post("/login")
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), auth_client: AsyncGoTrueClient = Depends(get_auth_client)):
+    await check_rate_limit(request, "login", form_data.username)
+    async with auth_upstream_limit:
+        try:
+            res = await auth_client.sign_in_with_password({"email": form_data.username, "password": form_data.password})
+            return {"access_token": res.session.access_token, "token_type": "bearer"}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Login failed: {str(e)}")
 
 @router.post("/register")
-async def register(user: UserCreate):
-    try:
-        res = supabase.auth.sign_up({"email": user.email, "password": user.password})
-        return {"message": "Registration successful! Please check your email to verify your account."}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Registration failed: {str(e)}")
+async def register(request: Request, user: UserCreate, auth_client: AsyncGoTrueClient = Depends(get_auth_client)):
+    await check_rate_limit(request, "register", user.email)
+    async with auth_upstream_limit:
+        try:
+            res = await auth_client.sign_up({"email": user.email, "password": user.password})
+            return {"message": "Registration successful! Please check your email to verify your account."}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Registration failed: {str(e)}")
 
 @router.post("/reset-password")
-async def reset_password(email: str = Form(...)):
-    try:
-        res = supabase.auth.reset_password_email(email)
-        return {"message": "Password reset link sent to your email!"}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to send reset link: {str(e)}")
+async def reset_password(request: Request, email: str = Form(...), supabase: AsyncClient = Depends(get_supabase)):
+    await check_rate_limit(request, "reset_password", email)
+    async with auth_upstream_limit:
+        try:
+            res = await supabase.auth.reset_password_email(email)
+            return {"message": "Password reset link sent to your email!"}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to send reset link: {str(e)}")
 
 @router.get("/confirm")
-async def confirm(token: str):
+async def confirm(token: str, auth_client: AsyncGoTrueClient = Depends(get_auth_client)):
     try:
-        res = supabase.auth.verify_otp({"token": token, "type": "email"})
+        res = await auth_client.verify_otp({"token": token, "type": "email"})
         return {"message": "Email confirmed successfully! You can now log in."}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Confirmation failed: {str(e)}")
 
 @router.post("/logout")
-async def logout(token: str = Depends(oauth2_scheme)):
+async def logout(token: str = Depends(oauth2_scheme), supabase: AsyncClient = Depends(get_supabase)):
     try:
-        supabase.auth.sign_out(token)
+        # Revoke only the session behind this access token, not the user's other devices.
+        # Its refresh token stops working at once, but the access token is a signed JWT:
+        # endpoints that verify it locally accept it until it expires (see readme).
+        await supabase.auth.admin.sign_out(token, scope="local")
         return {"message": "Logged out successfully!"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Logout failed: {str(e)}")
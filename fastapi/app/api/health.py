@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.warmup import warmup_state
+
+router = APIRouter()
+
+# Liveness only says the event loop is answering; restart the worker if this fails
+@router.get("/health/live", include_in_schema=False)
+async def live():
+    return {"status": "alive"}
+
+# Readiness is 503 until warm-up has finished and again while the worker drains or stops
+@router.get("/health/ready", include_in_schema=False)
+async def ready():
+    return JSONResponse(warmup_state.to_dict(), status_code=200 if warmup_state.ready else 503)
@@ -1,49 +1,241 @@
 import os
+import json
+import hashlib
+import time
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.user import User, Settings
-from app.api.auth import get_current_user
-from app.db.supabase import supabase
-from app.services.llama_index import get_user_index, query_user_index
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse, JSONResponse
+from app.models.user import User, Settings, QueryRequest, IngestDocument, IngestRequest
+from app.api.auth import get_current_user, get_current_user_strict
+from supabase import AsyncClient
+from app.db.supabase import get_supabase
+from app.db.postgres import PoolTimeoutError
+from app.services.llama_index import get_user_index_with_timeout, query_user_index, stream_user_index
+from app.services.jobs import job_queue, QueueFull
+from app.services.ingestion import ingest_documents
+from app.services.profiles import get_profile, refresh_profile, current_profile, update_profile, profile_etag, etag_matches
 
 router = APIRouter()
 
 @router.get("/profile", response_model=User)
-async def read_profile(current_user: dict = Depends(get_current_user)):
+async def read_profile(request: Request, response: Response, current_user: dict = Depends(get_current_user), supabase: AsyncClient = Depends(get_supabase)):
     try:
-        response = supabase.table("profiles").select("*").eq("user_id", current_user.id).execute()
-        if not response.data:
+        # Creates the profile on first access, so a signed-in user always has one
+        profile = await get_profile(supabase, current_user.id, current_user.email)
+        if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
-        profile = response.data[0]
-        return User(**profile)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch profile: {str(e)}")
 
+    # Clients polling with the ETag they already have get an empty 304. The cached copy
+    # may predate a write made by another worker, so a match is confirmed against the
+    # row's updated_at (one single-column read) before the client is told nothing changed.
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, profile_etag(profile), weak=True):
+        try:
+            profile = await current_profile(supabase, current_user.id, profile, current_user.email)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to fetch profile: {str(e)}")
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
+    etag = profile_etag(profile)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag_matches(if_none_match, etag, weak=True):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return User(**profile)
+
+# Send If-Match with the ETag from GET /profile to update only if the profile hasn't
+# changed since; a mismatch returns 412 and the current ETag. Writes check the token
+# against the auth server, so a signed-out session can't change settings.
 @router.put("/settings", response_model=User)
-async def update_settings(settings: Settings, current_user: dict = Depends(get_current_user)):
+async def update_settings(settings: Settings, request: Request, response: Response, current_user: dict = Depends(get_current_user_strict), supabase: AsyncClient = Depends(get_supabase)):
+    if_match = request.headers.get("if-match")
     try:
-        response = supabase.table("profiles").update(settings.dict(exclude_unset=True)).eq("user_id", current_user.id).execute()
-        if not response.data:
+        updated_at = None
+        if if_match:
+            profile = await get_profile(supabase, current_user.id, current_user.email)
+            if profile and not etag_matches(if_match, profile_etag(profile), weak=False):
+                # The cached copy may predate a write made by another worker
+                profile = await refresh_profile(supabase, current_user.id, current_user.email)
+            if not profile:
+                raise HTTPException(status_code=404, detail="Profile not found")
+            if not etag_matches(if_match, profile_etag(profile), weak=False):
+                raise HTTPException(status_code=412, detail="Profile was modified", headers={"ETag": profile_etag(profile)})
+            updated_at = profile["updated_at"]
+
+        updated_profile = await update_profile(supabase, current_user.id, settings.dict(exclude_unset=True), updated_at)
+        if not updated_profile:
+            if updated_at is not None:
+                # Someone else wrote between our read and the conditional update
+                raise HTTPException(status_code=412, detail="Profile was modified")
             raise HTTPException(status_code=404, detail="Profile not found")
-        updated_profile = response.data[0]
+        response.headers["ETag"] = profile_etag(updated_profile)
         return User(**updated_profile)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to update settings: {str(e)}")
 
-
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-@router.post("/index")
+INGEST_MAX_UPLOAD_BYTES = int(os.getenv("INGEST_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_READ_SIZE = 64 * 1024
+
+def _submit_job(kind: str, user_id: str, func, dedupe_key: str = "") -> JSONResponse:
+    try:
+        job, created = job_queue.submit(kind, user_id, func, dedupe_key)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Too many index jobs are pending, please retry shortly", headers={"Retry-After": "5"})
+    body = job.to_dict()
+    body["deduplicated"] = not created
+    return JSONResponse(status_code=202, content=body, headers={"Location": f"/index/jobs/{job.id}"})
+
+async def _build_index_job(job):
+    logger.info(f"Attempting to create index for user: {job.user_id}")
+    job.progress = {"step": "building"}
+    await get_user_index_with_timeout(job.user_id)
+    job.progress = {"step": "done"}
+    logger.info(f"Index created successfully for user: {job.user_id}")
+    return {"message": "User index created successfully", "user_id": job.user_id}
+
+# Starts (or joins) the user's index build and returns its job immediately
+@router.post("/index", status_code=202)
 async def create_user_index(current_user: User = Depends(get_current_user)):
+    return _submit_job("build", current_user.id, _build_index_job)
+
+@router.get("/index/jobs/{job_id}")
+async def get_index_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = job_queue.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+async def _ingest(user_id: str, documents: list) -> list:
+    try:
+        return await ingest_documents(user_id, documents)
+    except PoolTimeoutError:
+        raise HTTPException(status_code=503, detail="Database is busy, please retry shortly", headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.exception(f"Failed to ingest documents for user {user_id}")
+        raise HTTPException(status_code=500, detail=f"Failed to ingest documents: {str(e)}")
+
+def _ingest_job(documents: list):
+    async def run(job):
+        def on_progress(progress):
+            job.progress = {
+                "documents": len(progress),
+                "indexed": sum(1 for item in progress.values() if item.status == "indexed"),
+                "failed": sum(1 for item in progress.values() if item.status == "failed"),
+                "chunks": sum(item.chunks for item in progress.values()),
+                "embedded": sum(item.embedded for item in progress.values()),
+            }
+        return {"documents": await ingest_documents(job.user_id, documents, on_progress)}
+    return run
+
+# Per-document results; documents reported as "failed" can simply be sent again.
+# With background=true the work runs as a job and this returns its id right away.
+@router.post("/index/documents")
+async def ingest_user_documents(request: IngestRequest, background: bool = False, current_user: User = Depends(get_current_user)):
+    if background:
+        fingerprint = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+        return _submit_job("ingest", current_user.id, _ingest_job(request.documents), fingerprint)
+    results = await _ingest(current_user.id, request.documents)
+    return {"user_id": current_user.id, "documents": results}
+
+async def _read_upload(upload: UploadFile) -> str:
+    chunks = []
+    size = 0
+    while chunk := await upload.read(UPLOAD_READ_SIZE):
+        size += len(chunk)
+        if size > INGEST_MAX_UPLOAD_BYTES:
+            raise ValueError(f"File exceeds {INGEST_MAX_UPLOAD_BYTES} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks).decode("utf-8")
+
+@router.post("/index/upload")
+async def ingest_user_uploads(files: List[UploadFile] = File(...), current_user: User = Depends(get_current_user)):
+    documents = []
+    rejected = []
+    for upload in files:
+        if not upload.filename:
+            # The file name is the doc_id, so an unnamed part can't be stored or replaced later
+            rejected.append({"doc_id": None, "status": "failed", "chunks": 0, "embedded": 0, "error": "Uploaded file has no file name"})
+            continue
+        try:
+            text = await _read_upload(upload)
+        except (ValueError, UnicodeDecodeError) as e:
+            rejected.append({"doc_id": upload.filename, "status": "failed", "chunks": 0, "embedded": 0, "error": str(e)})
+            continue
+        documents.append(IngestDocument(doc_id=upload.filename, text=text, metadata={"file_name": upload.filename}))
+    results = await _ingest(current_user.id, documents) if documents else []
+    return {"user_id": current_user.id, "documents": rejected + results}
+
+async def _answer_events(request: Request, response, started: float):
+    first_token_at = None
+    tokens = 0
+    token_gen = response.async_response_gen()
+    try:
+        async for token in token_gen:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            tokens += 1
+            yield "token", {"token": token}
+            if await request.is_disconnected():
+                logger.info("Client disconnected, cancelling answer generation")
+                return
+    except Exception as e:
+        logger.exception("Answer generation failed mid-stream")
+        yield "error", {"detail": str(e)}
+        return
+    finally:
+        # Closing the generator tears down the upstream LLM stream
+        await token_gen.aclose()
+    finished = time.perf_counter()
+    yield "done", {
+        "ttft_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+        "total_ms": round((finished - started) * 1000, 1),
+        "tokens": tokens,
+    }
+
+async def _start_answer(query: QueryRequest, current_user):
     try:
-        logger.info(f"Attempting to create index for user: {current_user.id}")
-        logger.debug(f"SUPABASE_URL set: {'SUPABASE_URL' in os.environ}")
-        logger.debug(f"OPENAI_API_KEY set: {'OPENAI_API_KEY' in os.environ}")
-        
-        index = get_user_index(current_user.id)
-        logger.info(f"Index created successfully for user: {current_user.id}")
-        return {"message": "User index created successfully", "user_id": current_user.id}
+        return await stream_user_index(current_user.id, query.query)
+    except PoolTimeoutError:
+        raise HTTPException(status_code=503, detail="Database is busy, please retry shortly", headers={"Retry-After": "1"})
     except Exception as e:
-        logger.exception(f"Failed to create user index for user {current_user.id}")
-        raise HTTPException(status_code=500, detail=f"Failed to create user index: {str(e)}")
\ No newline at end of file
+        logger.exception(f"Failed to query index for user {current_user.id}")
+        raise HTTPException(status_code=500, detail=f"Failed to query index: {str(e)}")
+
+# Newline-delimited JSON: one {"token": ...} object per chunk, then a final
+# {"event": "done", "ttft_ms": ..., "total_ms": ...} line with timing metadata
+@router.post("/query")
+async def query_index(query: QueryRequest, request: Request, current_user: User = Depends(get_current_user)):
+    started = time.perf_counter()
+    response = await _start_answer(query, current_user)
+
+    async def body():
+        async for event, data in _answer_events(request, response, started):
+            if event != "token":
+                data = {"event": event, **data}
+            yield json.dumps(data) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.post("/query/sse")
+async def query_index_sse(query: QueryRequest, request: Request, current_user: User = Depends(get_current_user)):
+    started = time.perf_counter()
+    response = await _start_answer(query, current_user)
+
+    async def body():
+        async for event, data in _answer_events(request, response, started):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,82 @@
+import argparse
+import logging
+from sqlalchemy import text
+from app.db.postgres import get_engine, get_vecs_client
+from app.services.llama_index import VECTOR_SHARED_COLLECTION, ensure_vector_index
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_PREFIX = "user_collection_"
+
+# Copies every vecs.user_collection_<user_id> table into the shared collection,
+# tagging each row with its user_id so VECTOR_STORAGE_MODE=shared can find it.
+#
+#   python -m app.db.migrate_collections [--target user_documents] [--drop] [--dry-run]
+
+def list_user_collections(connection):
+    rows = connection.execute(text(
+        """
+        select c.relname, a.atttypmod
+        from pg_class c
+        join pg_attribute a on a.attrelid = c.oid and a.attname = 'vec'
+        where c.relnamespace = 'vecs'::regnamespace
+          and c.relkind = 'r'
+          and c.relname like :prefix
+        order by c.relname
+        """
+    ), {"prefix": COLLECTION_PREFIX + "%"}).fetchall()
+    return [(name, name[len(COLLECTION_PREFIX):], dimension) for name, dimension in rows]
+
+def migrate_collection(connection, table: str, user_id: str, target: str) -> int:
+    result = connection.execute(text(
+        f"""
+        insert into vecs."{target}" (id, vec, metadata)
+        select id, vec, metadata || jsonb_build_object('user_id', cast(:user_id as text))
+        from vecs."{table}"
+        on conflict (id) do nothing
+        """
+    ), {"user_id": user_id})
+    return result.rowcount
+
+def main():
+    parser = argparse.ArgumentParser(description="Move per-user vector collections into the shared collection")
+    parser.add_argument("--target", default=VECTOR_SHARED_COLLECTION, help="shared collection name")
+    parser.add_argument("--drop", action="store_true", help="drop each per-user table once copied")
+    parser.add_argument("--dry-run", action="store_true", help="only list the collections that would be moved")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    engine = get_engine()
+    with engine.connect() as connection:
+        collections = list_user_collections(connection)
+    logger.info(f"Found {len(collections)} per-user collections")
+    if args.dry_run or not collections:
+        for table, user_id, dimension in collections:
+            logger.info(f"{table}: user_id={user_id} dimension={dimension}")
+        return
+
+    dimensions = {dimension for _, _, dimension in collections}
+    if len(dimensions) > 1:
+        raise SystemExit(f"Per-user collections have mixed dimensions {sorted(dimensions)}; migrate them separately")
+    target = get_vecs_client().get_or_create_collection(name=args.target, dimension=dimensions.pop())
+
+    total = 0
+    for table, user_id, _ in collections:
+        # One transaction per user so a failure leaves earlier users fully migrated
+        with engine.begin() as connection:
+            rows = connection.execute(text(f'select count(*) from vecs."{table}"')).scalar()
+            copied = migrate_collection(connection, table, user_id, args.target)
+            if copied < rows:
+                # Ids already present in the target are left alone; keep the source for inspection
+                logger.warning(f"{table}: {rows - copied} of {rows} rows already existed in {args.target}, not dropping")
+            elif args.drop:
+                connection.execute(text(f'drop table vecs."{table}"'))
+        total += copied
+        logger.info(f"Copied {copied} rows from {table}")
+
+    # Build the ANN index after the bulk load, which is much faster than maintaining it row by row
+    ensure_vector_index(target)
+    logger.info(f"Migrated {total} rows into vecs.{args.target}")
+
+if __name__ == "__main__":
+    main()
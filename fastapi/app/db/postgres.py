@@ -0,0 +1,146 @@
+import os
+import logging
+import threading
+from urllib.parse import urlparse
+import vecs
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# Direct Postgres connection string; falls back to the one derived from SUPABASE_URL
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Seconds a caller waits for a free connection before the request is refused
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# With a user_id filter, an HNSW scan stops after ef_search candidates and drops other
+# users' rows afterwards, so a user with a small share of the shared collection gets
+# short results. pgvector 0.8+ keeps scanning until enough rows pass the filter;
+# strict_order returns them in exact distance order. "off" leaves the server setting.
+VECTOR_HNSW_ITERATIVE_SCAN = os.getenv("VECTOR_HNSW_ITERATIVE_SCAN", "strict_order")
+
+if VECTOR_HNSW_ITERATIVE_SCAN not in ("off", "strict_order", "relaxed_order"):
+    raise ValueError("VECTOR_HNSW_ITERATIVE_SCAN must be off, strict_order or relaxed_order")
+
+_engine = None
+_vecs_client = None
+_lock = threading.Lock()
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+def database_url() -> str:
+    if SUPABASE_DB_URL:
+        return SUPABASE_DB_URL
+    parsed_url = urlparse(os.getenv("SUPABASE_URL"))
+    return f"postgresql://{parsed_url.username}:{parsed_url.password}@{parsed_url.hostname}:{parsed_url.port or 5432}/{parsed_url.path.lstrip('/')}"
+
+
+def _redacted(url: str) -> str:
+    parsed_url = urlparse(url)
+    return f"postgresql://{parsed_url.username}:****@{parsed_url.hostname}:{parsed_url.port or 5432}/{parsed_url.path.lstrip('/')}"
+
+
+def get_engine():
+    global _engine
+    if _engine is not None:
+        return _engine
+    with _lock:
+        if _engine is None:
+            url = database_url()
+            logger.info(f"Opening Postgres pool for {_redacted(url)} (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+            # DB_POOL_MIN_SIZE connections stay open; up to DB_POOL_MAX_SIZE in total are opened
+            # under load and closed again when returned. Beyond that, callers queue for
+            # DB_POOL_TIMEOUT instead of opening more.
+            # SQLAlchemy reads pool_size=0 as "no limit", so at least one connection is kept
+            pool_size = max(1, min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE))
+            engine = create_engine(
+                url,
+                pool_size=pool_size,
+                max_overflow=DB_POOL_MAX_SIZE - pool_size,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=True,
+            )
+            event.listen(engine, "connect", configure_connection)
+            _warm(engine, pool_size)
+            _engine = engine
+    return _engine
+
+
+# Runs once per new pooled connection. The setting is session-wide, so it also applies
+# inside the transactions vecs opens for each query.
+def configure_connection(dbapi_connection, connection_record):
+    if VECTOR_HNSW_ITERATIVE_SCAN == "off":
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET hnsw.iterative_scan = {VECTOR_HNSW_ITERATIVE_SCAN}")
+        dbapi_connection.commit()
+    except Exception as e:
+        # pgvector before 0.8 has no iterative scans
+        dbapi_connection.rollback()
+        logger.warning(f"Could not set hnsw.iterative_scan: {e}")
+    finally:
+        cursor.close()
+
+
+def _warm(engine, size: int):
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def get_vecs_client() -> vecs.Client:
+    global _vecs_client
+    if _vecs_client is not None:
+        return _vecs_client
+    engine = get_engine()
+    with _lock:
+        if _vecs_client is None:
+            client = vecs.create_client(database_url())
+            # vecs opens its own engine; swap it for the shared pool
+            client.engine.dispose()
+            client.engine = engine
+            client.Session = sessionmaker(engine)
+            _vecs_client = client
+    return _vecs_client
+
+
+def check_database():
+    try:
+        with get_engine().connect() as connection:
+            connection.execute(text("select 1"))
+    except PoolTimeoutError as e:
+        raise PoolExhausted("Postgres connection pool is exhausted") from e
+
+
+def pool_status() -> dict:
+    if _engine is None:
+        return {"size": 0, "checked_out": 0, "idle": 0, "min_size": DB_POOL_MIN_SIZE, "max_size": DB_POOL_MAX_SIZE}
+    pool = _engine.pool
+    return {
+        "size": pool.checkedout() + pool.checkedin(),
+        "min_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "max_size": DB_POOL_MAX_SIZE,
+    }
+
+
+def close_pool():
+    global _engine, _vecs_client
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _vecs_client = None
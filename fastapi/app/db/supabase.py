@@ -1,5 +1,13 @@
 import os
-from supabase import create_client, Client
+import json
+import base64
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import httpx
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from supabase_auth import AsyncGoTrueClient
+from app.metrics import TimedTransport
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
@@ -7,4 +15,81 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+# The shared client never carries a user's token, so PostgREST sees only the project key.
+# Under the row level security in sql/init.sql the anon key can't read or write profiles,
+# and the admin endpoints need auth.admin; the API therefore runs with the service role key.
+def key_role(key: str) -> str:
+    if key.startswith("sb_publishable_"):
+        return "anon"
+    if key.startswith("sb_secret_"):
+        return "service_role"
+    try:
+        payload = key.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))).get("role")
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+if key_role(SUPABASE_KEY) == "anon":
+    raise ValueError("SUPABASE_KEY is the anon key; the API needs the service role key")
+
+# Shared HTTP pool used by the PostgREST, GoTrue, storage and functions clients
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "100"))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", "20"))
+SUPABASE_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_HTTP_TIMEOUT = float(os.getenv("SUPABASE_HTTP_TIMEOUT", "10"))
+# Threads available to calls that are still synchronous (llama_index, vecs)
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "8"))
+
+http_client: httpx.AsyncClient = None
+supabase: AsyncClient = None
+_executor: ThreadPoolExecutor = None
+
+async def open_supabase():
+    global http_client, supabase, _executor
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=SUPABASE_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+    # Every GoTrue and PostgREST call is timed for /metrics at the transport
+    http_client = httpx.AsyncClient(transport=TimedTransport(transport), timeout=SUPABASE_HTTP_TIMEOUT)
+    # The API is stateless: the shared client is never signed in (see get_auth_client),
+    # so it keeps no session and its requests carry only the project key
+    options = AsyncClientOptions(httpx_client=http_client, auto_refresh_token=False, persist_session=False)
+    supabase = await acreate_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+    _executor = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix="sync-worker")
+
+async def close_supabase():
+    global http_client, supabase, _executor
+    if http_client is not None:
+        await http_client.aclose()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    http_client = None
+    supabase = None
+    _executor = None
+
+async def get_supabase() -> AsyncClient:
+    if supabase is None:
+        raise RuntimeError("Supabase client is not initialised; is the app lifespan running?")
+    return supabase
+
+# Signing in (password, sign-up, OTP) stores the session on the GoTrue client, and on the
+# shared client the SIGNED_IN listener would also switch every later PostgREST call to
+# that user's token. Those calls get a throwaway auth client over the shared HTTP pool.
+async def get_auth_client() -> AsyncGoTrueClient:
+    if http_client is None:
+        raise RuntimeError("Supabase client is not initialised; is the app lifespan running?")
+    return AsyncGoTrueClient(
+        url=f"{SUPABASE_URL.rstrip('/')}/auth/v1",
+        headers={"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"},
+        http_client=http_client,
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+
+async def run_sync(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
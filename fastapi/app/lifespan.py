@@ -0,0 +1,24 @@
+import asyncio
+from contextlib import asynccontextmanager
+from app.db.supabase import open_supabase, close_supabase
+from app.db.postgres import close_pool
+from app.services.jobs import job_queue
+from app.warmup import warmup_state, warm_up, install_drain_handler
+
+@asynccontextmanager
+async def lifespan(app):
+    await open_supabase()
+    job_queue.start()
+    # A lifespan that ran before in this process left the state at "stopping"
+    warmup_state.reset()
+    install_drain_handler()
+    # Warm up in the background so /health/live answers while pools and indexes load
+    warmup_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        warmup_state.state = "stopping"
+        warmup_task.cancel()
+        await job_queue.shutdown()
+        await close_supabase()
+        close_pool()
@@ -0,0 +1,251 @@
+import time
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+import httpx
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from fastapi import Depends, Request, Response
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.embedding import EmbeddingStartEvent, EmbeddingEndEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatStartEvent, LLMChatInProgressEvent, LLMChatEndEvent,
+    LLMCompletionStartEvent, LLMCompletionInProgressEvent, LLMCompletionEndEvent,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time from request start to the last body chunk sent",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled", ["method", "route"])
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Time spent in calls to services this API depends on",
+    ["service", "operation", "outcome"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_IN_FLIGHT = Gauge("upstream_requests_in_flight", "Upstream calls currently waiting for a response", ["service"])
+RATE_LIMITED = Counter(
+    "rate_limited_requests", "Requests turned away by the auth rate limiter or upstream concurrency limit",
+    ["endpoint", "reason"],
+)
+LLM_FIRST_TOKEN = Histogram(
+    "llm_first_token_seconds", "Time from starting an LLM call to its first streamed token",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+
+
+# Runs for every route once it has been matched, so the request can be counted under
+# its path template (/index/jobs/{job_id}); ids in the path would explode the series
+async def track_in_flight(request: Request):
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    gauge = REQUESTS_IN_FLIGHT.labels(request.method, route)
+    gauge.inc()
+    request.scope["metrics.in_flight"] = gauge
+
+
+# Pure ASGI so streamed answers are timed to their last chunk, not just to the headers
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            gauge = scope.get("metrics.in_flight")
+            if gauge is not None:
+                gauge.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route, status).observe(time.perf_counter() - started)
+
+
+# Times a sync or async function as one upstream call, e.g. @upstream_timer("vector_store", "query")
+def upstream_timer(service: str, operation: str):
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_async(*args, **kwargs):
+                with _observe(service, operation):
+                    return await func(*args, **kwargs)
+            return timed_async
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with _observe(service, operation):
+                return func(*args, **kwargs)
+        return timed
+    return decorate
+
+
+class _observe:
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+
+    def __enter__(self):
+        UPSTREAM_IN_FLIGHT.labels(self.service).inc()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        UPSTREAM_IN_FLIGHT.labels(self.service).dec()
+        outcome = "error" if exc_type is not None else "ok"
+        UPSTREAM_LATENCY.labels(self.service, self.operation, outcome).observe(time.perf_counter() - self.started)
+        return False
+
+
+def _supabase_operation(request: httpx.Request):
+    parts = request.url.path.strip("/").split("/")
+    # Keep the endpoint (auth/v1/token, rest/v1/profiles, rest/v1/rpc/<name>) and drop ids
+    if parts[:2] == ["auth", "v1"]:
+        return "gotrue", "/".join(parts[2:4] if parts[2:3] == ["admin"] else parts[2:3])
+    if parts[:2] == ["rest", "v1"]:
+        return "postgrest", "/".join(parts[2:4] if parts[2:3] == ["rpc"] else parts[2:3])
+    return "supabase", parts[0] if parts else ""
+
+
+# Wraps the transport behind the shared Supabase HTTP client, so every GoTrue and
+# PostgREST call is timed without touching the call sites. The response body is read
+# after this returns, which for these small JSON replies is negligible.
+class TimedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        service, operation = _supabase_operation(request)
+        UPSTREAM_IN_FLIGHT.labels(service).inc()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.transport.handle_async_request(request)
+            outcome = f"{response.status_code // 100}xx"
+            return response
+        finally:
+            UPSTREAM_IN_FLIGHT.labels(service).dec()
+            UPSTREAM_LATENCY.labels(service, f"{request.method} {operation}", outcome).observe(time.perf_counter() - started)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+# Embedding and LLM calls are timed from llama_index's own instrumentation events, which
+# share a span id between the start and end of each call. Our embedding wrappers are
+# skipped so a cached or batched lookup isn't counted as an upstream call.
+WRAPPER_EMBEDDINGS = ("CachedEmbedding", "BatchedQueryEmbedding")
+MAX_OPEN_SPANS = 10000
+
+
+class LlamaIndexTimer(BaseEventHandler):
+    _open: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LlamaIndexTimer"
+
+    def handle(self, event, **kwargs):
+        span_id = event.span_id or ""
+        # Span ids look like "OpenAIEmbedding.aget_query_embedding-<uuid>"
+        operation = span_id.rsplit("-", 5)[0]
+        if isinstance(event, EmbeddingStartEvent):
+            if not operation.startswith(WRAPPER_EMBEDDINGS):
+                self._start(span_id, "embedding", operation)
+        elif isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent)):
+            self._start(span_id, "llm", operation)
+        elif isinstance(event, (LLMChatInProgressEvent, LLMCompletionInProgressEvent)):
+            with self._lock:
+                span = self._open.get(span_id)
+                first = span is not None and not span[3]
+                if first:
+                    span[3] = True
+            if first:
+                LLM_FIRST_TOKEN.labels(span[1]).observe(time.perf_counter() - span[2])
+        elif isinstance(event, (EmbeddingEndEvent, LLMChatEndEvent, LLMCompletionEndEvent)):
+            with self._lock:
+                span = self._open.pop(span_id, None)
+            if span is not None:
+                UPSTREAM_LATENCY.labels(span[0], span[1], "ok").observe(time.perf_counter() - span[2])
+
+    def _start(self, span_id: str, service: str, operation: str):
+        with self._lock:
+            self._open[span_id] = [service, operation, time.perf_counter(), False]
+            # Calls that fail never send an end event; forget the oldest ones
+            while len(self._open) > MAX_OPEN_SPANS:
+                self._open.popitem(last=False)
+
+
+# Cache and pool figures are read from the components' own stats() at scrape time
+class AppStatsCollector:
+    def collect(self):
+        from app.db.postgres import pool_status
+        from app.db import supabase as supabase_db
+        from app.services.llama_index import index_cache_stats
+        from app.services.embeddings import embedding_batcher_stats
+        from app.services.profiles import profile_cache_stats
+        from app.services.jobs import job_queue
+        from utils.embedding_cache import EMBED_CACHE_ENABLED, get_embedding_cache
+
+        caches = {"index": index_cache_stats(), "profile": profile_cache_stats()}
+        if EMBED_CACHE_ENABLED:
+            caches["embedding"] = get_embedding_cache().stats()
+        hits = CounterMetricFamily("cache_hits", "Cache lookups served from the cache", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache lookups that had to load the value", labels=["cache"])
+        evictions = CounterMetricFamily("cache_evictions", "Entries dropped to stay within the size limit", labels=["cache"])
+        entries = GaugeMetricFamily("cache_entries", "Entries currently cached", labels=["cache"])
+        for name, stats in caches.items():
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            evictions.add_metric([name], stats["evictions"])
+            entries.add_metric([name], stats["entries"])
+        yield from (hits, misses, evictions, entries)
+
+        batcher = embedding_batcher_stats()
+        if batcher:
+            yield CounterMetricFamily("embed_batcher_upstream_calls", "Batched query embedding calls sent upstream", value=batcher["upstream_calls"])
+            yield CounterMetricFamily("embed_batcher_items", "Query embeddings sent through the batcher", value=batcher["items"])
+            yield GaugeMetricFamily("embed_batcher_queue_depth", "Query embeddings waiting for the next batch", value=batcher["queue_depth"])
+
+        pool = pool_status()
+        db_pool = GaugeMetricFamily("db_pool_connections", "Postgres pool connections by state", labels=["state"])
+        db_pool.add_metric(["checked_out"], pool["checked_out"])
+        db_pool.add_metric(["idle"], pool["idle"])
+        db_pool.add_metric(["max"], pool["max_size"])
+        yield db_pool
+        yield GaugeMetricFamily("supabase_http_pool_max_connections", "Connection limit of the shared Supabase HTTP pool",
+                                value=supabase_db.SUPABASE_HTTP_MAX_CONNECTIONS)
+        yield GaugeMetricFamily("index_jobs_active", "Index jobs queued or running", value=job_queue.active)
+
+
+_process_hooks_installed = False
+
+
+# Call before including routers so the in-flight dependency reaches every route
+def setup_metrics(app):
+    global _process_hooks_installed
+    app.router.dependencies.append(Depends(track_in_flight))
+    app.add_middleware(MetricsMiddleware)
+    # `python main.py` imports main twice (as __main__ and as main:app); hook the
+    # process-wide dispatcher and registry only once
+    if not _process_hooks_installed:
+        get_dispatcher().add_event_handler(LlamaIndexTimer())
+        REGISTRY.register(AppStatsCollector())
+        _process_hooks_installed = True
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 
 class User(BaseModel):
     id: str
@@ -19,6 +19,43 @@ class Settings(BaseModel):
     notifications: Optional[bool] = True
     language: Optional[str] = "en"
 
+class SettingsUpdate(BaseModel):
+    user_id: str
+    settings: Settings
+
+class BulkSettingsRequest(BaseModel):
+    updates: List[SettingsUpdate]
+
+class QueryRequest(BaseModel):
+    query: str
+
+class IngestDocument(BaseModel):
+    doc_id: str
+    text: str
+    metadata: dict = {}
+
+class IngestRequest(BaseModel):
+    documents: List[IngestDocument]
+
 class UserCreate(BaseModel):
     email: str
     password: str
+
+class AuthUser(BaseModel):
+    id: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    role: Optional[str] = None
+    app_metadata: dict = {}
+    user_metadata: dict = {}
+
+    @classmethod
+    def from_claims(cls, claims: dict):
+        return cls(
+            id=claims["sub"],
+            email=claims.get("email"),
+            phone=claims.get("phone"),
+            role=claims.get("role"),
+            app_metadata=claims.get("app_metadata") or {},
+            user_metadata=claims.get("user_metadata") or {},
+        )
@@ -0,0 +1,151 @@
+import os
+import asyncio
+import logging
+from typing import Any, List
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+logger = logging.getLogger(__name__)
+
+# A batch is sent when it holds EMBED_BATCH_MAX_ITEMS queries or its oldest query has
+# waited EMBED_BATCH_MAX_WAIT_MS, whichever comes first
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{bound}" for bound in self.buckets] + ["inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "mean": round(self.total / self.count, 2) if self.count else None,
+        }
+
+
+# Collects embedding requests from concurrent coroutines and sends them upstream as one
+# batched call, then hands each caller its own vector. Must be used from a single event loop.
+class EmbeddingBatcher:
+    def __init__(self, embed_batch, max_items: int = EMBED_BATCH_MAX_ITEMS, max_wait_ms: float = EMBED_BATCH_MAX_WAIT_MS):
+        self.embed_batch = embed_batch
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+        self.upstream_calls = 0
+        self.items = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_depths = Histogram(QUEUE_DEPTH_BUCKETS)
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.queue_depths.observe(len(self._pending))
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_items], self._pending[self.max_items:]
+        if self._pending:
+            # Leftovers from an oversized burst start their own wait window
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        if not batch:
+            return
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        self.upstream_calls += 1
+        self.items += len(batch)
+        self.batch_sizes.observe(len(batch))
+        try:
+            embeddings = await self.embed_batch([text for text, _ in batch])
+        except Exception as e:
+            logger.warning(f"Batched embedding of {len(batch)} queries failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), embedding in zip(batch, embeddings):
+            # A caller that was cancelled while waiting no longer needs its vector
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "upstream_calls": self.upstream_calls,
+            "items": self.items,
+            "batch_size": self.batch_sizes.to_dict(),
+            "queue_depth_on_arrival": self.queue_depths.to_dict(),
+        }
+
+
+# Embedding model whose async query embeddings go through an EmbeddingBatcher. Document
+# embeddings and the sync query path are delegated to the wrapped model unchanged.
+class BatchedQueryEmbedding(BaseEmbedding):
+    model: BaseEmbedding
+
+    _batcher: EmbeddingBatcher = PrivateAttr()
+
+    def __init__(self, model: BaseEmbedding, batcher: EmbeddingBatcher, **kwargs: Any):
+        super().__init__(model=model, model_name=model.model_name, embed_batch_size=model.embed_batch_size, **kwargs)
+        self._batcher = batcher
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BatchedQueryEmbedding"
+
+    @property
+    def batcher(self) -> EmbeddingBatcher:
+        return self._batcher
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._batcher.embed(query)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self.model.get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self.model.get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self.model.get_text_embedding_batch(texts)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return await self.model.aget_text_embedding(text)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self.model.aget_text_embedding_batch(texts)
@@ -0,0 +1,66 @@
+import os
+import hashlib
+from typing import List
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+# From the repository root package (pip install -e ..), which also backs the Streamlit index
+from utils.embedding_cache import cached_embed_model
+from app.services.embed_batcher import EmbeddingBatcher, BatchedQueryEmbedding
+
+# "openai" calls the embeddings API; "fake" hashes text locally for tests and benchmarks
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "openai")
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "text-embedding-ada-002")
+EMBED_DIM = int(os.getenv("EMBED_DIM", "1536"))
+# Coalesce concurrent query embeddings into batched upstream calls
+EMBED_QUERY_BATCHING = os.getenv("EMBED_QUERY_BATCHING", "true").lower() == "true"
+
+
+# Deterministic embedding: the same text always maps to the same unit vector
+class FakeEmbedding(BaseEmbedding):
+    embed_dim: int = EMBED_DIM
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.embed_dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._vector(text)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+_embed_model = None
+
+
+def get_embed_model() -> BaseEmbedding:
+    global _embed_model
+    if _embed_model is None:
+        if EMBED_PROVIDER == "fake":
+            model = FakeEmbedding(model_name="fake", embed_dim=EMBED_DIM)
+        else:
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            model = OpenAIEmbedding(model=EMBED_MODEL_NAME)
+        _embed_model = cached_embed_model(model)
+        if EMBED_QUERY_BATCHING:
+            # Both providers embed queries and documents the same way, so a batch of
+            # queries can go through the uncached document endpoint
+            _embed_model = BatchedQueryEmbedding(_embed_model, EmbeddingBatcher(model.aget_text_embedding_batch))
+    return _embed_model
+
+
+def embedding_batcher_stats() -> dict:
+    # Reading stats shouldn't be what creates the model
+    model = _embed_model
+    return model.batcher.stats() if isinstance(model, BatchedQueryEmbedding) else {}
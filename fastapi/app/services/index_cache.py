@@ -0,0 +1,115 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("value", "last_used")
+
+    def __init__(self, value):
+        self.value = value
+        self.last_used = time.monotonic()
+
+
+# LRU cache of per-user index handles with idle expiry and single-flight builds
+class IndexCache:
+    def __init__(self, max_entries: int, idle_ttl: float):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # Bumped by invalidate() while a key is being built, so the stale result isn't
+        # cached; only keys with a build in flight have an entry
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.builds = 0
+
+    def get_or_build(self, key, builder):
+        with self._lock:
+            self._expire_idle()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(key)
+                return entry.value
+
+            self.misses += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                generation = self._generations.pop(key, 0)
+
+        # Concurrent first requests for the same key wait for the one build in progress
+        if not owner:
+            return future.result()
+
+        try:
+            value = builder()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._generations.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self.builds += 1
+            self._inflight.pop(key, None)
+            # Skip caching a handle whose collection was invalidated mid-build
+            if self._generations.pop(key, 0) == generation:
+                self._insert(key, _Entry(value))
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._inflight:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            logger.debug(f"Invalidated cached index for {key}")
+
+    def clear(self):
+        with self._lock:
+            for key in self._inflight:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "builds": self.builds,
+                "inflight": len(self._inflight),
+            }
+
+    def _insert(self, key, entry: _Entry):
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            logger.debug(f"Evicted cached index for {evicted_key}")
+
+    def _expire_idle(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        # Entries are in LRU order, so the idle ones are at the front
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.last_used > cutoff:
+                break
+            del self._entries[key]
+            self.evictions += 1
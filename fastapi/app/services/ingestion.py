@@ -0,0 +1,168 @@
+import os
+import uuid
+import asyncio
+import logging
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+from app.db.supabase import run_sync
+from app.services.embeddings import get_embed_model
+from app.services.llama_index import get_user_index_handle, invalidate_user_index
+
+logger = logging.getLogger(__name__)
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1024"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "20"))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+INGEST_UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "500"))
+
+# Keys added for filtering that should not leak into embeddings or prompts
+_INTERNAL_METADATA = ["user_id"]
+
+
+class DocumentProgress:
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+        self.status = "pending"
+        self.chunks = 0
+        self.embedded = 0
+        self.error = None
+
+    def fail(self, error: Exception):
+        if self.status != "failed":
+            self.status = "failed"
+            self.error = str(error)
+
+    def to_dict(self) -> dict:
+        return {
+            "doc_id": self.doc_id,
+            "status": self.status,
+            "chunks": self.chunks,
+            "embedded": self.embedded,
+            "error": self.error,
+        }
+
+
+def _node_id_func(user_id: str):
+    # Stable ids make a retried document overwrite its earlier chunks instead of duplicating them
+    def node_id(i: int, doc) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{user_id}/{doc.doc_id}/{i}"))
+    return node_id
+
+
+def _chunk(user_id: str, documents: list, progress: dict) -> dict:
+    splitter = SentenceSplitter(
+        chunk_size=INGEST_CHUNK_SIZE,
+        chunk_overlap=INGEST_CHUNK_OVERLAP,
+        id_func=_node_id_func(user_id),
+    )
+    nodes_by_doc = {}
+    for doc in documents:
+        document = Document(
+            id_=doc.doc_id,
+            text=doc.text,
+            metadata={**doc.metadata, "user_id": user_id},
+            excluded_embed_metadata_keys=_INTERNAL_METADATA,
+            excluded_llm_metadata_keys=_INTERNAL_METADATA,
+        )
+        try:
+            nodes_by_doc[doc.doc_id] = splitter.get_nodes_from_documents([document])
+        except Exception as e:
+            progress[doc.doc_id].fail(e)
+            continue
+        progress[doc.doc_id].chunks = len(nodes_by_doc[doc.doc_id])
+        progress[doc.doc_id].status = "embedding"
+    return nodes_by_doc
+
+
+async def _embed_batches(nodes: list, progress: dict, on_progress=None):
+    embed_model = get_embed_model()
+    semaphore = asyncio.Semaphore(INGEST_EMBED_CONCURRENCY)
+
+    async def embed(batch):
+        async with semaphore:
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+            try:
+                embeddings = await embed_model.aget_text_embedding_batch(texts)
+            except Exception as e:
+                logger.warning(f"Embedding batch of {len(batch)} chunks failed: {e}")
+                for node in batch:
+                    progress[node.ref_doc_id].fail(e)
+                return
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+                progress[node.ref_doc_id].embedded += 1
+            if on_progress is not None:
+                on_progress(progress)
+
+    # Batches span documents so many small documents still fill each API call
+    batches = [nodes[i:i + INGEST_EMBED_BATCH_SIZE] for i in range(0, len(nodes), INGEST_EMBED_BATCH_SIZE)]
+    await asyncio.gather(*(embed(batch) for batch in batches))
+
+
+def _upsert(handle, nodes_by_doc: dict, progress: dict):
+    ready = [doc_id for doc_id, item in progress.items() if item.status == "embedding"]
+    batch = []
+    batch_docs = []
+
+    def flush():
+        try:
+            handle.vector_store.add(batch)
+        except Exception as e:
+            # Nothing was deleted yet, so the previous version of each document stays searchable
+            logger.warning(f"Upsert of {len(batch)} chunks failed: {e}")
+            for doc_id in batch_docs:
+                progress[doc_id].fail(e)
+        else:
+            for doc_id in batch_docs:
+                try:
+                    # Drop chunks left over from an earlier, longer version of this document
+                    handle.delete_document(doc_id, keep_ids=[node.node_id for node in nodes_by_doc[doc_id]])
+                    progress[doc_id].status = "indexed"
+                except Exception as e:
+                    progress[doc_id].fail(e)
+        batch.clear()
+        batch_docs.clear()
+
+    for doc_id in ready:
+        batch.extend(nodes_by_doc[doc_id])
+        batch_docs.append(doc_id)
+        if len(batch) >= INGEST_UPSERT_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+
+
+# Chunks, embeds and upserts documents for one user. Each document succeeds or fails on
+# its own; resubmitting the failed ones is safe because chunk ids are deterministic.
+async def ingest_documents(user_id: str, documents: list, on_progress=None) -> list:
+    # A repeated doc_id would overwrite the first one's chunks; only the first is ingested
+    progress = {}
+    unique = []
+    duplicates = []
+    for doc in documents:
+        if doc.doc_id in progress:
+            duplicate = DocumentProgress(doc.doc_id)
+            duplicate.fail(ValueError(f"Duplicate doc_id {doc.doc_id!r} in this request"))
+            duplicates.append(duplicate)
+            continue
+        progress[doc.doc_id] = DocumentProgress(doc.doc_id)
+        unique.append(doc)
+    documents = unique
+    handle = await run_sync(get_user_index_handle, user_id)
+
+    nodes_by_doc = await run_sync(_chunk, user_id, documents, progress)
+
+    nodes = [node for doc_nodes in nodes_by_doc.values() for node in doc_nodes]
+    await _embed_batches(nodes, progress, on_progress)
+
+    await run_sync(_upsert, handle, nodes_by_doc, progress)
+    invalidate_user_index(user_id)
+    if on_progress is not None:
+        on_progress(progress)
+
+    results = [item.to_dict() for item in progress.values()] + [item.to_dict() for item in duplicates]
+    indexed = sum(1 for item in results if item["status"] == "indexed")
+    logger.info(f"Ingested {indexed}/{len(results)} documents for user {user_id}")
+    return results
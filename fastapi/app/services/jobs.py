@@ -0,0 +1,148 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+# Finished jobs stay queryable for this long
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# On shutdown, running jobs get this long to finish before they are cancelled
+JOB_SHUTDOWN_GRACE_SECONDS = float(os.getenv("JOB_SHUTDOWN_GRACE_SECONDS", "5"))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, user_id: str, key: tuple):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.user_id = user_id
+        self.key = key
+        self.state = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# Runs index jobs on a bounded number of workers. Submitting a job whose key matches
+# one that is still queued or running returns the existing job instead of a new one,
+# and jobs for the same user run one at a time so a collection is never built twice
+# in parallel.
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 timeout: float = JOB_TIMEOUT_SECONDS, retention: float = JOB_RETENTION_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retention = retention
+        self._jobs = {}
+        self._active = {}
+        self._user_locks = {}
+        self._tasks = set()
+        self._semaphore = None
+        self._closing = False
+
+    def submit(self, kind: str, user_id: str, func, dedupe_key: str = ""):
+        if self._closing:
+            raise QueueFull("The server is shutting down")
+        self._prune()
+        key = (user_id, kind, dedupe_key)
+        existing = self._active.get(key)
+        if existing is not None:
+            return self._jobs[existing], False
+        if len(self._active) >= self.max_pending:
+            raise QueueFull("Too many index jobs are pending")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        job = Job(kind, user_id, key)
+        self._jobs[job.id] = job
+        self._active[key] = job.id
+        task = asyncio.create_task(self._run(job, func))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f"Queued {kind} job {job.id} for user {user_id}")
+        return job, True
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def get(self, job_id: str) -> Job:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: Job, func):
+        user_lock = self._user_locks.setdefault(job.user_id, asyncio.Lock())
+        try:
+            async with user_lock, self._semaphore:
+                # Queued jobs don't start once shutdown has begun
+                if self._closing:
+                    raise asyncio.CancelledError()
+                job.state = "running"
+                job.started_at = time.time()
+                job.result = await asyncio.wait_for(func(job), timeout=self.timeout)
+                job.state = "succeeded"
+        except asyncio.TimeoutError:
+            job.state = "failed"
+            job.error = f"Job timed out after {self.timeout:.0f}s"
+        except asyncio.CancelledError:
+            job.state = "cancelled"
+            raise
+        except Exception as e:
+            logger.exception(f"{job.kind} job {job.id} for user {job.user_id} failed")
+            job.state = "failed"
+            job.error = str(getattr(e, "detail", e))
+        finally:
+            job.finished_at = time.time()
+            self._active.pop(job.key, None)
+            if not user_lock.locked() and not any(key[0] == job.user_id for key in self._active):
+                self._user_locks.pop(job.user_id, None)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    # Called from the app lifespan; the semaphore belongs to the event loop it runs on
+    def start(self):
+        self._closing = False
+        self._semaphore = None
+
+    async def shutdown(self, grace: float = JOB_SHUTDOWN_GRACE_SECONDS):
+        self._closing = True
+        if self._tasks and grace > 0:
+            await asyncio.wait(list(self._tasks), timeout=grace)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+job_queue = JobQueue()
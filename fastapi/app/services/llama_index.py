@@ -1,58 +1,222 @@
+import json
 import logging
-from llama_index.core import VectorStoreIndex, StorageContext
+import threading
+import vecs
+from fastapi import HTTPException
+from llama_index.core import VectorStoreIndex
+from llama_index.core.constants import DEFAULT_EMBEDDING_DIM
+from llama_index.core.vector_stores import MetadataFilters, MetadataFilter
 from llama_index.vector_stores.supabase import SupabaseVectorStore
-from app.db.supabase import SUPABASE_URL, SUPABASE_KEY
+from sqlalchemy import text
+from app.db.postgres import get_engine, get_vecs_client
+from app.db.supabase import run_sync
+from app.services.index_cache import IndexCache
+from app.metrics import upstream_timer
+from app.services.embeddings import EMBED_PROVIDER, get_embed_model
 import os
-from urllib.parse import urlparse
 import asyncio
 from asyncio import TimeoutError
 logger = logging.getLogger(__name__)
 
+# Handles come from from_vector_store, so nodes, text and vectors stay in Postgres and
+# every handle holds about the same few objects; the entry count is the only cap
+INDEX_CACHE_MAX_ENTRIES = int(os.getenv("INDEX_CACHE_MAX_ENTRIES", "256"))
+INDEX_CACHE_IDLE_TTL = float(os.getenv("INDEX_CACHE_IDLE_TTL", "900"))
+
+# "per_user" keeps one user_collection_<id> table per user; "shared" stores every
+# user's embeddings in one indexed collection filtered by the user_id metadata key
+VECTOR_STORAGE_MODE = os.getenv("VECTOR_STORAGE_MODE", "per_user")
+VECTOR_SHARED_COLLECTION = os.getenv("VECTOR_SHARED_COLLECTION", "user_documents")
+VECTOR_INDEX_METHOD = os.getenv("VECTOR_INDEX_METHOD", "hnsw")
+VECTOR_HNSW_M = int(os.getenv("VECTOR_HNSW_M", "16"))
+VECTOR_HNSW_EF_CONSTRUCTION = int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "64"))
+# Candidate list size for HNSW queries (vecs' default is 40); see also
+# VECTOR_HNSW_ITERATIVE_SCAN in app/db/postgres.py for filtered queries
+VECTOR_HNSW_EF_SEARCH = int(os.getenv("VECTOR_HNSW_EF_SEARCH", "100"))
+# 0 lets vecs pick the list count from the row count
+VECTOR_IVFFLAT_LISTS = int(os.getenv("VECTOR_IVFFLAT_LISTS", "0"))
+
+# vecs runs every query under SET LOCAL hnsw.ef_search, which overrides any connection
+# setting, and SupabaseVectorStore never passes a value; this passes VECTOR_HNSW_EF_SEARCH
+class SearchTunedCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def query(self, *args, **kwargs):
+        kwargs.setdefault("ef_search", max(VECTOR_HNSW_EF_SEARCH, kwargs.get("limit", 10)))
+        return self._collection.query(*args, **kwargs)
+
+# SupabaseVectorStore opens a new engine per collection; this one reuses the process-wide pool
+class PooledSupabaseVectorStore(SupabaseVectorStore):
+    def __init__(self, collection_name: str, dimension: int = DEFAULT_EMBEDDING_DIM, **kwargs):
+        super(SupabaseVectorStore, self).__init__(**kwargs)
+        self._client = get_vecs_client()
+        self._collection = SearchTunedCollection(self._client.get_or_create_collection(name=collection_name, dimension=dimension))
+
+    def __del__(self):
+        # The shared pool outlives any single store, so never dispose it here
+        pass
+
+    @upstream_timer("vector_store", "add")
+    def add(self, nodes, **kwargs):
+        return super().add(nodes, **kwargs)
+
+    @upstream_timer("vector_store", "query")
+    def query(self, query, **kwargs):
+        return super().query(query, **kwargs)
+
+    @upstream_timer("vector_store", "delete")
+    def delete(self, ref_doc_id: str, **delete_kwargs):
+        return super().delete(ref_doc_id, **delete_kwargs)
+
+    async def aquery(self, query, **kwargs):
+        # vecs is synchronous; keep it off the event loop
+        return await run_sync(self.query, query, **kwargs)
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+def ensure_vector_index(collection):
+    if collection.index is not None:
+        return
+    method = vecs.IndexMethod(VECTOR_INDEX_METHOD)
+    if method == vecs.IndexMethod.hnsw:
+        index_arguments = vecs.IndexArgsHNSW(m=VECTOR_HNSW_M, ef_construction=VECTOR_HNSW_EF_CONSTRUCTION)
+    elif method == vecs.IndexMethod.ivfflat and VECTOR_IVFFLAT_LISTS:
+        index_arguments = vecs.IndexArgsIVFFlat(n_lists=VECTOR_IVFFLAT_LISTS)
+    else:
+        index_arguments = None
+    logger.info(f"Creating {method.value} index on collection {collection.name}")
+    try:
+        collection.create_index(
+            measure=vecs.IndexMeasure.cosine_distance,
+            method=method,
+            index_arguments=index_arguments,
+            replace=False,
+        )
+    except vecs.exc.ArgError:
+        # Another worker created the index first
+        logger.debug(f"Vector index already exists on collection {collection.name}")
+
+def get_shared_vector_store() -> PooledSupabaseVectorStore:
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            store = PooledSupabaseVectorStore(collection_name=VECTOR_SHARED_COLLECTION)
+            ensure_vector_index(store._collection)
+            _shared_store = store
+    return _shared_store
+
+def user_filters(user_id: str) -> MetadataFilters:
+    return MetadataFilters(filters=[MetadataFilter(key="user_id", value=user_id)])
+
+class UserIndexHandle:
+    def __init__(self, user_id: str, index: VectorStoreIndex, filters: MetadataFilters = None):
+        self.user_id = user_id
+        self.index = index
+        self.filters = filters
+        self._query_engine = None
+        self._streaming_engine = None
+
+    @property
+    def vector_store(self) -> PooledSupabaseVectorStore:
+        return self.index.vector_store
+
+    # Engines are created on first use so ingestion never has to set up an LLM
+    @property
+    def query_engine(self):
+        if self._query_engine is None:
+            self._query_engine = self.index.as_query_engine(filters=self.filters)
+        return self._query_engine
+
+    @property
+    def streaming_engine(self):
+        if self._streaming_engine is None:
+            self._streaming_engine = self.index.as_query_engine(filters=self.filters, streaming=True)
+        return self._streaming_engine
+
+    # Removes every chunk of one source document, scoped to this user in the shared collection
+    @upstream_timer("vector_store", "delete_document")
+    # Deletes the document's chunks, except the ids in keep_ids when given
+    def delete_document(self, doc_id: str, keep_ids: list = None) -> int:
+        match = {"doc_id": doc_id}
+        if self.filters is not None:
+            match["user_id"] = self.user_id
+        table = self.vector_store._collection.name
+        query = f'delete from vecs."{table}" where metadata @> cast(:match as jsonb)'
+        params = {"match": json.dumps(match)}
+        if keep_ids is not None:
+            query += " and not (id = any(cast(:keep_ids as text[])))"
+            params["keep_ids"] = list(keep_ids)
+        with get_engine().begin() as connection:
+            result = connection.execute(text(query), params)
+        return result.rowcount
+
+index_cache = IndexCache(max_entries=INDEX_CACHE_MAX_ENTRIES, idle_ttl=INDEX_CACHE_IDLE_TTL)
+
+# The build keeps running in its worker thread after a timeout and is cached when it
+# finishes; only the caller stops waiting.
 async def get_user_index_with_timeout(user_id: str, timeout: int = 30):
     try:
-        return await asyncio.wait_for(get_user_index(user_id), timeout=timeout)
+        return await asyncio.wait_for(run_sync(get_user_index, user_id), timeout=timeout)
     except TimeoutError:
         logger.error(f"Timeout occurred while creating index for user {user_id}")
         raise HTTPException(status_code=504, detail="Index creation timed out")
-    
-def get_user_index(user_id: str):
-    logger.info(f"Starting get_user_index for user: {user_id}")
-    
-    if 'OPENAI_API_KEY' not in os.environ:
+
+def _build_user_index(user_id: str) -> UserIndexHandle:
+    logger.info(f"Building index handle for user: {user_id}")
+
+    if EMBED_PROVIDER == "openai" and 'OPENAI_API_KEY' not in os.environ:
         logger.error("OPENAI_API_KEY is not set in the environment variables")
         raise ValueError("OPENAI_API_KEY is not set in the environment variables")
 
     try:
-        parsed_url = urlparse(SUPABASE_URL)
-        DB_CONNECTION = f"postgresql://{parsed_url.username}:{parsed_url.password}@{parsed_url.hostname}:{parsed_url.port or 5432}/{parsed_url.path.lstrip('/')}"
-        logger.debug(f"Constructed DB_CONNECTION (sensitive info redacted): postgresql://{parsed_url.username}:****@{parsed_url.hostname}:{parsed_url.port or 5432}/{parsed_url.path.lstrip('/')}")
-
         logger.info("Initializing SupabaseVectorStore")
-        vector_store = SupabaseVectorStore(
-            postgres_connection_string=DB_CONNECTION,
-            collection_name=f'user_collection_{user_id}'
-        )
-        
-        logger.info("Creating StorageContext")
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        
+        if VECTOR_STORAGE_MODE == "shared":
+            vector_store = get_shared_vector_store()
+            filters = user_filters(user_id)
+        else:
+            vector_store = PooledSupabaseVectorStore(collection_name=f'user_collection_{user_id}')
+            filters = None
+
         logger.info("Creating VectorStoreIndex")
-        index = VectorStoreIndex.from_documents([], storage_context=storage_context)
-        
+        index = VectorStoreIndex.from_vector_store(vector_store, embed_model=get_embed_model())
+
         logger.info(f"Successfully created index for user: {user_id}")
-        return index
+        return UserIndexHandle(user_id, index, filters)
     except Exception as e:
         logger.exception(f"Error in get_user_index for user {user_id}")
         raise
 
+def get_user_index_handle(user_id: str) -> UserIndexHandle:
+    return index_cache.get_or_build(user_id, lambda: _build_user_index(user_id))
+
+def get_user_index(user_id: str):
+    return get_user_index_handle(user_id).index
+
+# Call whenever a user's collection changes so the next query sees the new data
+def invalidate_user_index(user_id: str):
+    index_cache.invalidate(user_id)
+
+def index_cache_stats() -> dict:
+    return index_cache.stats()
+
 def query_user_index(user_id: str, query: str):
     logger.info(f"Starting query_user_index for user: {user_id}")
     try:
-        index = get_user_index(user_id)
-        query_engine = index.as_query_engine()
-        response = query_engine.query(query)
+        handle = get_user_index_handle(user_id)
+        response = handle.query_engine.query(query)
         logger.info(f"Successfully queried index for user: {user_id}")
         return str(response)
     except Exception as e:
         logger.exception(f"Error in query_user_index for user {user_id}")
-        raise
\ No newline at end of file
+        raise
+
+# Retrieves context and starts the LLM answer; iterate async_response_gen() for tokens
+async def stream_user_index(user_id: str, query: str):
+    logger.info(f"Starting stream_user_index for user: {user_id}")
+    handle = await run_sync(get_user_index_handle, user_id)
+    return await handle.streaming_engine.aquery(query)
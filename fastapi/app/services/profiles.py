@@ -0,0 +1,176 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+from supabase import AsyncClient
+# From the repository root package (pip install -e ..); this process's own cache instance
+from utils.profile_cache import get_profile_cache
+
+logger = logging.getLogger(__name__)
+
+# Columns the batch and export endpoints may project
+PROFILE_FIELDS = ("id", "user_id", "full_name", "email", "bio", "age", "theme", "notifications", "language", "created_at", "updated_at")
+# Ids per PostgREST `in` filter, which travels in the URL
+PROFILE_IN_CHUNK = int(os.getenv("PROFILE_IN_CHUNK", "200"))
+PROFILE_BULK_CHUNK_SIZE = int(os.getenv("PROFILE_BULK_CHUNK_SIZE", "500"))
+
+profile_cache = get_profile_cache()
+
+
+async def fetch_updated_at(supabase: AsyncClient, user_id: str):
+    response = await supabase.table("profiles").select("updated_at").eq("user_id", user_id).execute()
+    return response.data[0]["updated_at"] if response.data else None
+
+
+async def get_profile(supabase: AsyncClient, user_id: str, email: str = None):
+    async def load(user_id: str):
+        response = await supabase.rpc("get_or_create_profile", {"user_id": user_id, "email": email}).execute()
+        return response.data or None
+
+    return await profile_cache.aget_or_load(user_id, load, lambda user_id: fetch_updated_at(supabase, user_id))
+
+
+async def refresh_profile(supabase: AsyncClient, user_id: str, email: str = None):
+    profile_cache.invalidate(user_id)
+    return await get_profile(supabase, user_id, email)
+
+
+# The cached profile checked against the row's updated_at right now, whatever the
+# revalidation interval; reloaded if another worker has changed it
+async def current_profile(supabase: AsyncClient, user_id: str, profile: dict, email: str = None):
+    if await fetch_updated_at(supabase, user_id) == profile.get("updated_at"):
+        return profile
+    return await refresh_profile(supabase, user_id, email)
+
+
+# With updated_at the row is only changed if nobody else has changed it since
+async def update_profile(supabase: AsyncClient, user_id: str, values: dict, updated_at: str = None):
+    query = supabase.table("profiles").update(values).eq("user_id", user_id)
+    if updated_at is not None:
+        query = query.eq("updated_at", updated_at)
+    response = await query.execute()
+    profile = response.data[0] if response.data else None
+    profile_cache.write(user_id, profile)
+    return profile
+
+
+# Strong validator for a profile: updated_at is bumped by the update_profiles_modtime
+# trigger on every write, so it changes exactly when the row does
+def profile_etag(profile: dict) -> str:
+    version = f"{profile.get('user_id')}:{profile.get('updated_at')}"
+    return '"' + hashlib.sha256(version.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+# If-None-Match compares weakly (a W/ prefix is ignored), If-Match strongly
+def etag_matches(header: str, etag: str, weak: bool) -> bool:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# Raises ValueError for anything that isn't a UUID, so ids can go into an `in` filter safely
+def parse_user_ids(ids) -> list:
+    parsed = []
+    for user_id in ids:
+        user_id = str(uuid.UUID(user_id.strip()))
+        if user_id not in parsed:
+            parsed.append(user_id)
+    return parsed
+
+
+def parse_fields(fields: str = None) -> str:
+    if not fields:
+        return ",".join(PROFILE_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in PROFILE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown profile fields: {', '.join(unknown)}")
+    # Rows are matched back to users by user_id, so it is always returned
+    if "user_id" not in selected:
+        selected.insert(0, "user_id")
+    return ",".join(selected)
+
+
+# Several profiles with one `in` query per PROFILE_IN_CHUNK ids, sent concurrently
+async def fetch_profiles(supabase: AsyncClient, user_ids: list, columns: str) -> list:
+    async def fetch(chunk):
+        response = await supabase.table("profiles").select(columns).in_("user_id", chunk).execute()
+        return response.data
+
+    pages = await asyncio.gather(*(fetch(chunk) for chunk in _chunks(user_ids, PROFILE_IN_CHUNK)))
+    return [row for page in pages for row in page]
+
+
+# Keyset pagination on the unique user_id, so every page is an index range scan
+# however deep the export goes; yields one page of rows at a time
+async def iter_profiles(supabase: AsyncClient, columns: str, page_size: int, after: str = None):
+    while True:
+        query = supabase.table("profiles").select(columns).order("user_id").limit(page_size)
+        if after is not None:
+            query = query.gt("user_id", after)
+        response = await query.execute()
+        if not response.data:
+            return
+        yield response.data
+        if len(response.data) < page_size:
+            return
+        after = response.data[-1]["user_id"]
+
+
+async def _upsert_settings(supabase: AsyncClient, rows: list) -> list:
+    response = await supabase.table("profiles").upsert(rows, on_conflict="user_id", default_to_null=False).execute()
+    for row in response.data:
+        profile_cache.write(row["user_id"], row)
+    return response.data
+
+
+# Applies {user_id: values} partial updates. Rows changing the same columns are upserted
+# together in chunks of PROFILE_BULK_CHUNK_SIZE (PostgREST needs the same keys in every
+# row of a bulk request); a chunk that fails is retried row by row so one bad update
+# doesn't fail the rest. Returns a result per user.
+async def bulk_update_settings(supabase: AsyncClient, updates: dict) -> dict:
+    results = {}
+    existing = {row["user_id"] for row in await fetch_profiles(supabase, list(updates), "user_id")}
+    groups = {}
+    for user_id, values in updates.items():
+        if user_id not in existing:
+            # An upsert would create a profile here, which a settings update shouldn't do
+            results[user_id] = {"user_id": user_id, "status": "not_found"}
+        elif not values:
+            results[user_id] = {"user_id": user_id, "status": "unchanged"}
+        else:
+            groups.setdefault(tuple(sorted(values)), []).append({"user_id": user_id, **values})
+
+    for rows in groups.values():
+        for chunk in _chunks(rows, PROFILE_BULK_CHUNK_SIZE):
+            try:
+                written = await _upsert_settings(supabase, chunk)
+            except Exception as e:
+                logger.warning(f"Bulk settings upsert of {len(chunk)} rows failed, retrying one by one: {e}")
+                written = []
+                for row in chunk:
+                    try:
+                        written += await _upsert_settings(supabase, [row])
+                    except Exception as row_error:
+                        profile_cache.invalidate(row["user_id"])
+                        results[row["user_id"]] = {"user_id": row["user_id"], "status": "failed", "error": str(row_error)}
+            for row in written:
+                results[row["user_id"]] = {"user_id": row["user_id"], "status": "updated", "updated_at": row.get("updated_at")}
+
+    return results
+
+
+def profile_cache_stats() -> dict:
+    return profile_cache.stats()
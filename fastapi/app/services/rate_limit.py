@@ -0,0 +1,221 @@
+import os
+import math
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from app.metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# "memory" keeps buckets per worker; "sqlite" shares them between the workers on one host
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", os.path.expanduser("~/.cache/supabase-authentication/rate_limits.sqlite3"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Seconds a check waits for another worker's write lock before failing open
+RATE_LIMIT_SQLITE_TIMEOUT = float(os.getenv("RATE_LIMIT_SQLITE_TIMEOUT", "0.05"))
+# Buckets untouched for this long are full again and can be forgotten
+RATE_LIMIT_STATE_TTL = float(os.getenv("RATE_LIMIT_STATE_TTL", "86400"))
+# Upstream GoTrue calls in flight per worker; callers wait up to the queue timeout for a slot
+AUTH_UPSTREAM_CONCURRENCY = int(os.getenv("AUTH_UPSTREAM_CONCURRENCY", "20"))
+AUTH_UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("AUTH_UPSTREAM_QUEUE_TIMEOUT", "1"))
+
+# "<requests>/<seconds>": a bucket of that many tokens refilled evenly over the period
+DEFAULT_LIMITS = {
+    "login": ("20/60", "5/60"),
+    "register": ("10/3600", "3/3600"),
+    "reset_password": ("5/900", "3/3600"),
+}
+
+
+class Rule:
+    def __init__(self, spec: str):
+        requests, _, seconds = spec.partition("/")
+        self.capacity = float(requests)
+        self.rate = self.capacity / float(seconds)
+        self.spec = spec
+
+
+def endpoint_rules(endpoint: str) -> tuple:
+    per_ip, per_account = DEFAULT_LIMITS[endpoint]
+    prefix = f"RATE_LIMIT_{endpoint.upper()}"
+    return Rule(os.getenv(f"{prefix}_PER_IP", per_ip)), Rule(os.getenv(f"{prefix}_PER_ACCOUNT", per_account))
+
+
+# Both backends implement take(key, capacity, rate, now) -> seconds until a token is
+# available, 0 when one was taken. blocking backends do I/O and are called off the event loop.
+class MemoryBackend:
+    blocking = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+                # A flood of new keys evicts the least recently used buckets, which just
+                # start full again if they come back
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return (1 - bucket[0]) / rate
+            bucket[0] -= 1
+            return 0.0
+
+
+# One row per bucket, updated by a single upsert so concurrent workers can't both spend
+# the last token. Needs SQLite 3.35+ for RETURNING.
+class SQLiteBackend:
+    PRUNE_EVERY = 1000
+    blocking = True
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH, ttl: float = RATE_LIMIT_STATE_TTL,
+                 timeout: float = RATE_LIMIT_SQLITE_TIMEOUT):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Workers starting together may all create the schema; this one waits its turn
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        conn = self._connect()
+        row = conn.execute(
+            "INSERT INTO buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "tokens = min(:capacity, tokens + (:now - updated) * :rate) - 1, updated = :now "
+            "WHERE min(:capacity, tokens + (:now - updated) * :rate) >= 1 "
+            "RETURNING tokens",
+            {"key": key, "capacity": capacity, "rate": rate, "now": now},
+        ).fetchone()
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.ttl,))
+        if row is not None:
+            return 0.0
+        tokens, updated = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        return (1 - min(capacity, tokens + (now - updated) * rate)) / rate
+
+
+BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend}
+
+
+def account_key(account: str) -> str:
+    # Hashed so the SQLite file never holds email addresses
+    return hashlib.blake2b(account.strip().lower().encode(), digest_size=12).hexdigest()
+
+
+class RateLimiter:
+    def __init__(self, backend, rules: dict = None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.rules = rules or {endpoint: endpoint_rules(endpoint) for endpoint in DEFAULT_LIMITS}
+        self.enabled = enabled
+
+    # Seconds the caller should wait and which limit it hit, or (0, None) when admitted.
+    # The IP bucket is checked first so a blocked address doesn't drain account buckets.
+    def check(self, endpoint: str, ip: str, account: str = None, now: float = None):
+        if not self.enabled:
+            return 0.0, None
+        now = time.time() if now is None else now
+        per_ip, per_account = self.rules[endpoint]
+        try:
+            wait = self.backend.take(f"{endpoint}:ip:{ip}", per_ip.capacity, per_ip.rate, now)
+            if wait:
+                return wait, "ip"
+            if account:
+                wait = self.backend.take(f"{endpoint}:account:{account_key(account)}", per_account.capacity, per_account.rate, now)
+                if wait:
+                    return wait, "account"
+        except sqlite3.Error as e:
+            # Logins matter more than the limiter; let the request through
+            logger.warning(f"Rate limiter backend failed, admitting request: {e}")
+        return 0.0, None
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(BACKENDS[RATE_LIMIT_BACKEND]())
+        return _limiter
+
+
+def _check(endpoint: str, ip: str, account: str = None):
+    return get_rate_limiter().check(endpoint, ip, account)
+
+
+async def check_rate_limit(request: Request, endpoint: str, account: str = None):
+    ip = request.client.host if request.client else "unknown"
+    if BACKENDS[RATE_LIMIT_BACKEND].blocking:
+        # Creating the SQLite limiter and taking tokens both wait on the file. The default
+        # executor keeps this module free of the Supabase client (the benchmark imports it).
+        wait, scope = await asyncio.to_thread(_check, endpoint, ip, account)
+    else:
+        wait, scope = _check(endpoint, ip, account)
+    if scope is not None:
+        RATE_LIMITED.labels(endpoint, scope).inc()
+        raise HTTPException(status_code=429, detail="Too many requests, please retry later",
+                            headers={"Retry-After": str(math.ceil(wait))})
+
+
+# Caps GoTrue calls in flight per worker, so a burst queues briefly and then gets a 503
+# instead of piling onto the shared HTTP pool and slowing every other request
+class ConcurrencyLimit:
+    def __init__(self, limit: int = AUTH_UPSTREAM_CONCURRENCY, timeout: float = AUTH_UPSTREAM_QUEUE_TIMEOUT, name: str = "auth"):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.timeout = timeout
+        self.name = name
+
+    async def __aenter__(self):
+        if self.semaphore.locked():
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                RATE_LIMITED.labels(self.name, "concurrency").inc()
+                raise HTTPException(status_code=503, detail="Authentication service is busy, please retry shortly",
+                                    headers={"Retry-After": "1"})
+        else:
+            await self.semaphore.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+        return False
+
+
+auth_upstream_limit = ConcurrencyLimit()
@@ -0,0 +1,178 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import httpx
+import jwt
+from app.db.supabase import SUPABASE_URL, run_sync
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWT_ISSUER = os.getenv("SUPABASE_JWT_ISSUER", f"{SUPABASE_URL.rstrip('/')}/auth/v1")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", f"{SUPABASE_JWT_ISSUER}/.well-known/jwks.json")
+JWKS_REFRESH_SECONDS = int(os.getenv("SUPABASE_JWKS_REFRESH_SECONDS", "600"))
+# Minimum gap between forced refreshes triggered by an unknown "kid"
+JWKS_MIN_REFRESH_SECONDS = int(os.getenv("SUPABASE_JWKS_MIN_REFRESH_SECONDS", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_LEEWAY_SECONDS = int(os.getenv("TOKEN_LEEWAY_SECONDS", "10"))
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+
+class TokenVerificationError(Exception):
+    pass
+
+
+class LocalVerificationUnavailable(TokenVerificationError):
+    pass
+
+
+class JWKSCache:
+    def __init__(self, url: str, refresh_seconds: int = JWKS_REFRESH_SECONDS):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._last_fetch = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        # Serialises on-demand fetches so a burst of requests with a new kid fetches once
+        self._refresh_lock = asyncio.Lock()
+
+    def refresh(self):
+        response = httpx.get(self.url, timeout=5.0)
+        response.raise_for_status()
+        keys = {}
+        for jwk_data in response.json().get("keys", []):
+            try:
+                keys[jwk_data.get("kid")] = jwt.PyJWK(jwk_data)
+            except jwt.PyJWKError:
+                logger.warning(f"Skipping unsupported JWK with kid {jwk_data.get('kid')}")
+        # Swap the whole key set so keys removed upstream stop verifying immediately
+        with self._lock:
+            self._keys = keys
+            self._last_fetch = time.monotonic()
+        logger.debug(f"Loaded {len(keys)} signing keys from {self.url}")
+
+    def _lookup(self, kid: str):
+        with self._lock:
+            key = self._keys.get(kid)
+            stale = time.monotonic() - self._last_fetch > JWKS_MIN_REFRESH_SECONDS
+        return key, stale
+
+    async def get_key(self, kid: str):
+        key, stale = self._lookup(kid)
+        if key is None and stale:
+            # An unknown kid usually means the signing key was rotated
+            async with self._refresh_lock:
+                # Another request may have refreshed while this one waited
+                key, stale = self._lookup(kid)
+                if key is None and stale:
+                    try:
+                        # httpx.get is blocking; keep it off the event loop
+                        await run_sync(self.refresh)
+                    except Exception as e:
+                        # Wait out the minimum gap before trying a failing endpoint again
+                        with self._lock:
+                            self._last_fetch = time.monotonic()
+                        raise TokenVerificationError(f"Could not fetch signing keys: {e}") from e
+                    key, _ = self._lookup(kid)
+        if key is None:
+            raise TokenVerificationError(f"Unknown signing key: {kid}")
+        return key
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        # The first fetch happens on demand in get_key, so wait before refreshing
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the previous key set until the next attempt
+                logger.exception(f"Failed to refresh JWKS from {self.url}")
+
+
+class TokenVerifier:
+    def __init__(self, secret: str = SUPABASE_JWT_SECRET, jwks: JWKSCache = None,
+                 audience: str = SUPABASE_JWT_AUDIENCE, issuer: str = SUPABASE_JWT_ISSUER,
+                 cache_size: int = TOKEN_CACHE_SIZE):
+        self.secret = secret
+        self.jwks = jwks or JWKSCache(SUPABASE_JWKS_URL)
+        self.audience = audience
+        self.issuer = issuer
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, cache_key: str):
+        with self._lock:
+            entry = self._cache.get(cache_key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._cache[cache_key]
+                return None
+            self._cache.move_to_end(cache_key)
+            return claims
+
+    def _store(self, cache_key: str, claims: dict):
+        with self._lock:
+            self._cache[cache_key] = (claims["exp"], claims)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def _signing_key(self, header: dict):
+        algorithm = header.get("alg")
+        if algorithm == "HS256":
+            if not self.secret:
+                raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET is not set")
+            return self.secret
+        if algorithm in ASYMMETRIC_ALGORITHMS:
+            self.jwks.start()
+            return await self.jwks.get_key(header.get("kid"))
+        raise TokenVerificationError(f"Unsupported token algorithm: {algorithm}")
+
+    async def verify(self, token: str) -> dict:
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        claims = self._cached(cache_key)
+        if claims is not None:
+            return claims
+
+        try:
+            header = jwt.get_unverified_header(token)
+            key = await self._signing_key(header)
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[header.get("alg")],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=TOKEN_LEEWAY_SECONDS,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(str(e)) from e
+
+        self._store(cache_key, claims)
+        return claims
+
+
+token_verifier = TokenVerifier()
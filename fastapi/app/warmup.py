@@ -0,0 +1,148 @@
+import os
+import time
+import signal
+import asyncio
+import inspect
+import logging
+import threading
+from app.db import supabase as supabase_db
+from app.db.postgres import check_database
+
+logger = logging.getLogger(__name__)
+
+WARMUP_DATABASE = os.getenv("WARMUP_DATABASE", "true").lower() == "true"
+WARMUP_JWKS = os.getenv("WARMUP_JWKS", "true").lower() == "true"
+# Users whose vector index handles are built before the worker reports ready
+WARMUP_INDEX_USERS = [user_id.strip() for user_id in os.getenv("WARMUP_INDEX_USERS", "").split(",") if user_id.strip()]
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "60"))
+# Stay unready when a warm-up step fails instead of serving with a cold component
+WARMUP_STRICT = os.getenv("WARMUP_STRICT", "false").lower() == "true"
+# Seconds between SIGTERM and the start of shutdown, during which /health/ready reports
+# 503 so the load balancer stops sending new requests while in-flight ones finish
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "0"))
+
+
+# starting -> ready (or failed with WARMUP_STRICT) -> draining -> stopping
+class WarmupState:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.state = "starting"
+        self.steps = {}
+        self.started_at = time.monotonic()
+        self.seconds = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def to_dict(self) -> dict:
+        return {"status": self.state, "warmup_seconds": self.seconds, "steps": self.steps}
+
+
+warmup_state = WarmupState()
+
+
+async def warm_supabase():
+    # Opens a keep-alive connection in the shared pool so the first login skips the TCP/TLS handshake
+    await supabase_db.http_client.get(f"{supabase_db.SUPABASE_URL}/auth/v1/health",
+                                      headers={"apikey": supabase_db.SUPABASE_KEY})
+
+
+def warm_jwks():
+    from app.services.token_verifier import token_verifier
+    token_verifier.jwks.refresh()
+    token_verifier.jwks.start()
+
+
+def warm_embed_model():
+    from app.services.embeddings import get_embed_model
+    get_embed_model()
+
+
+def warm_shared_store():
+    from app.services.llama_index import get_shared_vector_store
+    get_shared_vector_store()
+
+
+def warm_user_index(user_id: str):
+    from app.services.llama_index import get_user_index_handle
+    get_user_index_handle(user_id)
+
+
+def _steps():
+    first = {"supabase": warm_supabase, "embed_model": warm_embed_model}
+    if WARMUP_DATABASE:
+        first["database"] = check_database
+    if WARMUP_JWKS:
+        first["jwks"] = warm_jwks
+    # Index handles need the pool and the embedding model, so they come second
+    second = {}
+    from app.services.llama_index import VECTOR_STORAGE_MODE
+    if VECTOR_STORAGE_MODE == "shared":
+        second["shared_vector_store"] = warm_shared_store
+    for user_id in WARMUP_INDEX_USERS:
+        second[f"index:{user_id}"] = lambda user_id=user_id: warm_user_index(user_id)
+    return first, second
+
+
+async def _run_step(name: str, func):
+    started = time.perf_counter()
+    try:
+        if inspect.iscoroutinefunction(func):
+            await func()
+        else:
+            await supabase_db.run_sync(func)
+        warmup_state.steps[name] = {"status": "ok", "seconds": round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        logger.warning(f"Warm-up step {name} failed: {e}")
+        warmup_state.steps[name] = {"status": "failed", "seconds": round(time.perf_counter() - started, 3), "error": str(e)}
+
+
+async def warm_up():
+    first, second = _steps()
+
+    async def run_all():
+        await asyncio.gather(*(_run_step(name, func) for name, func in first.items()))
+        await asyncio.gather(*(_run_step(name, func) for name, func in second.items()))
+
+    try:
+        await asyncio.wait_for(run_all(), timeout=WARMUP_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # Steps on worker threads keep going; the worker just stops waiting for them
+        for name in list(first) + list(second):
+            warmup_state.steps.setdefault(name, {"status": "timeout"})
+
+    warmup_state.seconds = round(time.monotonic() - warmup_state.started_at, 3)
+    failed = [name for name, step in warmup_state.steps.items() if step["status"] != "ok"]
+    if warmup_state.state != "starting":
+        return
+    if failed and WARMUP_STRICT:
+        warmup_state.state = "failed"
+        logger.error(f"Warm-up failed ({', '.join(failed)}); not reporting ready")
+        return
+    warmup_state.state = "ready"
+    logger.info(f"Warm-up finished in {warmup_state.seconds}s" + (f" with failures: {', '.join(failed)}" if failed else ""))
+
+
+# uvicorn installs its SIGTERM handler before the lifespan starts; wrap it so the worker
+# first reports unready for SHUTDOWN_DRAIN_SECONDS. A second SIGTERM shuts down at once.
+def install_drain_handler():
+    if SHUTDOWN_DRAIN_SECONDS <= 0 or threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous):
+        return
+
+    def drain(sig, frame):
+        if warmup_state.state == "draining":
+            previous(sig, frame)
+            return
+        warmup_state.state = "draining"
+        logger.info(f"Draining for {SHUTDOWN_DRAIN_SECONDS}s before shutting down")
+        timer = threading.Timer(SHUTDOWN_DRAIN_SECONDS, previous, (sig, frame))
+        timer.daemon = True
+        timer.start()
+
+    signal.signal(signal.SIGTERM, drain)
@@ -0,0 +1,92 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from app.services.embed_batcher import EmbeddingBatcher
+
+# Compares one upstream call per query against micro-batched calls, using a fake embedder
+# that charges a fixed round trip plus a per-item cost and allows a limited number of
+# calls in flight (as an HTTP pool or API rate limit would):
+#   python -m benchmarks.embed_batching --rps 400 --seconds 5 [--json]
+
+
+class FakeUpstream:
+    def __init__(self, round_trip_ms: float, per_item_ms: float, concurrency: int):
+        self.round_trip = round_trip_ms / 1000
+        self.per_item = per_item_ms / 1000
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.calls = 0
+
+    async def embed_batch(self, texts):
+        async with self.semaphore:
+            self.calls += 1
+            await asyncio.sleep(self.round_trip + self.per_item * len(texts))
+            return [[float(len(text))] for text in texts]
+
+
+async def run(mode: str, args) -> dict:
+    upstream = FakeUpstream(args.round_trip_ms, args.per_item_ms, args.upstream_concurrency)
+    if mode == "batched":
+        batcher = EmbeddingBatcher(upstream.embed_batch, args.max_items, args.max_wait_ms)
+        embed = batcher.embed
+    else:
+        batcher = None
+
+        async def embed(text):
+            return (await upstream.embed_batch([text]))[0]
+
+    latencies = []
+
+    async def one(i):
+        started = time.perf_counter()
+        await embed(f"query {i}")
+        latencies.append(time.perf_counter() - started)
+
+    # Poisson arrivals at the requested rate
+    rng = np.random.default_rng(args.seed)
+    tasks = []
+    total = int(args.rps * args.seconds)
+    for i in range(total):
+        tasks.append(asyncio.create_task(one(i)))
+        await asyncio.sleep(rng.exponential(1 / args.rps))
+    await asyncio.gather(*tasks)
+
+    result = {
+        "mode": mode,
+        "requests": total,
+        "upstream_calls": upstream.calls,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 1),
+    }
+    if batcher is not None:
+        result["batch_size"] = batcher.stats()["batch_size"]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upstream calls and latency with and without query micro-batching")
+    parser.add_argument("--rps", type=float, default=400)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--round-trip-ms", type=float, default=30)
+    parser.add_argument("--per-item-ms", type=float, default=0.2)
+    parser.add_argument("--upstream-concurrency", type=int, default=16)
+    parser.add_argument("--max-items", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = [asyncio.run(run(mode, args)) for mode in ("direct", "batched")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    for result in results:
+        print(f"{result['mode']:<8} requests={result['requests']} upstream_calls={result['upstream_calls']} "
+              f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+import jwt
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# A local stand-in for the parts of GoTrue and PostgREST the API uses: password sign-in,
+# sign-up, password reset, get_user and the profiles table (select, update, upsert and
+# the get_or_create_profile RPC). Access tokens are HS256 JWTs signed with jwt_secret,
+# so an API started with the same SUPABASE_JWT_SECRET verifies them locally. Every
+# request waits latency_ms +/- jitter_ms and fails with a 503 at error_rate, or once
+# fail_after[name] requests of that upstream have been served.
+# PostgREST calls run as the role of their bearer token, as under sql/init.sql: the
+# service_key bypasses row level security, a user's access token sees only that user's
+# row, and anything else is anon, which can't call the RPC or touch profiles.
+
+
+class FakeSupabase:
+    def __init__(self, jwt_secret: str, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, seed: int = 0,
+                 service_key: str = "fake-service-role-key"):
+        self.jwt_secret = jwt_secret
+        self.service_key = service_key
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.url = None
+        self.users = {}
+        self.profiles = {}
+        # Access tokens whose session was signed out; only /auth/v1/user checks them
+        self.signed_out = set()
+        self.fail_after = {}
+        self.requests = Counter()
+        self.errors = Counter()
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/auth/v1/token", self.token, methods=["POST"]),
+            Route("/auth/v1/signup", self.signup, methods=["POST"]),
+            Route("/auth/v1/recover", self.recover, methods=["POST"]),
+            Route("/auth/v1/user", self.get_user, methods=["GET"]),
+            Route("/auth/v1/logout", self.logout, methods=["POST"]),
+            Route("/auth/v1/.well-known/jwks.json", self.jwks, methods=["GET"]),
+            Route("/rest/v1/rpc/get_or_create_profile", self.get_or_create_profile, methods=["POST"]),
+            Route("/rest/v1/profiles", self.profiles_table, methods=["GET", "PATCH", "POST"]),
+        ])
+
+    # Runs uvicorn on its own thread and event loop; returns the base URL once it is listening
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self.url = f"http://{host}:{sock.getsockname()[1]}"
+        config = uvicorn.Config(self.app(), log_level="warning", access_log=False, backlog=2048)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {"requests": dict(self.requests), "injected_errors": dict(self.errors)}
+
+    async def _upstream(self, name: str):
+        self.requests[name] += 1
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._random.random() < self.error_rate or self.requests[name] > self.fail_after.get(name, self.requests[name]):
+            self.errors[name] += 1
+            return JSONResponse({"message": "injected failure", "code": "503"}, status_code=503)
+        return None
+
+    def _user(self, email: str) -> dict:
+        user_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"fake-supabase/{email}"))
+        return self.users.setdefault(user_id, {
+            "id": user_id,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": email,
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {},
+            "created_at": "2024-01-01T00:00:00Z",
+        })
+
+    def _session(self, user: dict) -> dict:
+        now = int(time.time())
+        claims = {
+            "sub": user["id"],
+            "email": user["email"],
+            "role": "authenticated",
+            "aud": "authenticated",
+            "iss": f"{self.url}/auth/v1",
+            "iat": now,
+            "exp": now + 3600,
+            "app_metadata": user["app_metadata"],
+            "user_metadata": user["user_metadata"],
+        }
+        return {
+            "access_token": jwt.encode(claims, self.jwt_secret, algorithm="HS256"),
+            "refresh_token": uuid.uuid4().hex,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "expires_at": now + 3600,
+            "user": user,
+        }
+
+    def _token_user(self, request: Request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        try:
+            claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], audience="authenticated")
+        except jwt.PyJWTError:
+            return None
+        return self.users.get(claims["sub"])
+
+    # Returns (role, user id) for a PostgREST request
+    def _role(self, request: Request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if token == self.service_key:
+            return "service_role", None
+        user = self._token_user(request)
+        if user is not None:
+            return "authenticated", user["id"]
+        return "anon", None
+
+    def _denied(self, role: str, message: str) -> JSONResponse:
+        return JSONResponse({"code": "42501", "message": message}, status_code=401 if role == "anon" else 403)
+
+    async def token(self, request: Request):
+        if failure := await self._upstream("gotrue.token"):
+            return failure
+        body = await request.json()
+        return JSONResponse(self._session(self._user(body["email"])))
+
+    async def signup(self, request: Request):
+        if failure := await self._upstream("gotrue.signup"):
+            return failure
+        body = await request.json()
+        return JSONResponse(self._user(body["email"]))
+
+    async def recover(self, request: Request):
+        if failure := await self._upstream("gotrue.recover"):
+            return failure
+        return JSONResponse({})
+
+    async def get_user(self, request: Request):
+        if failure := await self._upstream("gotrue.user"):
+            return failure
+        user = self._token_user(request)
+        if user is None or request.headers.get("authorization", "").removeprefix("Bearer ") in self.signed_out:
+            return JSONResponse({"message": "invalid JWT"}, status_code=401)
+        return JSONResponse(user)
+
+    async def logout(self, request: Request):
+        if failure := await self._upstream("gotrue.logout"):
+            return failure
+        self.signed_out.add(request.headers.get("authorization", "").removeprefix("Bearer "))
+        return Response(status_code=204)
+
+    async def jwks(self, request: Request):
+        return JSONResponse({"keys": []})
+
+    def _now(self) -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _new_profile(self, user_id: str, email: str = None) -> dict:
+        now = self._now()
+        return {
+            "id": str(uuid.uuid4()), "user_id": user_id, "full_name": "New User", "email": email,
+            "bio": "This is your bio.", "age": None, "theme": "light", "notifications": True,
+            "language": "en", "created_at": now, "updated_at": now,
+        }
+
+    async def get_or_create_profile(self, request: Request):
+        if failure := await self._upstream("postgrest.rpc.get_or_create_profile"):
+            return failure
+        body = await request.json()
+        role, uid = self._role(request)
+        if role == "anon":
+            return self._denied(role, "permission denied for function get_or_create_profile")
+        if role == "authenticated" and body["user_id"] != uid:
+            return self._denied(role, "get_or_create_profile: user_id must be the caller's own id")
+        profile = self.profiles.get(body["user_id"])
+        if profile is None:
+            profile = self.profiles[body["user_id"]] = self._new_profile(body["user_id"], body.get("email"))
+        return JSONResponse(profile)
+
+    def _matches(self, profile: dict, request: Request) -> bool:
+        # Row level security: anon sees no rows and a user sees only their own
+        role, uid = self._role(request)
+        if role == "anon" or (role == "authenticated" and profile["user_id"] != uid):
+            return False
+        for column, condition in request.query_params.items():
+            if column in ("select", "order", "limit", "on_conflict", "columns"):
+                continue
+            operator, _, value = condition.partition(".")
+            if operator == "eq" and str(profile.get(column)) != value:
+                return False
+            if operator == "in" and str(profile.get(column)) not in value.strip("()").split(","):
+                return False
+            if operator == "gt" and not str(profile.get(column)) > value:
+                return False
+        return True
+
+    # Postgres rejects the whole statement when one row doesn't fit an integer column
+    def _invalid(self, rows: list):
+        for values in rows:
+            age = values.get("age")
+            if age is not None and not -2 ** 31 <= age < 2 ** 31:
+                return JSONResponse({"code": "22003", "message": f'value "{age}" is out of range for type integer'}, status_code=400)
+        return None
+
+    def _project(self, profile: dict, request: Request) -> dict:
+        select = request.query_params.get("select", "*")
+        if select == "*":
+            return profile
+        return {column: profile.get(column) for column in select.split(",")}
+
+    async def profiles_table(self, request: Request):
+        if failure := await self._upstream(f"postgrest.profiles.{request.method.lower()}"):
+            return failure
+        if request.method == "GET":
+            rows = sorted((p for p in self.profiles.values() if self._matches(p, request)), key=lambda p: p["user_id"])
+            if "limit" in request.query_params:
+                rows = rows[:int(request.query_params["limit"])]
+            return JSONResponse([self._project(p, request) for p in rows])
+
+        body = json.loads(await request.body())
+        if invalid := self._invalid(body if isinstance(body, list) else [body]):
+            return invalid
+        if request.method == "PATCH":
+            rows = [p for p in self.profiles.values() if self._matches(p, request)]
+            for profile in rows:
+                profile.update(body, updated_at=self._now())
+            return JSONResponse(rows)
+
+        # POST with on_conflict=user_id is an upsert
+        role, uid = self._role(request)
+        body = body if isinstance(body, list) else [body]
+        if role == "anon" or (role == "authenticated" and any(values["user_id"] != uid for values in body)):
+            return self._denied(role, 'new row violates row-level security policy for table "profiles"')
+        rows = []
+        for values in body:
+            profile = self.profiles.get(values["user_id"]) or self._new_profile(values["user_id"])
+            profile.update(values, updated_at=self._now())
+            self.profiles[values["user_id"]] = profile
+            rows.append(profile)
+        return JSONResponse(rows, status_code=201)
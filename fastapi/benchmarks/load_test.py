@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import httpx
+from benchmarks.fake_supabase import FakeSupabase
+
+# Starts the API against an in-process fake of GoTrue and PostgREST (see fake_supabase.py)
+# and drives it with a closed-loop async load generator: --concurrency workers each log in
+# as one of --users accounts, then loop over a weighted mix of requests for --seconds.
+# Prints requests/s and p50/p95/p99 latency per route and writes them to --output, which
+# CI can check against a stored run with --baseline:
+#   python -m benchmarks.load_test --seconds 20 --output load.json [--baseline baseline.json]
+
+FASTAPI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+JWT_SECRET = "load-test-secret-with-at-least-32-bytes"
+SERVICE_KEY = "load-test-service-role-key"
+DEFAULT_MIX = "profile=60,profile_etag=15,settings=15,login=10"
+THEMES = ("light", "dark")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(supabase_url: str, port: int, workers: int, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_KEY": SERVICE_KEY,
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "EMBED_PROVIDER": "fake",
+        "EMBED_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        # The fake has no Postgres behind it
+        "WARMUP_DATABASE": "false",
+        # Every virtual user logs in from 127.0.0.1, far beyond the per-IP login limit
+        "RATE_LIMIT_ENABLED": "false",
+    })
+    command = [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(command, cwd=FASTAPI_DIR, env=env)
+
+
+async def wait_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited with code {process.returncode} during start-up")
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("API did not become ready in time")
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("profile", "profile_etag", "settings", "login"):
+            raise ValueError(f"Unknown operation in --mix: {name}")
+        weights[name] = float(weight)
+    return weights
+
+
+class VirtualUser:
+    def __init__(self, email: str):
+        self.email = email
+        self.token = None
+        self.etag = None
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+# Each operation returns (route, status) so failures are counted per route
+async def login(client: httpx.AsyncClient, user: VirtualUser, rng: random.Random):
+    response = await client.post("/login", data={"username": user.email, "password": "load-test"})
+    if response.status_code == 200:
+        user.token = response.json()["access_token"]
+    return "POST /login", response.status_code
+
+
+async def read_profile(client: httpx.AsyncClient, user: VirtualUser, rng: random.Random):
+    response = await client.get("/profile", headers=user.headers)
+    user.etag = response.headers.get("etag", user.etag)
+    return "GET /profile", response.status_code
+
+
+async def read_profile_etag(client: httpx.AsyncClient, user: VirtualUser, rng: random.Random):
+    # A polling client that already has the profile; expects 304 until someone writes
+    headers = dict(user.headers)
+    if user.etag:
+        headers["If-None-Match"] = user.etag
+    response = await client.get("/profile", headers=headers)
+    user.etag = response.headers.get("etag", user.etag)
+    return "GET /profile (If-None-Match)", response.status_code
+
+
+async def update_settings(client: httpx.AsyncClient, user: VirtualUser, rng: random.Random):
+    response = await client.put("/settings", headers=user.headers, json={"theme": rng.choice(THEMES)})
+    user.etag = response.headers.get("etag", user.etag)
+    return "PUT /settings", response.status_code
+
+
+OPERATIONS = {"login": login, "profile": read_profile, "profile_etag": read_profile_etag, "settings": update_settings}
+
+
+async def run_load(client: httpx.AsyncClient, args) -> dict:
+    weights = parse_mix(args.mix)
+    names, cumulative = list(weights), np.cumsum(list(weights.values()))
+    users = [VirtualUser(f"load-user-{i}@example.com") for i in range(args.users)]
+    for user in users:
+        # Injected upstream errors can fail a login, so each account gets a few tries
+        for _ in range(10):
+            await login(client, user, None)
+            if user.token is not None:
+                break
+        else:
+            raise RuntimeError(f"Could not log in {user.email}; is the fake upstream failing every request?")
+
+    samples = {}
+    measuring = False
+    stop_at = time.monotonic() + args.warmup + args.seconds
+
+    async def worker(i: int):
+        rng = random.Random(args.seed + i)
+        user = users[i % len(users)]
+        while time.monotonic() < stop_at:
+            name = names[int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side="right"))]
+            started = time.perf_counter()
+            try:
+                route, status = await OPERATIONS[name](client, user, rng)
+            except httpx.HTTPError:
+                route, status = name, 0
+            elapsed = time.perf_counter() - started
+            if measuring:
+                samples.setdefault(route, []).append((elapsed, status))
+
+    async def start_measuring():
+        nonlocal measuring
+        await asyncio.sleep(args.warmup)
+        measuring = True
+
+    await asyncio.gather(start_measuring(), *(worker(i) for i in range(args.concurrency)))
+    return samples
+
+
+def summarize(samples: dict, seconds: float) -> dict:
+    routes = {}
+    for route, values in sorted(samples.items()):
+        latencies = np.array([elapsed for elapsed, _ in values]) * 1000
+        statuses = [status for _, status in values]
+        routes[route] = {
+            "requests": len(values),
+            "errors": sum(1 for status in statuses if status == 0 or status >= 400),
+            "rps": round(len(values) / seconds, 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "mean_ms": round(float(latencies.mean()), 2),
+            "statuses": {str(status): statuses.count(status) for status in sorted(set(statuses))},
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "routes": routes,
+        "total": {
+            "requests": total,
+            "errors": sum(route["errors"] for route in routes.values()),
+            "rps": round(total / seconds, 1),
+        },
+    }
+
+
+# A route regresses when its p95 grows or its throughput drops by more than tolerance
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for route, base in baseline.get("routes", {}).items():
+        current = results["routes"].get(route)
+        if current is None:
+            regressions.append(f"{route}: missing from this run")
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: {current['rps']} req/s vs baseline {base['rps']} req/s")
+        base_rate = base["errors"] / base["requests"] if base["requests"] else 0
+        rate = current["errors"] / current["requests"] if current["requests"] else 0
+        if rate > base_rate + tolerance / 10:
+            regressions.append(f"{route}: error rate {rate:.2%} vs baseline {base_rate:.2%}")
+    return regressions
+
+
+async def main_async(args) -> dict:
+    fake = FakeSupabase(JWT_SECRET, args.latency_ms, args.jitter_ms, args.error_rate, args.seed, SERVICE_KEY)
+    supabase_url = fake.start()
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    process = start_api(supabase_url, port, args.workers, workdir)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            await wait_ready(client, process)
+            samples = await run_load(client, args)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        fake.stop()
+
+    results = summarize(samples, args.seconds)
+    results["config"] = {
+        "seconds": args.seconds, "warmup": args.warmup, "concurrency": args.concurrency, "users": args.users,
+        "workers": args.workers, "mix": args.mix, "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate, "seed": args.seed,
+    }
+    results["upstream"] = fake.stats()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test /login, /profile and /settings against a fake Supabase")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the API")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights, e.g. profile=60,settings=20,login=20")
+    parser.add_argument("--latency-ms", type=float, default=10, help="injected latency of every fake upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=2)
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of fake upstream calls that fail with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="exit 1 if this run regresses against a JSON file from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95/throughput change")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for route, stats in results["routes"].items():
+            print(f"{route:<30} {stats['rps']:>8} req/s  p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                  f"p99={stats['p99_ms']}ms errors={stats['errors']}/{stats['requests']}")
+        print(f"{'total':<30} {results['total']['rps']:>8} req/s  errors={results['total']['errors']}/{results['total']['requests']}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import shutil
+import tempfile
+import numpy as np
+from app.services.rate_limit import RateLimiter, MemoryBackend, SQLiteBackend, ConcurrencyLimit, Rule
+
+# Per-request cost of the auth rate limiter, without the HTTP stack around it:
+#   hot      one IP and account logging in again and again (admitted)
+#   denied   an exhausted IP bucket (the cheap rejection path a flood hits)
+#   spread   every request from a new IP and account, as in credential stuffing
+# for each backend, plus acquiring and releasing an upstream concurrency slot.
+#   python -m benchmarks.rate_limit [--calls 100000] [--max-us 20] [--json]
+
+
+def scenario_keys(scenario: str, calls: int):
+    if scenario == "spread":
+        return [(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", f"user-{i}@example.com") for i in range(calls)]
+    return [("10.0.0.1", "user@example.com")] * calls
+
+
+def rules_for(scenario: str) -> dict:
+    if scenario == "denied":
+        # One token, refilled about once a day: every call after the first is rejected
+        return {"login": (Rule("1/86400"), Rule("1/86400"))}
+    return {"login": (Rule("1000000000/1"), Rule("1000000000/1"))}
+
+
+def time_checks(limiter: RateLimiter, keys: list) -> np.ndarray:
+    timings = np.empty(len(keys))
+    check = limiter.check
+    clock = time.perf_counter_ns
+    for i, (ip, account) in enumerate(keys):
+        started = clock()
+        check("login", ip, account)
+        timings[i] = clock() - started
+    return timings / 1000
+
+
+async def time_concurrency(calls: int) -> np.ndarray:
+    limit = ConcurrencyLimit(limit=20, timeout=1)
+    timings = np.empty(calls)
+    clock = time.perf_counter_ns
+    for i in range(calls):
+        started = clock()
+        async with limit:
+            pass
+        timings[i] = clock() - started
+    return timings / 1000
+
+
+def summarize(timings: np.ndarray) -> dict:
+    return {
+        "mean_us": round(float(timings.mean()), 2),
+        "p50_us": round(float(np.percentile(timings, 50)), 2),
+        "p99_us": round(float(np.percentile(timings, 99)), 2),
+        "ops_per_s": int(len(timings) / (timings.sum() / 1e6)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the per-request overhead of the auth rate limiter")
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--backends", default="memory,sqlite")
+    parser.add_argument("--max-us", type=float, help="exit 1 if the memory backend's p99 exceeds this many microseconds")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="rate-limit-bench-")
+    try:
+        for backend_name in args.backends.split(","):
+            for scenario in ("hot", "denied", "spread"):
+                if backend_name == "memory":
+                    backend = MemoryBackend(max_keys=args.calls)
+                else:
+                    backend = SQLiteBackend(path=os.path.join(workdir, f"{scenario}.sqlite3"))
+                limiter = RateLimiter(backend, rules=rules_for(scenario), enabled=True)
+                keys = scenario_keys(scenario, args.calls)
+                # A short warm-up so first-call costs (connections, page cache) aren't counted
+                time_checks(limiter, keys[:1000])
+                results[f"{backend_name}/{scenario}"] = summarize(time_checks(limiter, keys))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    results["concurrency_slot"] = summarize(asyncio.run(time_concurrency(args.calls)))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, stats in results.items():
+            print(f"{name:<18} mean={stats['mean_us']}us p50={stats['p50_us']}us p99={stats['p99_us']}us {stats['ops_per_s']} ops/s")
+
+    if args.max_us is not None:
+        over = [name for name, stats in results.items() if name.startswith("memory/") and stats["p99_us"] > args.max_us]
+        for name in over:
+            print(f"REGRESSION {name}: p99 {results[name]['p99_us']}us > {args.max_us}us", file=sys.stderr)
+        return 1 if over else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
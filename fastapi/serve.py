@@ -0,0 +1,103 @@
+import os
+import sys
+import logging
+import argparse
+import importlib
+import importlib.util
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# Production entry point: one or more uvicorn worker processes sharing one listening socket.
+# Each worker runs the app lifespan, which warms up its own clients, pools, JWT keys and
+# indexes before /health/ready turns 200.
+#   python serve.py [--workers 4] [--port 8000] [--drain-seconds 5]
+
+
+# One worker unless asked for more: background jobs and /metrics live in worker memory,
+# so with several workers they are only visible on the worker that handled the request
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+# Workers are spawned and read their settings from the environment, so anything that has
+# to be shared between them is switched on here, before the app is imported
+def configure_workers(workers: int):
+    if workers <= 1:
+        return
+    # Otherwise every worker keeps its own buckets and each limit is multiplied by the worker count
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "sqlite")
+    if os.environ["RATE_LIMIT_BACKEND"] != "sqlite":
+        logger.warning(f"RATE_LIMIT_BACKEND={os.environ['RATE_LIMIT_BACKEND']} keeps rate limits per worker, so each limit is {workers}x higher")
+    if float(os.getenv("PROFILE_CACHE_REVALIDATE_SECONDS", "5")) <= 0:
+        logger.warning("PROFILE_CACHE_REVALIDATE_SECONDS=0: workers won't see each other's profile writes until their cache entries expire")
+    logger.warning(f"Running {workers} workers: /index/jobs/<id> only finds jobs started on the same worker, "
+                   "and /metrics reports the worker that answers the scrape. Route a client's requests "
+                   "to one worker or run a single worker per container if you rely on either.")
+
+
+# uvloop and httptools are used when installed (uvicorn[standard]); asking for them
+# explicitly fails at start-up instead of silently falling back
+def check_implementation(name: str, module: str):
+    if name == module and importlib.util.find_spec(module) is None:
+        raise SystemExit(f"--{'loop' if module == 'uvloop' else 'http'} {name} needs the {module} package (pip install 'uvicorn[standard]')")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API with multiple uvicorn workers")
+    parser.add_argument("--app", default="main:app", help="application import string")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers(), help="worker processes (default: WEB_CONCURRENCY or 1)")
+    parser.add_argument("--loop", choices=("auto", "asyncio", "uvloop"), default="auto")
+    parser.add_argument("--http", choices=("auto", "h11", "httptools"), default="auto")
+    parser.add_argument("--backlog", type=int, default=2048, help="pending connections the kernel queues per socket")
+    parser.add_argument("--keep-alive", type=int, default=5, help="seconds an idle keep-alive connection stays open; keep it above the load balancer's idle timeout")
+    parser.add_argument("--limit-concurrency", type=int, help="connections per worker before new ones get a 503")
+    parser.add_argument("--max-requests", type=int, help="restart a worker after this many requests")
+    parser.add_argument("--max-requests-jitter", type=int, default=0)
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--drain-seconds", type=float, help="report unready this long after SIGTERM before shutting down (SHUTDOWN_DRAIN_SECONDS)")
+    parser.add_argument("--no-proxy-headers", action="store_true", help="ignore X-Forwarded-For/Proto even from --forwarded-allow-ips")
+    parser.add_argument("--forwarded-allow-ips", default="127.0.0.1")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", action="store_true")
+    parser.add_argument("--no-preload", action="store_true", help="skip importing the app once before starting the workers")
+    args = parser.parse_args(argv)
+
+    check_implementation(args.loop, "uvloop")
+    check_implementation(args.http, "httptools")
+    configure_workers(args.workers)
+    if args.drain_seconds is not None:
+        # Workers are spawned, so they read the setting from the environment
+        os.environ["SHUTDOWN_DRAIN_SECONDS"] = str(args.drain_seconds)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    if not args.no_preload:
+        # Workers are spawned, not forked, so this shares no memory with them; it turns a
+        # configuration error into one clear failure instead of every worker crash-looping
+        module, _, attribute = args.app.partition(":")
+        getattr(importlib.import_module(module), attribute)
+
+    uvicorn.run(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=args.loop,
+        http=args.http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        limit_concurrency=args.limit_concurrency,
+        limit_max_requests=args.max_requests,
+        limit_max_requests_jitter=args.max_requests_jitter,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=not args.no_proxy_headers,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        log_level=args.log_level,
+        access_log=not args.no_access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -15,12 +15,12 @@ st.set_page_config(
 )
 
 from auth.handlers import handle_confirmation, logout
-from auth.forms import login_form, registration_form, password_reset_form
-from pages.home import show_home
-from pages.profile import show_profile
-from pages.settings import show_settings
-from pages.chat import chat  # Changed from show_chat to chat
-from utils.supabase_client import supabase, ensure_profile_exists
+from pages.registry import GUEST_PAGES, USER_PAGES, render_page, start_warm_up
+from utils.supabase_client import get_supabase, ensure_profile_exists
+
+# Prepare the chat index in the background so the first visit to Chat doesn't wait for it
+if os.environ.get("CHAT_WARM_UP", "false").lower() == "true":
+    start_warm_up("pages.chat")
 
 # Hide the Streamlit style and About menu
 hide_streamlit_style = """
@@ -34,7 +34,7 @@ hide_streamlit_style = """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 def check_user_session():
-    session = supabase.auth.get_session()
+    session = get_supabase().auth.get_session()
     if session:
         st.session_state.user = session.user
         return True
@@ -57,9 +57,10 @@ def main():
     
     user = st.session_state.get('user')
     
-    # Ensure profile exists for the user
-    if user:
-        ensure_profile_exists(user)
+    # Ensure profile exists for the user, once per login rather than on every rerun
+    if user and st.session_state.get("profile_user_id") != user.id:
+        if ensure_profile_exists(user):
+            st.session_state.profile_user_id = user.id
     
     # Check if we're on the confirmation page
     query_params = st.query_params
@@ -70,34 +71,17 @@ def main():
             if user:
                 # Logged-in user menu
                 st.write(f"Welcome, {user.email}")
-                choice = st.selectbox("Menu", ["Home", "Profile", "Settings", "Chat"], key="menu_selectbox")
+                choice = st.selectbox("Menu", list(USER_PAGES), key="menu_selectbox")
                 
                 # Handle logout
                 if st.button("Logout", key="logout_button"):
                     logout()
             else:
                 # Restricted menu for non-logged-in users
-                choice = st.selectbox("Menu", ["Home", "Login", "Register", "Reset Password"], key="menu_selectbox_guest")
+                choice = st.selectbox("Menu", list(GUEST_PAGES), key="menu_selectbox_guest")
         
         # Load the selected page based on menu choice and authentication status
-        if not user:
-            if choice == "Home":
-                show_home(user)
-            elif choice == "Login":
-                login_form()
-            elif choice == "Register":
-                registration_form()
-            elif choice == "Reset Password":
-                password_reset_form()
-        else:
-            if choice == "Home":
-                show_home(user)
-            elif choice == "Profile":
-                show_profile(user)
-            elif choice == "Settings":
-                show_settings(user)
-            elif choice == "Chat":
-                chat()  # Changed from show_chat(user) to chat()
+        render_page(USER_PAGES if user else GUEST_PAGES, choice, user)
                 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -33,4 +33,56 @@ EXECUTE FUNCTION update_modified_column();
 CREATE INDEX idx_profiles_user_id ON profiles(user_id);
 
 -- Add a unique constraint on user_id to ensure one profile per user
-ALTER TABLE profiles ADD CONSTRAINT unique_user_profile UNIQUE (user_id);
\ No newline at end of file
+ALTER TABLE profiles ADD CONSTRAINT unique_user_profile UNIQUE (user_id);
+
+-- Signed-in users reach profiles through PostgREST with their own JWT and may only see
+-- and change their own row. The API's service role key bypasses these policies.
+ALTER TABLE profiles ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can read their own profile" ON profiles
+FOR SELECT TO authenticated
+USING ((SELECT auth.uid()) = user_id);
+
+CREATE POLICY "Users can create their own profile" ON profiles
+FOR INSERT TO authenticated
+WITH CHECK ((SELECT auth.uid()) = user_id);
+
+CREATE POLICY "Users can update their own profile" ON profiles
+FOR UPDATE TO authenticated
+USING ((SELECT auth.uid()) = user_id)
+WITH CHECK ((SELECT auth.uid()) = user_id);
+
+-- Return a user's profile, creating it with defaults first if there isn't one yet.
+-- One round trip instead of select-then-insert, and concurrent first calls for the
+-- same user can't race each other into a duplicate insert.
+-- Runs with the caller's rights, so the policies above apply as well. user_id must be
+-- the caller's own id unless the caller is the service role.
+CREATE OR REPLACE FUNCTION get_or_create_profile(user_id uuid, email text DEFAULT NULL)
+RETURNS profiles AS $$
+DECLARE
+    result profiles;
+BEGIN
+    IF current_user IN ('anon', 'authenticated') AND get_or_create_profile.user_id IS DISTINCT FROM auth.uid() THEN
+        RAISE EXCEPTION 'get_or_create_profile: user_id does not match the signed-in user'
+            USING ERRCODE = '42501';
+    END IF;
+
+    INSERT INTO profiles (user_id, email, full_name, bio)
+    VALUES (get_or_create_profile.user_id, get_or_create_profile.email, 'New User', 'This is your bio.')
+    ON CONFLICT ON CONSTRAINT unique_user_profile DO NOTHING
+    RETURNING * INTO result;
+
+    IF NOT FOUND THEN
+        SELECT * INTO result FROM profiles WHERE profiles.user_id = get_or_create_profile.user_id;
+    END IF;
+    RETURN result;
+END;
+$$
+ language 'plpgsql' SECURITY INVOKER SET search_path = public;
+
+-- Functions are executable by PUBLIC (and so anon) by default
+REVOKE EXECUTE ON FUNCTION get_or_create_profile(uuid, text) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION get_or_create_profile(uuid, text) TO authenticated, service_role;
+
+-- Make the new function visible to the REST API without a restart
+NOTIFY pgrst, 'reload schema';
@@ -0,0 +1,40 @@
+-- Consolidated vector collection used when the FastAPI service runs with
+-- VECTOR_STORAGE_MODE=shared. Every user's embeddings live in one table and
+-- are told apart by the "user_id" key in metadata.
+CREATE EXTENSION IF NOT EXISTS vector;
+CREATE SCHEMA IF NOT EXISTS vecs;
+
+-- Same layout vecs creates for a collection, so the service can open it directly.
+-- The table is not declaratively partitioned: vecs upserts on "id" alone, which a
+-- partitioned table cannot have a unique index on. Rows are partitioned by user
+-- through the user_id indexes below instead.
+CREATE TABLE IF NOT EXISTS vecs.user_documents (
+    id varchar PRIMARY KEY,
+    vec vector(1536) NOT NULL,
+    metadata jsonb NOT NULL DEFAULT '{}'::jsonb
+);
+
+-- Serves the per-user filter (metadata -> 'user_id' = '"<id>"') applied to every query
+CREATE INDEX IF NOT EXISTS ix_user_documents_user_id
+    ON vecs.user_documents ((metadata -> 'user_id'));
+
+-- Containment filters on other metadata keys (doc_id lookups on delete)
+CREATE INDEX IF NOT EXISTS ix_meta_user_documents
+    ON vecs.user_documents USING gin (metadata jsonb_path_ops);
+
+-- Approximate nearest neighbour index. The name follows the vecs convention
+-- (ix_vector_<ops>_<method>...) so the service recognises it and does not build another.
+-- Tune m / ef_construction to match VECTOR_HNSW_M and VECTOR_HNSW_EF_CONSTRUCTION.
+CREATE INDEX IF NOT EXISTS ix_vector_cosine_ops_hnsw_m16_efc64_shared
+    ON vecs.user_documents USING hnsw (vec vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- For pgvector builds without HNSW, use IVFFlat instead (build it after loading data):
+-- CREATE INDEX IF NOT EXISTS ix_vector_cosine_ops_ivfflat_nl100_shared
+--     ON vecs.user_documents USING ivfflat (vec vector_cosine_ops) WITH (lists = 100);
+
+-- On pgvector 0.8+, filtered HNSW scans can keep searching until k rows for the user
+-- are found instead of returning short result sets. The service sets this on each
+-- pooled connection (VECTOR_HNSW_ITERATIVE_SCAN, default strict_order) and queries
+-- with hnsw.ef_search = VECTOR_HNSW_EF_SEARCH. For other clients, set it per database:
+-- ALTER DATABASE postgres SET hnsw.iterative_scan = 'strict_order';
+-- On older pgvector, raise VECTOR_HNSW_EF_SEARCH well above the result count instead.
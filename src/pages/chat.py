@@ -1,27 +1,37 @@
 import streamlit as st
 import openai
 import os
+import functools
 from llama_index.llms.openai import OpenAI
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings, StorageContext, load_index_from_storage
+from llama_index.core import Settings
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.memory import Memory
+from utils.local_index import DATA_DIR, INDEX_DIR, load_or_refresh_index, index_version
+from utils.embedding_cache import cached_embed_model, get_embedding_cache
+from utils.answer_cache import ANSWER_CACHE_ENABLED, get_answer_cache, fingerprint, ReplayedStream, RecordingStream
+
+# This module is imported the first time someone opens Chat (see pages/registry.py),
+# so nothing here should run work at import time that other pages would pay for.
 
 # Initialize session state
-if "user_name" not in st.session_state:
-    st.session_state.user_name = ""
+def init_session_state():
+    if "user_name" not in st.session_state:
+        st.session_state.user_name = ""
 
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+    if "messages" not in st.session_state:
+        st.session_state.messages = []
 
-if "conversation_context" not in st.session_state:
-    st.session_state.conversation_context = {}
+    if "conversation_context" not in st.session_state:
+        st.session_state.conversation_context = {}
 
-if "model" not in st.session_state:
-    st.session_state.model = "gpt-4o"
+    if "model" not in st.session_state:
+        st.session_state.model = "gpt-4o"
 
-if "temperature" not in st.session_state:
-    st.session_state.temperature = 0.7
+    if "temperature" not in st.session_state:
+        st.session_state.temperature = 0.7
 
-if "top_p" not in st.session_state:
-    st.session_state.top_p = 1.0
+    if "top_p" not in st.session_state:
+        st.session_state.top_p = 1.0
 
 # Set up OpenAI API key
 openai.api_key = os.environ.get("OPENAI_API_KEY")
@@ -36,36 +46,41 @@ def print_data_contents():
                 content = file.read()
                 st.sidebar.text_area(f"Contents of {filename}:", content, height=200)
 
+# Shared by every session in the process. No st.* calls here, so the warm-up thread can run it too.
 @st.cache_resource(show_spinner=False)
 def load_data():
-    if os.path.exists("./index"):
-        storage_context = StorageContext.from_defaults(persist_dir="./index")
-        index = load_index_from_storage(storage_context)
-    else:
-        reader = SimpleDirectoryReader(input_dir="./data", recursive=True)
-        docs = reader.load_data()
-        st.sidebar.write(f"Number of documents loaded: {len(docs)}")
-        if docs:
-            for i, doc in enumerate(docs):
-                st.sidebar.write(f"Document {i+1} content (truncated):\n{doc.text[:200]}...")
-        Settings.llm = OpenAI(model=st.session_state.model, temperature=st.session_state.temperature)
-        index = VectorStoreIndex.from_documents(docs)
-        index.storage_context.persist("./index")
-    return index
-
-index = load_data()
+    # Chunks embedded by any earlier build are served from the shared embedding cache
+    Settings.embed_model = cached_embed_model(Settings.embed_model)
+    # Only files added or changed since the last run are re-embedded
+    index, changes = load_or_refresh_index(DATA_DIR, INDEX_DIR)
+    # Answers cached against the previous index contents are dropped
+    get_answer_cache().set_index_version(index_version(INDEX_DIR))
+    return index, changes
+
+def warm_up():
+    load_data()
+
+def show_index_changes(changes):
+    for kind in ("added", "changed", "deleted"):
+        if changes[kind]:
+            st.sidebar.write(f"Index {kind}: {', '.join(changes[kind])}")
+    if any(changes.values()):
+        stats = get_embedding_cache().stats()
+        st.sidebar.write(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses")
 
 def update_chat_engine():
+    index, _ = load_data()
+    llm = OpenAI(model=st.session_state.model, temperature=st.session_state.temperature, top_p=st.session_state.top_p)
+    # Passed in rather than left to the engine, so replayed answers can be recorded in it
+    st.session_state.chat_memory = Memory.from_defaults(token_limit=llm.metadata.context_window - 256)
     st.session_state.chat_engine = index.as_chat_engine(
         chat_mode="condense_question",
         verbose=True,
         streaming=True,
-        llm=OpenAI(model=st.session_state.model, temperature=st.session_state.temperature, top_p=st.session_state.top_p)
+        llm=llm,
+        memory=st.session_state.chat_memory,
     )
 
-if "chat_engine" not in st.session_state:
-    update_chat_engine()
-
 def generate_response(prompt):
     name = st.session_state.user_name
     context = st.session_state.conversation_context
@@ -111,8 +126,32 @@ def generate_response(prompt):
         return f"That's interesting, {name}! I'll remember that you like {preference}. Would you like to discuss more about it or explore related topics?"
 
     full_prompt = f"{system_prompt}\n\nUser: {prompt}\nAI Assistant:"
-    response_stream = st.session_state.chat_engine.stream_chat(full_prompt)
-    return response_stream
+    chat_engine = st.session_state.chat_engine
+    # Follow-ups are condensed against the history, so only opening questions are cached
+    if not ANSWER_CACHE_ENABLED or chat_engine.chat_history:
+        return chat_engine.stream_chat(full_prompt)
+
+    # Keyed on the model settings, the index version, the normalized question and the
+    # system prompt, which carries the user's name and context, so sessions only share
+    # answers that were generated for the same personalisation
+    cache = get_answer_cache()
+    scope = cache.scope(st.session_state.model, st.session_state.temperature, fingerprint(st.session_state.top_p, system_prompt))
+    # A semantic miss embeds the question in get and again in put; the second call reuses it
+    embed_fn = functools.lru_cache(maxsize=1)(Settings.embed_model.get_query_embedding)
+    cached_answer = cache.get(scope, prompt, embed_fn)
+    if cached_answer is not None:
+        remember_exchange(full_prompt, cached_answer)
+        return ReplayedStream(cached_answer)
+    return RecordingStream(
+        chat_engine.stream_chat(full_prompt),
+        lambda answer: cache.put(scope, prompt, answer, embed_fn),
+    )
+
+def remember_exchange(message, answer):
+    # Follow-up questions are condensed against the chat history, so a replayed answer
+    # has to be recorded there just like a generated one
+    st.session_state.chat_memory.put(ChatMessage(role=MessageRole.USER, content=message))
+    st.session_state.chat_memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
 
 def test_data_retrieval():
     test_query = "What are the main types of machine learning?"
@@ -127,10 +166,13 @@ def test_data_retrieval():
         st.sidebar.write("Response:", full_response)
 
 def chat():
+    init_session_state()
     st.title("Memory-Enabled RAG Chatbot")
 
-    if "conversation_context" not in st.session_state:
-        st.session_state.conversation_context = {}
+    # The index and engine are set up the first time this session opens Chat
+    if "chat_engine" not in st.session_state:
+        with st.spinner("Loading the document index..."):
+            update_chat_engine()
 
     # Sidebar for model settings and data verification
     st.sidebar.title("Model Settings and Data Verification")
@@ -146,6 +188,13 @@ def chat():
     if st.sidebar.button("Apply Settings"):
         update_chat_engine()
 
+    # Pick up edits to ./data without restarting the app
+    if st.sidebar.button("Refresh Index"):
+        load_data.clear()
+        _, changes = load_data()
+        update_chat_engine()
+        show_index_changes(changes)
+
     # Print data contents and test data retrieval
     print_data_contents()
     if st.sidebar.button("Test Data Retrieval"):
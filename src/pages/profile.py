@@ -1,34 +1,30 @@
 import streamlit as st
 from supabase import create_client
-from utils.supabase_client import supabase
+from utils.supabase_client import get_supabase, get_or_create_profile
+from utils.profile_cache import get_profile_cache
 
-def fetch_user_profile(user_id):
-    try:
-        response = supabase.from_("profiles").select("*").eq("user_id", user_id).execute()
-        if response.data:
-            return response.data[0]
-        return None
-    except Exception as e:
-        st.error(f"Failed to load profile data: {str(e)}")
-        return None
+def fetch_user_profile(user_id, email=None):
+    return get_or_create_profile(user_id, email)
 
 def update_user_profile(user_id, full_name, bio):
     try:
-        supabase.from_("profiles").update({
+        response = get_supabase().from_("profiles").update({
             "full_name": full_name,
             "bio": bio
         }).eq("user_id", user_id).execute()
+        get_profile_cache().write(user_id, response.data[0] if response.data else None)
         st.success("Profile updated successfully!")
     except Exception as e:
         st.error(f"Failed to update profile data: {str(e)}")
 
 def insert_initial_profile(user_id, full_name="New User", bio="This is your bio."):
     try:
-        supabase.from_("profiles").insert({
+        response = get_supabase().from_("profiles").insert({
             "user_id": user_id,
             "full_name": full_name,
             "bio": bio
         }).execute()
+        get_profile_cache().write(user_id, response.data[0] if response.data else None)
         st.success("Profile created successfully!")
         return {"full_name": full_name, "bio": bio}
     except Exception as e:
@@ -39,7 +35,7 @@ def show_profile(user):
     st.subheader("Your Profile")
     st.write(f"Email: {user.email}")
     
-    profile_data = fetch_user_profile(user.id)
+    profile_data = fetch_user_profile(user.id, user.email)
     
     if not profile_data:
         st.warning("No profile found. Let's create one!")
@@ -0,0 +1,42 @@
+import importlib
+import threading
+
+# Menu entry -> (module, function, whether the function takes the current user).
+# Modules are imported the first time their page is shown, so the login form never
+# loads the chat page's LLM and vector index dependencies.
+GUEST_PAGES = {
+    "Home": ("pages.home", "show_home", True),
+    "Login": ("auth.forms", "login_form", False),
+    "Register": ("auth.forms", "registration_form", False),
+    "Reset Password": ("auth.forms", "password_reset_form", False),
+}
+
+USER_PAGES = {
+    "Home": ("pages.home", "show_home", True),
+    "Profile": ("pages.profile", "show_profile", True),
+    "Settings": ("pages.settings", "show_settings", True),
+    "Chat": ("pages.chat", "chat", False),
+}
+
+_warm_up_started = set()
+_warm_up_lock = threading.Lock()
+
+
+def render_page(pages, choice, user):
+    module_name, function_name, takes_user = pages[choice]
+    page = getattr(importlib.import_module(module_name), function_name)
+    return page(user) if takes_user else page()
+
+
+# Imports a page module and runs its warm_up() in a background thread, once per process
+def start_warm_up(module_name):
+    with _warm_up_lock:
+        if module_name in _warm_up_started:
+            return
+        _warm_up_started.add(module_name)
+
+    def run():
+        module = importlib.import_module(module_name)
+        module.warm_up()
+
+    threading.Thread(target=run, name=f"warm-up-{module_name}", daemon=True).start()
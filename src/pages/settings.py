@@ -1,20 +1,14 @@
 import streamlit as st
 from supabase import create_client
-from utils.supabase_client import supabase
+from utils.supabase_client import get_supabase, get_or_create_profile
+from utils.profile_cache import get_profile_cache
 
 def show_settings(user):
     st.subheader("Settings")
 
-    # Fetch current user settings
-    try:
-        response = supabase.from_("profiles").select("*").eq("user_id", user.id).execute()
-        if response.data:
-            current_settings = response.data[0]
-        else:
-            st.warning("No profile found. Please create a profile first.")
-            return
-    except Exception as e:
-        st.error(f"Failed to load user settings: {str(e)}")
+    # Fetch current user settings, creating the profile if this is the first visit
+    current_settings = get_or_create_profile(user.id, user.email)
+    if not current_settings:
         return
 
     # Settings form
@@ -32,7 +26,7 @@ def show_settings(user):
     if submit_button:
         try:
             # Update user settings in Supabase
-            supabase.table("profiles").update({
+            response = get_supabase().table("profiles").update({
                 "full_name": full_name,
                 "email": email,
                 "bio": bio,
@@ -41,6 +35,8 @@ def show_settings(user):
                 "notifications": notifications,
                 "language": language
             }).eq("user_id", user.id).execute()
+            # Write-through so the next page load shows the new values without a refetch
+            get_profile_cache().write(user.id, response.data[0] if response.data else None)
 
             st.success("Settings updated successfully!")
         except Exception as e:
@@ -0,0 +1,31 @@
+import os
+import sys
+import importlib.util
+import pytest
+
+FAKE_JWT_SECRET = "test-jwt-secret-with-at-least-32-bytes"
+FAKE_SERVICE_KEY = "test-service-role-key"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The FastAPI service runs from fastapi/ and imports itself as `app`. It goes last on the
+# path so the repository's own main.py and benchmarks package still win.
+sys.path.append(os.path.join(ROOT, "fastapi"))
+
+# app.db.supabase refuses to import without these; the fake accepts the key as the service role
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", FAKE_SERVICE_KEY)
+# Every test client logs in from the same address; tests/test_rate_limit.py enables its own limiter
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+
+# The in-process GoTrue/PostgREST fake used by the FastAPI load test, loaded by path
+# because fastapi/benchmarks shares its package name with the repository's benchmarks
+@pytest.fixture
+def fake_supabase():
+    spec = importlib.util.spec_from_file_location("fake_supabase", os.path.join(ROOT, "fastapi", "benchmarks", "fake_supabase.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    fake = module.FakeSupabase(FAKE_JWT_SECRET, service_key=os.environ["SUPABASE_KEY"])
+    fake.start()
+    yield fake
+    fake.stop()
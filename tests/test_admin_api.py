@@ -0,0 +1,112 @@
+import json
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import admin, auth
+from app.db import supabase as supabase_db
+from app.lifespan import lifespan
+from app.services.profiles import profile_cache
+
+
+@pytest.fixture
+def client(monkeypatch, fake_supabase):
+    monkeypatch.setattr(supabase_db, "SUPABASE_URL", fake_supabase.url)
+    profile_cache.clear()
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(auth.router)
+    app.include_router(admin.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def login(client, fake_supabase, email: str, admin_role: bool = False) -> dict:
+    session = client.post("/login", data={"username": email, "password": "secret"}).json()
+    if admin_role:
+        [user] = [user for user in fake_supabase.users.values() if user["email"] == email]
+        user["app_metadata"]["role"] = "admin"
+    return {"Authorization": f"Bearer {session['access_token']}"}
+
+
+def add_profiles(fake_supabase, count: int) -> list:
+    user_ids = sorted(str(uuid.uuid4()) for _ in range(count))
+    for user_id in user_ids:
+        fake_supabase.profiles[user_id] = fake_supabase._new_profile(user_id, f"{user_id}@example.com")
+    return user_ids
+
+
+def test_admin_endpoints_reject_other_users(client, fake_supabase):
+    user_id = add_profiles(fake_supabase, 1)[0]
+    headers = login(client, fake_supabase, "member@example.com")
+
+    assert client.get(f"/profiles?ids={user_id}", headers=headers).status_code == 403
+    assert client.get("/profiles/export", headers=headers).status_code == 403
+    assert client.patch("/settings/bulk", json={"updates": []}, headers=headers).status_code == 403
+    assert client.get(f"/profiles?ids={user_id}").status_code == 401
+
+
+def test_profiles_are_fetched_in_chunks_of_200_ids(client, fake_supabase):
+    headers = login(client, fake_supabase, "admin@example.com", admin_role=True)
+    existing = add_profiles(fake_supabase, 250)
+    missing = [str(uuid.uuid4()) for _ in range(200)]
+    before = fake_supabase.requests["postgrest.profiles.get"]
+
+    response = client.get(f"/profiles?ids={','.join(existing + missing)}&fields=email", headers=headers)
+
+    assert response.status_code == 200
+    assert fake_supabase.requests["postgrest.profiles.get"] - before == 3
+    body = response.json()
+    assert sorted(row["user_id"] for row in body["profiles"]) == existing
+    assert set(body["profiles"][0]) == {"user_id", "email"}
+    assert body["missing"] == missing
+
+
+def export_lines(client, headers, **params) -> list:
+    response = client.get("/profiles/export", params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_interrupted_export_resumes_from_its_cursor(client, fake_supabase):
+    headers = login(client, fake_supabase, "admin@example.com", admin_role=True)
+    user_ids = add_profiles(fake_supabase, 25)
+    fake_supabase.fail_after["postgrest.profiles.get"] = fake_supabase.requests["postgrest.profiles.get"] + 1
+
+    first = export_lines(client, headers, page_size=10, fields="email")
+    assert first[-1]["event"] == "error"
+    assert first[-1]["count"] == 10
+    assert [row["user_id"] for row in first[:-1]] == user_ids[:10]
+    assert first[-1]["cursor"] == user_ids[9]
+
+    fake_supabase.fail_after.clear()
+    rest = export_lines(client, headers, page_size=10, fields="email", after=first[-1]["cursor"])
+    assert rest[-1] == {"event": "done", "count": 15}
+    assert [row["user_id"] for row in first[:-1] + rest[:-1]] == user_ids
+
+
+def test_bulk_settings_retry_row_by_row_and_report_each_user(client, fake_supabase):
+    headers = login(client, fake_supabase, "admin@example.com", admin_role=True)
+    good, bad, other = add_profiles(fake_supabase, 3)
+    unknown = str(uuid.uuid4())
+    updates = [
+        {"user_id": good, "settings": {"theme": "dark", "age": 30}},
+        {"user_id": bad, "settings": {"theme": "dark", "age": 2 ** 40}},
+        {"user_id": other, "settings": {"theme": "dark", "age": 40}},
+        {"user_id": unknown, "settings": {"theme": "dark"}},
+        {"user_id": "not-a-uuid", "settings": {"theme": "dark"}},
+    ]
+    before = fake_supabase.requests["postgrest.profiles.post"]
+
+    response = client.patch("/settings/bulk", json={"updates": updates}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    statuses = {result["user_id"]: result["status"] for result in body["results"]}
+    assert statuses == {good: "updated", bad: "failed", other: "updated", unknown: "not_found", "not-a-uuid": "invalid"}
+    assert (body["updated"], body["failed"]) == (2, 3)
+    assert "out of range" in next(result["error"] for result in body["results"] if result["user_id"] == bad)
+    # One bulk upsert for the three rows fails as a whole, then each row is retried alone
+    assert fake_supabase.requests["postgrest.profiles.post"] - before == 1 + 3
+    assert fake_supabase.profiles[good]["age"] == 30
+    assert fake_supabase.profiles[bad]["theme"] == "light"
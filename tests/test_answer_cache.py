@@ -0,0 +1,112 @@
+import time
+from types import SimpleNamespace
+from utils.answer_cache import AnswerCache, ReplayedStream, RecordingStream, get_answer_cache
+from src.pages import chat
+
+VECTORS = {
+    "what is rag": [1.0, 0.0],
+    "explain rag": [0.95, 0.1],
+    "what is the weather": [0.0, 1.0],
+}
+
+
+def embed(text):
+    return VECTORS[text]
+
+
+def test_prompts_are_normalized_and_scoped():
+    cache = AnswerCache()
+    scope = cache.scope("gpt-4o", 0.7, "ctx")
+    cache.put(scope, "What is RAG?", "answer")
+
+    assert cache.get(scope, "  what is   rag ") == "answer"
+    assert cache.get(cache.scope("gpt-4o", 0.2, "ctx"), "What is RAG?") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_expire_after_the_ttl():
+    cache = AnswerCache(ttl=0.01)
+    cache.put("s", "What is RAG?", "answer")
+    time.sleep(0.02)
+
+    assert cache.get("s", "What is RAG?") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put("s", "one", "1")
+    cache.put("s", "two", "2")
+    cache.get("s", "one")
+    cache.put("s", "three", "3")
+
+    assert cache.get("s", "two") is None
+    assert [cache.get("s", prompt) for prompt in ("one", "three")] == ["1", "3"]
+
+
+def test_similar_prompts_match_only_above_the_threshold():
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put("s", "What is RAG?", "rag answer", embed)
+
+    assert cache.get("s", "Explain RAG", embed) == "rag answer"
+    assert cache.get("s", "What is the weather?", embed) is None
+    assert cache.get("other", "Explain RAG", embed) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+    # 0 turns semantic matching off: only the exact question hits
+    exact = AnswerCache(similarity_threshold=0)
+    exact.put("s", "What is RAG?", "rag answer", embed)
+    assert exact.get("s", "Explain RAG", embed) is None
+
+
+def test_new_index_version_drops_cached_answers():
+    cache = AnswerCache()
+    cache.set_index_version("v1")
+    cache.put(cache.scope("m", 0, ""), "q", "old")
+    cache.set_index_version("v2")
+    assert cache.get(cache.scope("m", 0, ""), "q") is None
+
+
+class FakeEngine:
+    def __init__(self, history=()):
+        self.chat_history = list(history)
+        self.prompts = []
+
+    def stream_chat(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(response_gen=iter(["generated ", "answer"]))
+
+
+def use_session(monkeypatch, engine, name=""):
+    session = SimpleNamespace(user_name=name, conversation_context={}, model="gpt-4o", temperature=0.7,
+                              top_p=1.0, chat_engine=engine, chat_memory=SimpleNamespace(put=lambda message: None))
+    monkeypatch.setattr(chat, "st", SimpleNamespace(session_state=session))
+    monkeypatch.setattr(chat, "Settings", SimpleNamespace(embed_model=SimpleNamespace(get_query_embedding=embed)))
+
+
+def drain(stream):
+    return "".join(stream.response_gen)
+
+
+def test_follow_ups_bypass_the_cache(monkeypatch):
+    get_answer_cache().clear()
+    engine = FakeEngine(history=["earlier turn"])
+    use_session(monkeypatch, engine)
+
+    response = chat.generate_response("What is RAG?")
+    assert not isinstance(response, (ReplayedStream, RecordingStream))
+    drain(response)
+    assert get_answer_cache().stats()["entries"] == 0
+
+
+def test_answers_are_not_shared_across_personalised_prompts(monkeypatch):
+    get_answer_cache().clear()
+    engine = FakeEngine()
+    use_session(monkeypatch, engine, name="ada")
+    assert drain(chat.generate_response("What is RAG?")) == "generated answer"
+    assert isinstance(chat.generate_response("What is RAG?"), ReplayedStream)
+
+    # Another user's system prompt names them, so they get their own answer
+    use_session(monkeypatch, engine, name="grace")
+    assert isinstance(chat.generate_response("What is RAG?"), RecordingStream)
+    assert len(engine.prompts) == 2
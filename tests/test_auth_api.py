@@ -0,0 +1,21 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import auth
+from app.db import supabase as supabase_db
+from app.lifespan import lifespan
+
+
+def make_client(monkeypatch, fake_supabase):
+    monkeypatch.setattr(supabase_db, "SUPABASE_URL", fake_supabase.url)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(auth.router)
+    return TestClient(app)
+
+
+def test_login_does_not_sign_in_the_shared_client(monkeypatch, fake_supabase):
+    with make_client(monkeypatch, fake_supabase) as client:
+        response = client.post("/login", data={"username": "someone@example.com", "password": "secret"})
+        assert response.status_code == 200
+        assert response.json()["access_token"]
+        # PostgREST calls on the shared client must still carry only the project key
+        assert supabase_db.supabase.options.headers["Authorization"] == f"Bearer {supabase_db.SUPABASE_KEY}"
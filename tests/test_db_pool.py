@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.db import postgres
+
+
+# The pool logic doesn't depend on the database, so a SQLite file stands in for Postgres
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(postgres, "SUPABASE_DB_URL", f"sqlite:///{tmp_path / 'pool.sqlite3'}")
+    monkeypatch.setattr(postgres, "VECTOR_HNSW_ITERATIVE_SCAN", "off")
+    monkeypatch.setattr(postgres, "DB_POOL_MIN_SIZE", 2)
+    monkeypatch.setattr(postgres, "DB_POOL_MAX_SIZE", 4)
+    monkeypatch.setattr(postgres, "DB_POOL_TIMEOUT", 0.1)
+    postgres.close_pool()
+    yield postgres.get_engine()
+    postgres.close_pool()
+
+
+def test_pool_keeps_the_minimum_open_and_grows_to_the_maximum(pool):
+    status = postgres.pool_status()
+    assert status["size"] == status["idle"] == status["min_size"] == 2
+
+    connections = [pool.connect() for _ in range(4)]
+    assert postgres.pool_status()["checked_out"] == 4
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+
+    for connection in connections:
+        connection.close()
+    # Connections opened above the minimum are closed when they come back
+    assert postgres.pool_status()["idle"] == 2
@@ -0,0 +1,47 @@
+import asyncio
+from typing import List
+from app.services.embed_batcher import EmbeddingBatcher, BatchedQueryEmbedding
+from app.services.embeddings import FakeEmbedding
+
+
+# Embeds each text as [len(text), index of the text in its batch] and counts upstream calls
+class CountingUpstream:
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    async def __call__(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        await asyncio.sleep(0.01)
+        return [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+
+
+def test_concurrent_queries_share_upstream_calls_and_get_their_own_vectors():
+    upstream = CountingUpstream()
+    model = BatchedQueryEmbedding(FakeEmbedding(model_name="fake", embed_dim=2), EmbeddingBatcher(upstream, max_items=8, max_wait_ms=20))
+    queries = [f"question {'x' * i}" for i in range(20)]
+
+    async def run():
+        return await asyncio.gather(*(model.aget_query_embedding(query) for query in queries))
+
+    vectors = asyncio.run(run())
+
+    assert upstream.texts == len(queries)
+    assert upstream.calls < len(queries)
+    assert upstream.calls == 3
+    assert [vector[0] for vector in vectors] == [float(len(query)) for query in queries]
+
+
+def test_failed_batch_raises_in_every_waiting_caller():
+    async def failing(texts):
+        raise RuntimeError("upstream down")
+
+    batcher = EmbeddingBatcher(failing, max_items=4, max_wait_ms=5)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(f"q{i}") for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [type(result) for result in results] == [RuntimeError] * 3
+    assert batcher.upstream_calls == 1
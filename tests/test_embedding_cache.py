@@ -0,0 +1,46 @@
+import sqlite3
+from utils.embedding_cache import EmbeddingCache
+
+
+def vectors(count: int, start: int = 0):
+    return [f"text {i}" for i in range(start, start + count)], [[float(i), 1.0] for i in range(start, start + count)]
+
+
+def test_eviction_keeps_the_cap_and_the_counter_exact(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    for start in range(0, 50, 5):
+        cache.put_many("model", *vectors(5, start))
+    # Re-putting an existing text refreshes it without changing the count
+    cache.put_many("model", *vectors(2, 48))
+
+    counted = sqlite3.connect(cache.path).execute("SELECT count(*) FROM embeddings").fetchone()[0]
+    assert cache.entries() == counted == 10
+    assert cache.evictions == 40
+    assert cache.get_many("model", ["text 0", "text 49"]) == [None, [49.0, 1.0]]
+
+
+def test_counter_is_initialised_for_an_existing_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE embeddings (model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                 "last_used REAL NOT NULL, PRIMARY KEY (model, hash))")
+    conn.executemany("INSERT INTO embeddings VALUES ('model', ?, x'00', 0)", [(str(i),) for i in range(7)])
+    conn.commit()
+
+    assert EmbeddingCache(path).entries() == 7
+
+
+def test_hits_only_touch_entries_older_than_the_touch_interval(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), touch_seconds=3600)
+    cache.put_many("model", *vectors(3))
+    conn = cache._connect()
+    before = conn.total_changes
+
+    cache.get_many("model", ["text 0", "text 1"])
+    assert conn.total_changes == before
+
+    conn.execute("UPDATE embeddings SET last_used = 0 WHERE hash = (SELECT hash FROM embeddings LIMIT 1)")
+    conn.commit()
+    before = conn.total_changes
+    cache.get_many("model", ["text 0", "text 1", "text 2"])
+    assert conn.total_changes == before + 1
@@ -0,0 +1,107 @@
+import time
+import signal
+import threading
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import warmup
+from app.api import health
+from app.lifespan import lifespan
+from app.warmup import warmup_state, install_drain_handler
+
+
+def wait_for(client, status_code: int):
+    for _ in range(200):
+        response = client.get("/health/ready")
+        if response.status_code == status_code:
+            return response
+        time.sleep(0.01)
+    return response
+
+
+def test_ready_is_503_until_warm_up_finishes(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(warmup, "_steps", lambda: ({"slow": lambda: release.wait(2)}, {}))
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(health.router)
+
+    with TestClient(app) as client:
+        response = client.get("/health/ready")
+        assert response.status_code == 503 and response.json()["status"] == "starting"
+        assert client.get("/health/live").status_code == 200
+
+        release.set()
+        response = wait_for(client, 200)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "ready" and body["steps"]["slow"]["status"] == "ok"
+        assert body["warmup_seconds"] is not None
+
+    assert warmup_state.state == "stopping"
+
+
+def test_strict_warm_up_stays_unready_after_a_failed_step(monkeypatch):
+    def broken():
+        raise RuntimeError("database unreachable")
+
+    monkeypatch.setattr(warmup, "_steps", lambda: ({"database": broken}, {}))
+    monkeypatch.setattr(warmup, "WARMUP_STRICT", True)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(health.router)
+
+    with TestClient(app) as client:
+        for _ in range(200):
+            if warmup_state.state != "starting":
+                break
+            time.sleep(0.01)
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "failed"
+        assert response.json()["steps"]["database"]["error"] == "database unreachable"
+
+
+@pytest.fixture
+def sigterm_calls():
+    # Stands in for uvicorn's handler; restored afterwards so the test runner keeps its own
+    calls = []
+    original = signal.signal(signal.SIGTERM, lambda sig, frame: calls.append(time.monotonic()))
+    yield calls
+    signal.signal(signal.SIGTERM, original)
+
+
+def test_sigterm_drains_before_shutting_down(monkeypatch, sigterm_calls):
+    monkeypatch.setattr(warmup, "SHUTDOWN_DRAIN_SECONDS", 0.2)
+    app = FastAPI()
+    app.include_router(health.router)
+    client = TestClient(app)
+    warmup_state.reset()
+    warmup_state.state = "ready"
+    install_drain_handler()
+    assert client.get("/health/ready").status_code == 200
+
+    signaled = time.monotonic()
+    signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+
+    # The load balancer sees 503 while the worker keeps serving until the drain window ends
+    response = client.get("/health/ready")
+    assert response.status_code == 503 and response.json()["status"] == "draining"
+    assert client.get("/health/live").status_code == 200
+    assert sigterm_calls == []
+    for _ in range(100):
+        if sigterm_calls:
+            break
+        time.sleep(0.01)
+    assert len(sigterm_calls) == 1 and sigterm_calls[0] - signaled >= 0.2
+
+
+def test_second_sigterm_shuts_down_at_once(monkeypatch, sigterm_calls):
+    monkeypatch.setattr(warmup, "SHUTDOWN_DRAIN_SECONDS", 10)
+    warmup_state.reset()
+    warmup_state.state = "ready"
+    install_drain_handler()
+
+    handler = signal.getsignal(signal.SIGTERM)
+    handler(signal.SIGTERM, None)
+    assert sigterm_calls == []
+    handler(signal.SIGTERM, None)
+    assert len(sigterm_calls) == 1
@@ -0,0 +1,43 @@
+import threading
+from app.services.index_cache import IndexCache
+
+
+def test_invalidate_during_build_skips_caching_the_stale_handle():
+    cache = IndexCache(max_entries=10, idle_ttl=60)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_build():
+        started.set()
+        release.wait(5)
+        return "stale"
+
+    thread = threading.Thread(target=cache.get_or_build, args=("user", slow_build))
+    thread.start()
+    started.wait(5)
+    cache.invalidate("user")
+    release.set()
+    thread.join(5)
+
+    assert cache.get_or_build("user", lambda: "fresh") == "fresh"
+    assert cache.stats()["builds"] == 2
+
+
+def test_generations_do_not_grow_with_invalidated_keys():
+    cache = IndexCache(max_entries=10, idle_ttl=60)
+    for i in range(1000):
+        cache.get_or_build(f"user-{i}", lambda: "handle")
+        cache.invalidate(f"user-{i}")
+    assert cache._generations == {}
+
+
+def test_least_recently_used_handle_is_evicted_beyond_max_entries():
+    cache = IndexCache(max_entries=3, idle_ttl=60)
+    for i in range(3):
+        cache.get_or_build(i, lambda: "handle")
+    cache.get_or_build(0, lambda: "rebuilt")
+    cache.get_or_build(3, lambda: "handle")
+
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["evictions"] == 1
+    assert cache.get_or_build(0, lambda: "rebuilt") == "handle"
+    assert cache.get_or_build(1, lambda: "rebuilt") == "rebuilt"
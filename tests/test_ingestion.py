@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from app.models.user import IngestDocument
+from app.services import ingestion
+from app.services.embeddings import FakeEmbedding
+
+
+# Stands in for a user's vecs table: rows keyed by node id, each remembering its doc_id
+class FakeVectorStore:
+    def __init__(self):
+        self.rows = {}
+        self.fail_add = False
+
+    def add(self, nodes):
+        if self.fail_add:
+            raise RuntimeError("database unavailable")
+        for node in nodes:
+            assert node.embedding is not None
+            self.rows[node.node_id] = node.ref_doc_id
+
+
+class FakeHandle:
+    def __init__(self):
+        self.vector_store = FakeVectorStore()
+
+    def delete_document(self, doc_id, keep_ids=None):
+        stale = [node_id for node_id, row_doc in self.vector_store.rows.items()
+                 if row_doc == doc_id and (keep_ids is None or node_id not in keep_ids)]
+        for node_id in stale:
+            del self.vector_store.rows[node_id]
+        return len(stale)
+
+
+@pytest.fixture
+def handle(monkeypatch):
+    handle = FakeHandle()
+    monkeypatch.setattr(ingestion, "get_user_index_handle", lambda user_id: handle)
+    monkeypatch.setattr(ingestion, "invalidate_user_index", lambda user_id: None)
+    monkeypatch.setattr(ingestion, "get_embed_model", lambda: FakeEmbedding(model_name="fake", embed_dim=8))
+    monkeypatch.setattr(ingestion, "INGEST_CHUNK_SIZE", 64)
+    monkeypatch.setattr(ingestion, "INGEST_CHUNK_OVERLAP", 0)
+    return handle
+
+
+def ingest(documents):
+    return asyncio.run(ingestion.ingest_documents("user", documents))
+
+
+def long_text(words: int) -> str:
+    return " ".join(f"word{i}." for i in range(words))
+
+
+def test_failed_upsert_keeps_the_previous_chunks(handle):
+    [result] = ingest([IngestDocument(doc_id="notes", text=long_text(200))])
+    assert result["status"] == "indexed"
+    before = dict(handle.vector_store.rows)
+
+    handle.vector_store.fail_add = True
+    [result] = ingest([IngestDocument(doc_id="notes", text=long_text(50))])
+
+    assert result["status"] == "failed"
+    assert handle.vector_store.rows == before
+
+
+def test_shorter_version_drops_only_stale_chunks(handle):
+    [first, _] = ingest([IngestDocument(doc_id="notes", text=long_text(200)), IngestDocument(doc_id="other", text=long_text(20))])
+    other = {node_id for node_id, doc_id in handle.vector_store.rows.items() if doc_id == "other"}
+
+    [result, _] = ingest([IngestDocument(doc_id="notes", text=long_text(50)), IngestDocument(doc_id="other", text=long_text(20))])
+
+    notes = [node_id for node_id, doc_id in handle.vector_store.rows.items() if doc_id == "notes"]
+    assert len(notes) == result["chunks"] < first["chunks"]
+    assert {node_id for node_id, doc_id in handle.vector_store.rows.items() if doc_id == "other"} == other
+
+
+def test_duplicate_doc_ids_are_rejected(handle):
+    results = ingest([IngestDocument(doc_id="notes", text="first"), IngestDocument(doc_id="notes", text="second")])
+
+    assert [r["status"] for r in results] == ["indexed", "failed"]
+    assert "Duplicate doc_id" in results[1]["error"]
+    assert len(handle.vector_store.rows) == 1
@@ -0,0 +1,177 @@
+import time
+import asyncio
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from app.api import auth, profile
+from app.db import supabase as supabase_db
+from app.lifespan import lifespan
+from app.services.jobs import JobQueue, QueueFull
+
+
+async def wait_done(job, timeout: float = 2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not job.done and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.005)
+    return job
+
+
+def test_job_runs_and_reports_progress_and_result():
+    async def run():
+        queue = JobQueue(workers=2)
+
+        async def work(job):
+            job.progress = {"step": "working"}
+            await asyncio.sleep(0.05)
+            return {"ok": True}
+
+        job, created = queue.submit("build", "u1", work)
+        assert created and job.state == "queued"
+        await asyncio.sleep(0.01)
+        assert job.state == "running" and job.progress == {"step": "working"}
+        await wait_done(job)
+        return queue, job
+
+    queue, job = asyncio.run(run())
+    assert job.to_dict()["state"] == "succeeded"
+    assert job.result == {"ok": True}
+    assert job.started_at <= job.finished_at
+    assert queue.get(job.id) is job and queue.active == 0
+
+
+def test_failures_and_timeouts_are_reported_on_the_job():
+    async def run():
+        queue = JobQueue(timeout=0.05)
+
+        async def rejected(job):
+            raise HTTPException(status_code=503, detail="Database is busy")
+
+        async def slow(job):
+            await asyncio.sleep(1)
+
+        failed, _ = queue.submit("ingest", "u1", rejected)
+        timed_out, _ = queue.submit("build", "u2", slow)
+        return await wait_done(failed), await wait_done(timed_out)
+
+    failed, timed_out = asyncio.run(run())
+    assert (failed.state, failed.error) == ("failed", "Database is busy")
+    assert timed_out.state == "failed" and "timed out" in timed_out.error
+
+
+def test_matching_jobs_are_deduplicated_until_they_finish():
+    async def run():
+        queue = JobQueue()
+        release = asyncio.Event()
+
+        async def work(job):
+            await release.wait()
+
+        first, _ = queue.submit("ingest", "u1", work, "docs-a")
+        again, created_again = queue.submit("ingest", "u1", work, "docs-a")
+        other, created_other = queue.submit("ingest", "u1", work, "docs-b")
+        release.set()
+        await wait_done(first)
+        await wait_done(other)
+        later, created_later = queue.submit("ingest", "u1", work, "docs-a")
+        await wait_done(later)
+        return first, again, created_again, other, created_other, later, created_later
+
+    first, again, created_again, other, created_other, later, created_later = asyncio.run(run())
+    assert again is first and not created_again
+    assert other is not first and created_other
+    assert later is not first and created_later
+
+
+def test_jobs_for_one_user_run_one_at_a_time():
+    async def run():
+        queue = JobQueue(workers=4)
+        running, overlap = set(), []
+
+        def work(name):
+            async def run_job(job):
+                overlap.append(len(running))
+                running.add(name)
+                await asyncio.sleep(0.01)
+                running.discard(name)
+            return run_job
+
+        jobs = [queue.submit("ingest", "u1", work(i), str(i))[0] for i in range(3)]
+        for job in jobs:
+            await wait_done(job)
+        return overlap
+
+    assert asyncio.run(run()) == [0, 0, 0]
+
+
+def test_pending_jobs_are_capped():
+    async def run():
+        queue = JobQueue(max_pending=2)
+        release = asyncio.Event()
+
+        async def work(job):
+            await release.wait()
+
+        queue.submit("build", "u1", work)
+        queue.submit("build", "u2", work)
+        with pytest.raises(QueueFull):
+            queue.submit("build", "u3", work)
+        release.set()
+        await queue.shutdown()
+
+    asyncio.run(run())
+
+
+def test_shutdown_lets_running_jobs_finish_and_cancels_the_rest():
+    async def run():
+        queue = JobQueue(workers=1)
+
+        async def quick(job):
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def stuck(job):
+            await asyncio.sleep(10)
+
+        finishing, _ = queue.submit("build", "u1", quick)
+        queued, _ = queue.submit("build", "u2", quick)
+        await asyncio.sleep(0)
+        await queue.shutdown(grace=0.2)
+        with pytest.raises(QueueFull):
+            queue.submit("build", "u3", quick)
+
+        queue.start()
+        hanging, _ = queue.submit("build", "u4", stuck)
+        await asyncio.sleep(0)
+        await queue.shutdown(grace=0.05)
+        return finishing, queued, hanging
+
+    finishing, queued, hanging = asyncio.run(run())
+    assert finishing.state == "succeeded"
+    # The queued job was waiting for the single worker and never started
+    assert queued.state == "cancelled" and queued.started_at is None
+    assert hanging.state == "cancelled"
+
+
+def test_index_jobs_are_polled_by_their_owner(monkeypatch, fake_supabase):
+    monkeypatch.setattr(supabase_db, "SUPABASE_URL", fake_supabase.url)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(auth.router)
+    app.include_router(profile.router)
+    with TestClient(app) as client:
+        def login(email):
+            token = client.post("/login", data={"username": email, "password": "secret"}).json()["access_token"]
+            return {"Authorization": f"Bearer {token}"}
+
+        owner = login("jobs@example.com")
+        submitted = client.post("/index", headers=owner)
+        assert submitted.status_code == 202
+        assert submitted.headers["Location"] == f"/index/jobs/{submitted.json()['job_id']}"
+
+        # There is no Postgres here, so the build fails and the job says why
+        for _ in range(200):
+            job = client.get(submitted.headers["Location"], headers=owner).json()
+            if job["state"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.01)
+        assert job["state"] == "failed" and job["error"]
+        assert client.get(submitted.headers["Location"], headers=login("other@example.com")).status_code == 404
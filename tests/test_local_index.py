@@ -0,0 +1,145 @@
+import os
+import json
+from typing import List
+import pytest
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from utils import local_index
+from utils.local_index import MANIFEST_FILE, load_or_refresh_index, load_manifest, load_index, persist_index, recover_index_dir, index_version
+from utils.vector_store import persist_paths
+
+
+# Records every text it embeds, so a test can tell which files were re-embedded
+class RecordingEmbedding(MockEmbedding):
+    def __init__(self):
+        super().__init__(embed_dim=8)
+        object.__setattr__(self, "texts", [])
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        self.texts.append(text)
+        return super()._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [self._get_text_embedding(text) for text in texts]
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    embed_model = RecordingEmbedding()
+    monkeypatch.setattr(Settings, "_embed_model", embed_model)
+    return embed_model
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    data_dir, index_dir = str(tmp_path / "data"), str(tmp_path / "index")
+    os.makedirs(data_dir)
+    for name in ("a", "b", "c"):
+        write(data_dir, f"{name}.txt", f"{name}-original")
+    return data_dir, index_dir
+
+
+def write(data_dir: str, name: str, text: str):
+    with open(os.path.join(data_dir, name), "w") as file:
+        file.write(text)
+
+
+# Embedded texts carry the file's metadata first, then its content, e.g. "b-changed"
+def embedded_files(embedder) -> set:
+    return {text.splitlines()[-1].split("-")[0] for text in embedder.texts}
+
+
+def manifest_on_disk(index_dir: str) -> dict:
+    with open(os.path.join(index_dir, MANIFEST_FILE)) as file:
+        return json.load(file)
+
+
+def test_refresh_re_embeds_only_added_and_changed_files(embedder, dirs):
+    data_dir, index_dir = dirs
+    load_or_refresh_index(data_dir, index_dir)
+    assert embedded_files(embedder) == {"a", "b", "c"}
+
+    write(data_dir, "b.txt", "b-changed")
+    os.remove(os.path.join(data_dir, "c.txt"))
+    write(data_dir, "d.txt", "d-new")
+    embedder.texts.clear()
+    index, changes = load_or_refresh_index(data_dir, index_dir)
+
+    assert changes == {"added": ["d.txt"], "changed": ["b.txt"], "deleted": ["c.txt"]}
+    assert embedded_files(embedder) == {"b", "d"}
+    assert sorted(manifest_on_disk(index_dir)) == ["a.txt", "b.txt", "d.txt"]
+    texts = sorted(node.get_content() for node in index.docstore.docs.values())
+    assert texts == ["a-original", "b-changed", "d-new"]
+
+
+def test_unchanged_data_is_not_re_embedded_or_rewritten(embedder, dirs):
+    data_dir, index_dir = dirs
+    load_or_refresh_index(data_dir, index_dir)
+    version = index_version(index_dir)
+    embedder.texts.clear()
+
+    _, changes = load_or_refresh_index(data_dir, index_dir)
+    assert changes == {"added": [], "changed": [], "deleted": []}
+    assert embedder.texts == []
+    assert index_version(index_dir) == version
+
+
+def test_crash_between_the_renames_is_recovered(embedder, dirs):
+    data_dir, index_dir = dirs
+    load_or_refresh_index(data_dir, index_dir)
+
+    # persist_index moved the live index aside and died before moving the new one in
+    os.rename(index_dir, f"{index_dir}.old")
+    os.makedirs(f"{index_dir}.tmp")
+    recover_index_dir(index_dir)
+
+    assert os.path.exists(os.path.join(index_dir, MANIFEST_FILE))
+    assert not os.path.exists(f"{index_dir}.old") and not os.path.exists(f"{index_dir}.tmp")
+    embedder.texts.clear()
+    _, changes = load_or_refresh_index(data_dir, index_dir)
+    assert not any(changes.values()) and embedder.texts == []
+
+
+def test_index_without_a_manifest_is_re_embedded_once(embedder, dirs):
+    data_dir, index_dir = dirs
+    load_or_refresh_index(data_dir, index_dir)
+    os.remove(os.path.join(index_dir, MANIFEST_FILE))
+
+    # The legacy path rebuilds the file -> doc id mapping from the docstore, without hashes
+    manifest = load_manifest(load_index(index_dir), index_dir, data_dir)
+    assert sorted(manifest) == ["a.txt", "b.txt", "c.txt"]
+    assert all(entry["hash"] is None and len(entry["doc_ids"]) == 1 for entry in manifest.values())
+
+    embedder.texts.clear()
+    index, changes = load_or_refresh_index(data_dir, index_dir)
+    assert sorted(changes["changed"]) == ["a.txt", "b.txt", "c.txt"]
+    assert len(index.docstore.docs) == 3
+    assert manifest_on_disk(index_dir)["a.txt"]["hash"] is not None
+
+    embedder.texts.clear()
+    load_or_refresh_index(data_dir, index_dir)
+    assert embedder.texts == []
+
+
+def test_switching_the_vector_format_rewrites_the_index(embedder, dirs, monkeypatch):
+    data_dir, index_dir = dirs
+    monkeypatch.setattr(local_index, "LOCAL_VECTOR_FORMAT", "json")
+    load_or_refresh_index(data_dir, index_dir)
+    matrix_path, _ = persist_paths(index_dir)
+    assert not os.path.exists(matrix_path)
+
+    monkeypatch.setattr(local_index, "LOCAL_VECTOR_FORMAT", "mmap")
+    embedder.texts.clear()
+    _, changes = load_or_refresh_index(data_dir, index_dir)
+
+    assert not any(changes.values()) and embedder.texts == []
+    assert os.path.exists(matrix_path)
+    assert not os.path.exists(os.path.join(index_dir, "default__vector_store.json"))
+
+
+def test_persist_replaces_the_previous_index(embedder, dirs):
+    data_dir, index_dir = dirs
+    load_or_refresh_index(data_dir, index_dir)
+    persist_index(load_index(index_dir), {"only.txt": {"hash": "x", "doc_ids": []}}, index_dir)
+    assert manifest_on_disk(index_dir) == {"only.txt": {"hash": "x", "doc_ids": []}}
+    assert sorted(os.listdir(os.path.dirname(index_dir))) == ["data", "index"]
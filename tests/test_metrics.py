@@ -0,0 +1,64 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+from app.api import auth, health, profile
+from app.db import supabase as supabase_db
+from app.lifespan import lifespan
+from app.metrics import setup_metrics
+from app.services.profiles import profile_cache
+from utils import embedding_cache
+
+
+def scrape(client) -> dict:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    samples = {}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    return samples
+
+
+def value(samples: dict, name: str, **labels) -> float:
+    return samples.get((name, tuple(sorted(labels.items()))), 0.0)
+
+
+def test_scrape_reports_routes_in_flight_and_upstream_calls(monkeypatch, fake_supabase):
+    monkeypatch.setattr(supabase_db, "SUPABASE_URL", fake_supabase.url)
+    monkeypatch.setattr(embedding_cache, "EMBED_CACHE_ENABLED", False)
+    profile_cache.clear()
+    app = FastAPI(lifespan=lifespan)
+    setup_metrics(app)
+    app.include_router(health.router)
+    app.include_router(auth.router)
+    app.include_router(profile.router)
+
+    with TestClient(app) as client:
+        before = scrape(client)
+        token = client.post("/login", data={"username": "metrics@example.com", "password": "secret"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/profile", headers=headers).status_code == 200
+        assert client.get("/profile", headers=headers).status_code == 200
+        assert client.get("/index/jobs/abc123", headers=headers).status_code == 404
+        after = scrape(client)
+
+    def delta(name, **labels):
+        return value(after, name, **labels) - value(before, name, **labels)
+
+    # Requests are counted per route template, never per concrete path
+    assert delta("http_request_duration_seconds_count", method="GET", route="/profile", status="200") == 2
+    assert delta("http_request_duration_seconds_count", method="POST", route="/login", status="200") == 1
+    assert delta("http_request_duration_seconds_count", method="GET", route="/index/jobs/{job_id}", status="404") == 1
+    assert not any(dict(labels).get("route") == "/index/jobs/abc123" for _, labels in after)
+    assert delta("http_request_duration_seconds_bucket", method="GET", route="/profile", status="200", le="+Inf") == 2
+
+    # Finished requests have left the gauge; the scrape itself is still in flight
+    assert value(after, "http_requests_in_flight", method="GET", route="/profile") == 0
+    assert value(after, "http_requests_in_flight", method="GET", route="/metrics") == 1
+
+    # Every GoTrue and PostgREST call is timed by the shared client's transport
+    assert delta("upstream_request_duration_seconds_count", service="gotrue", operation="POST token", outcome="2xx") == 1
+    assert delta("upstream_request_duration_seconds_count", service="postgrest",
+                 operation="POST rpc/get_or_create_profile", outcome="2xx") >= 1
+    assert value(after, "upstream_requests_in_flight", service="postgrest") == 0
+    assert ("db_pool_connections", (("state", "max"),)) in after
@@ -0,0 +1,73 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import auth, profile
+from app.db import supabase as supabase_db
+from app.lifespan import lifespan
+from app.services.profiles import profile_cache
+from app.services.token_verifier import token_verifier
+from tests.conftest import FAKE_JWT_SECRET
+
+
+def make_client(monkeypatch, fake_supabase):
+    monkeypatch.setattr(supabase_db, "SUPABASE_URL", fake_supabase.url)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(auth.router)
+    app.include_router(profile.router)
+    return TestClient(app)
+
+
+def test_if_none_match_is_checked_against_the_row_not_the_cache(monkeypatch, fake_supabase):
+    # Periodic revalidation off, so only the 304 path can notice the other worker's write
+    monkeypatch.setattr(profile_cache, "revalidate_after", 0)
+    profile_cache.clear()
+    with make_client(monkeypatch, fake_supabase) as client:
+        token = client.post("/login", data={"username": "etag@example.com", "password": "secret"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        first = client.get("/profile", headers=headers)
+        etag = first.headers["ETag"]
+        assert client.get("/profile", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+        # Another worker updates the row; this worker's cache still holds the old copy
+        [row] = [row for row in fake_supabase.profiles.values() if row["email"] == "etag@example.com"]
+        row.update(full_name="Changed", updated_at="2030-01-01T00:00:00+00:00")
+
+        response = client.get("/profile", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["full_name"] == "Changed"
+        assert response.headers["ETag"] != etag
+
+
+def test_profile_needs_the_service_role_key(monkeypatch, fake_supabase):
+    # With the anon key PostgREST applies row level security to the API's own calls
+    monkeypatch.setattr(supabase_db, "SUPABASE_KEY", "some-anon-key")
+    profile_cache.clear()
+    with make_client(monkeypatch, fake_supabase) as client:
+        token = client.post("/login", data={"username": "anon@example.com", "password": "secret"}).json()["access_token"]
+        response = client.get("/profile", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 400
+        assert "permission denied" in response.json()["detail"]
+    assert fake_supabase.profiles == {}
+
+
+def test_anon_keys_are_recognised():
+    assert supabase_db.key_role("sb_publishable_abc") == "anon"
+    assert supabase_db.key_role("sb_secret_abc") == "service_role"
+    assert supabase_db.key_role("x.eyJyb2xlIjoiYW5vbiJ9.y") == "anon"
+    assert supabase_db.key_role("not-a-jwt") is None
+
+
+def test_settings_writes_reject_a_signed_out_token(monkeypatch, fake_supabase):
+    # Reads verify the token locally, with the fake's signing secret
+    monkeypatch.setattr(token_verifier, "secret", FAKE_JWT_SECRET)
+    monkeypatch.setattr(token_verifier, "issuer", f"{fake_supabase.url}/auth/v1")
+    profile_cache.clear()
+    with make_client(monkeypatch, fake_supabase) as client:
+        token = client.post("/login", data={"username": "logout@example.com", "password": "secret"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/profile", headers=headers).status_code == 200
+        assert client.put("/settings", json={"theme": "dark"}, headers=headers).status_code == 200
+        assert client.post("/logout", headers=headers).status_code == 200
+
+        # The access token still verifies locally until it expires, but writes ask the auth server
+        assert client.get("/profile", headers=headers).status_code == 200
+        assert client.put("/settings", json={"theme": "light"}, headers=headers).status_code == 401
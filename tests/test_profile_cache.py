@@ -0,0 +1,21 @@
+import time
+from utils.profile_cache import ProfileCache, PROFILE_CACHE_REVALIDATE_SECONDS
+
+
+def test_revalidation_is_on_by_default():
+    assert PROFILE_CACHE_REVALIDATE_SECONDS > 0
+    assert ProfileCache().revalidate_after > 0
+
+
+def test_write_by_another_process_is_seen_after_revalidation():
+    row = {"user_id": "u", "full_name": "Old", "updated_at": "1"}
+    cache = ProfileCache(revalidate_after=0.01, enabled=True)
+    cache.get_or_load("u", lambda user_id: dict(row), lambda user_id: row["updated_at"])
+
+    # Another worker updates the row; this process's cache still holds the old one
+    row.update(full_name="New", updated_at="2")
+    time.sleep(0.02)
+    profile = cache.get_or_load("u", lambda user_id: dict(row), lambda user_id: row["updated_at"])
+
+    assert profile["full_name"] == "New"
+    assert cache.stats()["stale"] == 1
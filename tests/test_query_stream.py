@@ -0,0 +1,113 @@
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import auth, profile
+from app.db import supabase as supabase_db
+from app.db.postgres import PoolTimeoutError
+from app.lifespan import lifespan
+
+
+# Stands in for the llama_index streaming response; fails after `fail_after` tokens if set
+class FakeStreamingResponse:
+    def __init__(self, tokens, fail_after: int = None):
+        self.tokens = tokens
+        self.fail_after = fail_after
+        self.closed = False
+
+    async def async_response_gen(self):
+        try:
+            for i, token in enumerate(self.tokens):
+                if i == self.fail_after:
+                    raise RuntimeError("LLM connection reset")
+                yield token
+        finally:
+            self.closed = True
+
+
+@pytest.fixture
+def client(monkeypatch, fake_supabase):
+    monkeypatch.setattr(supabase_db, "SUPABASE_URL", fake_supabase.url)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(auth.router)
+    app.include_router(profile.router)
+    with TestClient(app) as client:
+        token = client.post("/login", data={"username": "stream@example.com", "password": "secret"}).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+def answer_with(monkeypatch, response):
+    queries = []
+
+    async def stream_user_index(user_id, query):
+        queries.append(query)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(profile, "stream_user_index", stream_user_index)
+    return queries
+
+
+def sse_events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_sse_streams_tokens_then_done(client, monkeypatch):
+    answer = FakeStreamingResponse(["Hello", ", ", "world"])
+    queries = answer_with(monkeypatch, answer)
+
+    response = client.post("/query/sse", json={"query": "greet me"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["x-accel-buffering"] == "no"
+    events = sse_events(response.text)
+    assert events[:3] == [("token", {"token": "Hello"}), ("token", {"token": ", "}), ("token", {"token": "world"})]
+    event, done = events[3]
+    assert event == "done" and done["tokens"] == 3
+    assert done["ttft_ms"] is not None and done["total_ms"] >= done["ttft_ms"]
+    assert len(events) == 4 and queries == ["greet me"] and answer.closed
+
+
+def test_sse_sends_an_error_event_when_generation_fails_mid_stream(client, monkeypatch):
+    answer = FakeStreamingResponse(["partial", " answer", " never sent"], fail_after=2)
+    answer_with(monkeypatch, answer)
+
+    response = client.post("/query/sse", json={"query": "explain"})
+
+    # The status line went out with the first token, so the failure arrives as an event
+    assert response.status_code == 200
+    events = sse_events(response.text)
+    assert events == [
+        ("token", {"token": "partial"}),
+        ("token", {"token": " answer"}),
+        ("error", {"detail": "LLM connection reset"}),
+    ]
+    assert answer.closed
+
+
+def test_ndjson_stream_reports_the_same_error(client, monkeypatch):
+    answer_with(monkeypatch, FakeStreamingResponse(["partial", " answer"], fail_after=1))
+
+    response = client.post("/query", json={"query": "explain"})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"token": "partial"}, {"event": "error", "detail": "LLM connection reset"}]
+
+
+def test_failures_before_the_first_token_are_http_errors(client, monkeypatch):
+    answer_with(monkeypatch, PoolTimeoutError("pool exhausted"))
+    response = client.post("/query/sse", json={"query": "explain"})
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+
+    answer_with(monkeypatch, RuntimeError("index missing"))
+    response = client.post("/query/sse", json={"query": "explain"})
+    assert response.status_code == 500
+    assert "index missing" in response.json()["detail"]
@@ -0,0 +1,78 @@
+import time
+import sqlite3
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import auth
+from app.db import supabase as supabase_db
+from app.lifespan import lifespan
+from app.services import rate_limit
+from app.services.rate_limit import ConcurrencyLimit, MemoryBackend, RateLimiter, SQLiteBackend, Rule
+
+
+def test_locked_sqlite_file_fails_open_quickly(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    limiter = RateLimiter(SQLiteBackend(path=path, timeout=0.05), rules={"login": (Rule("1/60"), Rule("1/60"))}, enabled=True)
+    # Another worker holding the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        started = time.perf_counter()
+        assert limiter.check("login", "10.0.0.1", "a@example.com") == (0.0, None)
+        assert time.perf_counter() - started < 0.5
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+
+def test_sqlite_buckets_are_shared_between_backends(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    rules = {"login": (Rule("1/60"), Rule("1/60"))}
+    first = RateLimiter(SQLiteBackend(path=path), rules=rules, enabled=True)
+    second = RateLimiter(SQLiteBackend(path=path), rules=rules, enabled=True)
+    assert first.check("login", "10.0.0.1", now=1000) == (0.0, None)
+    wait, scope = second.check("login", "10.0.0.1", now=1000)
+    assert scope == "ip" and wait > 0
+
+
+@pytest.fixture
+def client(monkeypatch, fake_supabase):
+    monkeypatch.setattr(supabase_db, "SUPABASE_URL", fake_supabase.url)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKEND", "memory")
+    limiter = RateLimiter(MemoryBackend(), rules={"login": (Rule("2/60"), Rule("5/60"))}, enabled=True)
+    monkeypatch.setattr(rate_limit, "_limiter", limiter)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(auth.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def login(client, email: str):
+    return client.post("/login", data={"username": email, "password": "secret"})
+
+
+def test_login_returns_429_with_retry_after_once_the_ip_bucket_is_empty(client, fake_supabase):
+    assert login(client, "first@example.com").status_code == 200
+    assert login(client, "second@example.com").status_code == 200
+    token_calls = fake_supabase.requests["gotrue.token"]
+
+    # A different account doesn't help: the address has spent its two tokens
+    response = login(client, "third@example.com")
+    assert response.status_code == 429
+    # One token comes back every 30 seconds
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+    assert fake_supabase.requests["gotrue.token"] == token_calls
+
+
+def test_login_returns_503_while_the_upstream_limit_is_saturated(client, monkeypatch):
+    limit = ConcurrencyLimit(limit=1, timeout=0.05)
+    monkeypatch.setattr(auth, "auth_upstream_limit", limit)
+
+    # Hold the only slot on the app's event loop, as a slow GoTrue call would
+    client.portal.call(limit.semaphore.acquire)
+    response = login(client, "busy@example.com")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    client.portal.call(limit.semaphore.release)
+    assert login(client, "busy@example.com").status_code == 200
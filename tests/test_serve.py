@@ -0,0 +1,23 @@
+import os
+import serve
+
+
+def test_single_worker_by_default(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert serve.default_workers() == 1
+
+
+def test_several_workers_share_rate_limits_through_sqlite(monkeypatch):
+    # Set first so monkeypatch restores the variable whatever configure_workers does
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "")
+    monkeypatch.delenv("RATE_LIMIT_BACKEND")
+    serve.configure_workers(1)
+    assert "RATE_LIMIT_BACKEND" not in os.environ
+    serve.configure_workers(4)
+    assert os.environ["RATE_LIMIT_BACKEND"] == "sqlite"
+
+
+def test_explicit_rate_limit_backend_is_kept(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "memory")
+    serve.configure_workers(4)
+    assert os.environ["RATE_LIMIT_BACKEND"] == "memory"
@@ -0,0 +1,19 @@
+import threading
+import pytest
+from benchmarks.auth_sessions import StubServer, make_handler, run_mode
+
+
+@pytest.fixture
+def stub_url():
+    connections = []
+    lock = threading.Lock()
+    server = StubServer(("127.0.0.1", 0), make_handler(0.005, connections, lock))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", connections, lock
+    server.shutdown()
+
+
+def test_concurrent_sessions_each_see_their_own_user(stub_url):
+    url, connections, lock = stub_url
+    result = run_mode("per-session", url, 20, connections, lock)
+    assert result["wrong_user"] == 0
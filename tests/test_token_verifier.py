@@ -0,0 +1,49 @@
+import time
+import asyncio
+import pytest
+from app.services.token_verifier import JWKSCache, TokenVerificationError
+
+
+class CountingJWKS(JWKSCache):
+    def __init__(self, fail: bool = False):
+        super().__init__("http://jwks.invalid/keys")
+        self.fail = fail
+        self.fetches = 0
+
+    def refresh(self):
+        self.fetches += 1
+        time.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("JWKS endpoint is down")
+        with self._lock:
+            self._keys = {"kid-1": "key-1"}
+            self._last_fetch = time.monotonic()
+
+
+def test_concurrent_unknown_kid_fetches_once():
+    jwks = CountingJWKS()
+
+    async def run():
+        return await asyncio.gather(*(jwks.get_key("kid-1") for _ in range(20)))
+
+    assert asyncio.run(run()) == ["key-1"] * 20
+    assert jwks.fetches == 1
+
+
+def test_rotated_kid_is_not_refetched_within_min_gap():
+    jwks = CountingJWKS()
+    asyncio.run(jwks.get_key("kid-1"))
+    with pytest.raises(TokenVerificationError):
+        asyncio.run(jwks.get_key("kid-2"))
+    assert jwks.fetches == 1
+
+
+def test_failing_endpoint_is_not_retried_by_every_request():
+    jwks = CountingJWKS(fail=True)
+
+    async def run():
+        return await asyncio.gather(*(jwks.get_key("kid-1") for _ in range(10)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, TokenVerificationError) for result in results)
+    assert jwks.fetches == 1
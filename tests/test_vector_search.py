@@ -0,0 +1,68 @@
+from app.db import postgres
+from app.services.llama_index import SearchTunedCollection, VECTOR_HNSW_EF_SEARCH
+
+
+# A DB-API connection that records what the engine's connect hook runs on it
+class RecordingConnection:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        if self.fail:
+            raise RuntimeError('unrecognized configuration parameter "hnsw.iterative_scan"')
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+class RecordingCollection:
+    name = "user_documents"
+
+    def __init__(self):
+        self.calls = []
+
+    def query(self, **kwargs):
+        self.calls.append(kwargs)
+        return []
+
+
+def test_new_connections_keep_scanning_filtered_hnsw_queries():
+    connection = RecordingConnection()
+    postgres.configure_connection(connection, None)
+    assert connection.statements == ["SET hnsw.iterative_scan = strict_order"]
+    assert connection.commits == 1
+
+
+def test_older_pgvector_keeps_the_connection_usable(monkeypatch):
+    connection = RecordingConnection(fail=True)
+    postgres.configure_connection(connection, None)
+    assert connection.rollbacks == 1
+
+    monkeypatch.setattr(postgres, "VECTOR_HNSW_ITERATIVE_SCAN", "off")
+    connection = RecordingConnection()
+    postgres.configure_connection(connection, None)
+    assert connection.statements == []
+
+
+def test_queries_pass_ef_search_to_vecs():
+    collection = RecordingCollection()
+    tuned = SearchTunedCollection(collection)
+    tuned.query(data=[0.0], limit=5, filters={"user_id": {"$eq": "u"}})
+    tuned.query(data=[0.0], limit=VECTOR_HNSW_EF_SEARCH + 50)
+
+    assert collection.calls[0]["ef_search"] == VECTOR_HNSW_EF_SEARCH
+    assert collection.calls[1]["ef_search"] == VECTOR_HNSW_EF_SEARCH + 50
+    assert tuned.name == "user_documents"
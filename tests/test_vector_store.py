@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+from llama_index.core.vector_stores.simple import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from utils.vector_store import MmapVectorStore, VECTOR_STORE_NAME, convert_json_store, persist_paths
+
+
+def write_json_store(persist_dir: str, count: int = 20, dim: int = 16) -> SimpleVectorStore:
+    rng = np.random.default_rng(0)
+    nodes = []
+    for i in range(count):
+        node = TextNode(
+            id_=f"node-{i}",
+            text=f"chunk {i}",
+            metadata={"file_name": f"doc-{i % 3}.txt", "page": i},
+            embedding=rng.standard_normal(dim).tolist(),
+        )
+        node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=f"doc-{i % 3}")
+        nodes.append(node)
+    simple = SimpleVectorStore()
+    simple.add(nodes)
+    simple.persist(os.path.join(persist_dir, f"{VECTOR_STORE_NAME}.json"))
+    return simple
+
+
+@pytest.mark.parametrize("dtype, atol", [("float32", 1e-6), ("float16", 1e-3)])
+def test_convert_round_trips_ids_metadata_and_vectors(tmp_path, dtype, atol):
+    original = write_json_store(str(tmp_path)).data
+
+    convert_json_store(str(tmp_path), dtype=dtype)
+
+    assert not os.path.exists(tmp_path / f"{VECTOR_STORE_NAME}.json")
+    assert all(os.path.exists(path) for path in persist_paths(str(tmp_path)))
+    store = MmapVectorStore.from_persist_dir(str(tmp_path))
+    assert store.dtype == dtype
+    restored = store.to_simple().data
+    assert list(restored.embedding_dict) == list(original.embedding_dict)
+    assert restored.text_id_to_ref_doc_id == original.text_id_to_ref_doc_id
+    assert restored.metadata_dict == original.metadata_dict
+    for node_id, embedding in original.embedding_dict.items():
+        np.testing.assert_allclose(restored.embedding_dict[node_id], embedding, atol=atol)
+
+
+def test_convert_can_keep_the_json_store(tmp_path):
+    write_json_store(str(tmp_path))
+    convert_json_store(str(tmp_path), keep_json=True)
+    assert os.path.exists(tmp_path / f"{VECTOR_STORE_NAME}.json")
+
+
+def make_store(count: int = 500, dim: int = 32, **kwargs) -> MmapVectorStore:
+    rng = np.random.default_rng(1)
+    store = MmapVectorStore(**kwargs)
+    nodes = []
+    for i in range(count):
+        node = TextNode(id_=f"node-{i}", text="", embedding=rng.standard_normal(dim).tolist())
+        node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=f"doc-{i % 10}")
+        nodes.append(node)
+    store.add(nodes)
+    return store
+
+
+# Brute-force cosine ranking over every stored vector
+def exact_top(store: MmapVectorStore, query, k: int):
+    embeddings = store.to_simple().data.embedding_dict
+    ids = list(embeddings)
+    matrix = np.asarray([embeddings[node_id] for node_id in ids])
+    scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    order = np.argsort(-scores)[:k]
+    return [ids[i] for i in order], scores[order]
+
+
+def queries(count: int = 20, dim: int = 32):
+    return np.random.default_rng(2).standard_normal((count, dim))
+
+
+def test_argpartition_top_k_matches_an_exact_sort():
+    store = make_store()
+    for query in queries():
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=10))
+        ids, scores = exact_top(store, query, 10)
+        assert result.ids == ids
+        np.testing.assert_allclose(result.similarities, scores, rtol=1e-5)
+
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+def test_quantized_scan_with_re_rank_keeps_recall(quantization):
+    store = make_store(quantization=quantization)
+    found = 0
+    for query in queries():
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=10))
+        ids, _ = exact_top(store, query, 10)
+        found += len(set(result.ids) & set(ids))
+        # Re-ranked scores are exact, so they come back sorted
+        assert result.similarities == sorted(result.similarities, reverse=True)
+    assert found / (20 * 10) >= 0.95
+
+
+def test_query_many_matches_single_queries():
+    store = make_store()
+    batch = queries()
+    results = store.query_many(batch, 5)
+    for query, result in zip(batch, results):
+        assert result.ids == store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5)).ids
+
+
+def test_deletes_invalidate_the_prepared_arrays():
+    store = make_store(quantization="int8")
+    query = store.get("node-7")
+    assert store.query(VectorStoreQuery(query_embedding=query, similarity_top_k=1)).ids == ["node-7"]
+
+    store.delete("doc-7")
+    assert store.num_vectors == 450
+    result = store.query(VectorStoreQuery(query_embedding=query, similarity_top_k=5))
+    assert not any(node_id in ("node-7", "node-17") for node_id in result.ids)
+    assert result.ids == exact_top(store, query, 5)[0]
+
+
+def test_concurrent_first_queries_share_a_consistent_build():
+    store = make_store(count=2000, quantization="int8")
+    batch = queries(8)
+    expected = [result.ids for result in make_store(count=2000, quantization="int8").query_many(batch, 5)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda query: store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5)).ids, batch))
+    assert results == expected
@@ -0,0 +1,163 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+# Cosine similarity above which a differently worded prompt reuses an answer; 0 disables
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0"))
+# Cached answers are replayed a few words at a time so the UI still renders a stream
+REPLAY_WORDS_PER_CHUNK = 3
+
+
+def normalize_prompt(prompt: str) -> str:
+    prompt = re.sub(r"\s+", " ", prompt.lower()).strip()
+    return prompt.rstrip("?!. ")
+
+
+def fingerprint(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CachedEntry:
+    def __init__(self, scope: str, prompt: str, answer: str, embedding, expires_at: float):
+        self.scope = scope
+        self.prompt = prompt
+        self.answer = answer
+        self.embedding = embedding
+        self.expires_at = expires_at
+
+
+# Stream stand-in with the same response_gen interface as a chat engine stream
+class ReplayedStream:
+    def __init__(self, answer: str):
+        self.response = answer
+
+    @property
+    def response_gen(self):
+        words = self.response.split(" ")
+        for i in range(0, len(words), REPLAY_WORDS_PER_CHUNK):
+            chunk = " ".join(words[i:i + REPLAY_WORDS_PER_CHUNK])
+            yield chunk if i + REPLAY_WORDS_PER_CHUNK >= len(words) else chunk + " "
+
+
+# Passes a live stream through and stores the full answer once it has been read to the end
+class RecordingStream:
+    def __init__(self, stream, on_complete):
+        self.stream = stream
+        self.on_complete = on_complete
+
+    @property
+    def response_gen(self):
+        chunks = []
+        for chunk in self.stream.response_gen:
+            chunks.append(chunk)
+            yield chunk
+        self.on_complete("".join(chunks))
+
+
+# Answers keyed by normalized prompt within a scope (model settings and index version).
+# Optionally matches a new prompt to a cached one by embedding
+# similarity. Entries expire after ttl seconds and the least recently used are evicted
+# beyond max_entries; changing the index version drops everything cached before it.
+class AnswerCache:
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl: float = ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.index_version = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def scope(self, model: str, temperature: float, context: str) -> str:
+        return fingerprint(model, temperature, self.index_version, context)
+
+    def set_index_version(self, version: str):
+        with self._lock:
+            if version != self.index_version:
+                self._entries.clear()
+                self.index_version = version
+
+    def get(self, scope: str, prompt: str, embed_fn=None):
+        normalized = normalize_prompt(prompt)
+        now = time.time()
+        with self._lock:
+            key = (scope, normalized)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer
+            if entry is not None:
+                del self._entries[key]
+            candidates = [
+                item for item in self._entries.values()
+                if item.scope == scope and item.expires_at > now and item.embedding is not None
+            ]
+
+        if self.similarity_threshold > 0 and embed_fn is not None and candidates:
+            query = np.asarray(embed_fn(normalized), dtype=np.float32)
+            matrix = np.asarray([item.embedding for item in candidates], dtype=np.float32)
+            scores = matrix @ query / np.maximum(np.linalg.norm(matrix, axis=1) * np.linalg.norm(query), 1e-12)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold:
+                with self._lock:
+                    self.hits += 1
+                    self.semantic_hits += 1
+                return candidates[best].answer
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, scope: str, prompt: str, answer: str, embed_fn=None):
+        normalized = normalize_prompt(prompt)
+        embedding = None
+        if self.similarity_threshold > 0 and embed_fn is not None:
+            embedding = embed_fn(normalized)
+        with self._lock:
+            key = (scope, normalized)
+            self._entries[key] = CachedEntry(scope, normalized, answer, embedding, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
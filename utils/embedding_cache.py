@@ -0,0 +1,248 @@
+import os
+import sys
+import time
+import sqlite3
+import asyncio
+import hashlib
+import argparse
+import threading
+from typing import Any, List, Optional
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+# One cache file shared by the Streamlit chat index and the FastAPI service
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.expanduser("~/.cache/supabase-authentication/embeddings.sqlite3"))
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+# A hit only rewrites last_used when the stored value is older than this, so hot entries
+# don't turn every lookup into a write; eviction order is only this precise
+EMBED_CACHE_TOUCH_SECONDS = float(os.getenv("EMBED_CACHE_TOUCH_SECONDS", "3600"))
+# SQLite caps bound parameters per statement
+LOOKUP_BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Content-addressed store of embeddings keyed by (model, sha256 of the text). WAL mode
+# and a busy timeout let several threads and processes read and write the same file;
+# each thread gets its own connection. Triggers keep the row count in embedding_count so
+# checking the cap on a write doesn't scan the table.
+class EmbeddingCache:
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES,
+                 touch_seconds: float = EMBED_CACHE_TOUCH_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_seconds = touch_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, hash))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS embedding_count (id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS embeddings_counted_insert AFTER INSERT ON embeddings "
+                "BEGIN UPDATE embedding_count SET entries = entries + 1; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS embeddings_counted_delete AFTER DELETE ON embeddings "
+                "BEGIN UPDATE embedding_count SET entries = entries - 1; END"
+            )
+            # Counted once, after the triggers exist, for files written before the counter
+            conn.execute("INSERT OR IGNORE INTO embedding_count (id, entries) SELECT 0, count(*) FROM embeddings")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        used = {}
+        conn = self._connect()
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), LOOKUP_BATCH_SIZE):
+            batch = unique[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT hash, vector, last_used FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                [model, *batch],
+            ).fetchall()
+            for digest, vector, last_used in rows:
+                found[digest] = np.frombuffer(vector, dtype=np.float32).tolist()
+                used[digest] = last_used
+
+        now = time.time()
+        stale = [(now, model, digest) for digest, last_used in used.items() if now - last_used >= self.touch_seconds]
+        if stale:
+            with conn:
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?", stale)
+        results = [found.get(digest) for digest in hashes]
+        hits = sum(1 for result in results if result is not None)
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (model, text_hash(text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (model, hash) DO UPDATE SET last_used = excluded.last_used",
+                rows,
+            )
+            # Least recently used entries go first once the cap is exceeded
+            over = conn.execute("SELECT entries FROM embedding_count").fetchone()[0] - self.max_entries
+            evicted = 0
+            if over > 0:
+                evicted = conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (over,),
+                ).rowcount
+        with self._stats_lock:
+            self.writes += len(rows)
+            self.evictions += evicted
+
+    def entries(self) -> int:
+        return self._connect().execute("SELECT entries FROM embedding_count").fetchone()[0]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM embeddings")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": self.entries(),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
+
+
+# Wraps any embedding model so document embeddings are looked up in the cache first and
+# only the misses are sent upstream. Query embeddings pass straight through.
+class CachedEmbedding(BaseEmbedding):
+    model: BaseEmbedding
+
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, model: BaseEmbedding, cache: EmbeddingCache, **kwargs: Any):
+        super().__init__(
+            model=model,
+            model_name=model.model_name,
+            embed_batch_size=model.embed_batch_size,
+            **kwargs,
+        )
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.model.class_name()}:{self.model.model_name}"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def _missing(self, texts: List[str], cached: list) -> List[str]:
+        # Repeated chunks (boilerplate, headers) are embedded once per batch
+        return list(dict.fromkeys(text for text, embedding in zip(texts, cached) if embedding is None))
+
+    def _merge(self, texts: List[str], cached: list, missing: List[str], fresh: List[List[float]]) -> List[List[float]]:
+        fresh = dict(zip(missing, fresh))
+        return [embedding if embedding is not None else fresh[text] for text, embedding in zip(texts, cached)]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        cached = self._cache.get_many(self.cache_key, texts)
+        missing = self._missing(texts, cached)
+        fresh = self.model.get_text_embedding_batch(missing) if missing else []
+        self._cache.put_many(self.cache_key, missing, fresh)
+        return self._merge(texts, cached, missing, fresh)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        cached = await asyncio.to_thread(self._cache.get_many, self.cache_key, texts)
+        missing = self._missing(texts, cached)
+        fresh = await self.model.aget_text_embedding_batch(missing) if missing else []
+        await asyncio.to_thread(self._cache.put_many, self.cache_key, missing, fresh)
+        return self._merge(texts, cached, missing, fresh)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self.model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self.model.aget_query_embedding(query)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+def cached_embed_model(model: BaseEmbedding) -> BaseEmbedding:
+    if not EMBED_CACHE_ENABLED or isinstance(model, CachedEmbedding):
+        return model
+    return CachedEmbedding(model, get_embedding_cache())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the shared embedding cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--path", default=EMBED_CACHE_PATH)
+    args = parser.parse_args(argv)
+    cache = EmbeddingCache(args.path)
+    if args.command == "clear":
+        cache.clear()
+    stats = cache.stats()
+    print(f"{stats['entries']} entries (max {stats['max_entries']}) in {stats['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
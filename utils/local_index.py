@@ -0,0 +1,184 @@
+import os
+import json
+import shutil
+import hashlib
+from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, load_index_from_storage
+from llama_index.core.vector_stores.simple import SimpleVectorStore
+from utils.vector_store import MmapVectorStore, persist_paths
+
+DATA_DIR = "./data"
+INDEX_DIR = "./index"
+# Maps each file under DATA_DIR to its content hash and the docstore ids built from it
+MANIFEST_FILE = "data_manifest.json"
+# "mmap" keeps embeddings in a memory-mapped .npy matrix, "json" in LlamaIndex's default JSON store
+LOCAL_VECTOR_FORMAT = os.getenv("LOCAL_VECTOR_FORMAT", "mmap")
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32")
+# "int8" or "float16" scans a quantized copy and re-ranks the top candidates exactly
+LOCAL_VECTOR_QUANTIZATION = os.getenv("LOCAL_VECTOR_QUANTIZATION", "none")
+LOCAL_VECTOR_RERANK_FACTOR = int(os.getenv("LOCAL_VECTOR_RERANK_FACTOR", "4"))
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_data(data_dir=DATA_DIR):
+    files = {}
+    for root, _, filenames in os.walk(data_dir):
+        for filename in filenames:
+            if filename.startswith("."):
+                continue
+            path = os.path.join(root, filename)
+            files[os.path.relpath(path, data_dir)] = hash_file(path)
+    return files
+
+
+def load_manifest(index, index_dir=INDEX_DIR, data_dir=DATA_DIR):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path) as file:
+            return json.load(file)
+
+    # Index persisted before manifests existed: recover file -> doc id mapping from the
+    # docstore. The hash is unknown, so each of these files is re-embedded once.
+    manifest = {}
+    for doc_id, info in index.docstore.get_all_ref_doc_info().items():
+        file_path = info.metadata.get("file_path", "")
+        data_root = os.path.abspath(data_dir)
+        if os.path.abspath(file_path).startswith(data_root + os.sep):
+            relpath = os.path.relpath(os.path.abspath(file_path), data_root)
+        else:
+            relpath = info.metadata.get("file_name", file_path)
+        manifest.setdefault(relpath, {"hash": None, "doc_ids": []})["doc_ids"].append(doc_id)
+    return manifest
+
+
+# Changes whenever the indexed content changes, and only then
+def index_version(index_dir=INDEX_DIR):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def _load_documents(relpaths, data_dir=DATA_DIR):
+    if not relpaths:
+        return []
+    input_files = [os.path.join(data_dir, relpath) for relpath in relpaths]
+    return SimpleDirectoryReader(input_files=input_files, filename_as_id=True).load_data()
+
+
+def _relpath_of(doc, data_dir=DATA_DIR):
+    return os.path.relpath(os.path.abspath(doc.metadata["file_path"]), os.path.abspath(data_dir))
+
+
+def _store_options():
+    return {"quantization": LOCAL_VECTOR_QUANTIZATION, "rerank_factor": LOCAL_VECTOR_RERANK_FACTOR}
+
+
+def new_vector_store():
+    if LOCAL_VECTOR_FORMAT == "mmap":
+        return MmapVectorStore(dtype=LOCAL_VECTOR_DTYPE, **_store_options())
+    return SimpleVectorStore()
+
+
+def build_index(data_dir=DATA_DIR):
+    files = scan_data(data_dir)
+    docs = _load_documents(sorted(files), data_dir)
+    storage_context = StorageContext.from_defaults(vector_store=new_vector_store())
+    index = VectorStoreIndex.from_documents(docs, storage_context=storage_context)
+    manifest = {relpath: {"hash": digest, "doc_ids": []} for relpath, digest in files.items()}
+    for doc in docs:
+        manifest[_relpath_of(doc, data_dir)]["doc_ids"].append(doc.doc_id)
+    return index, manifest
+
+
+# Re-embeds only files whose content hash changed, inserts new files and drops the
+# nodes of deleted ones. Returns the updated manifest and what changed.
+def refresh_index(index, manifest, data_dir=DATA_DIR):
+    files = scan_data(data_dir)
+    added = [relpath for relpath in files if relpath not in manifest]
+    changed = [relpath for relpath in files if relpath in manifest and manifest[relpath]["hash"] != files[relpath]]
+    deleted = [relpath for relpath in manifest if relpath not in files]
+
+    manifest = dict(manifest)
+    for relpath in changed + deleted:
+        for doc_id in manifest[relpath]["doc_ids"]:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        del manifest[relpath]
+
+    for relpath in added + changed:
+        manifest[relpath] = {"hash": files[relpath], "doc_ids": []}
+    for doc in _load_documents(added + changed, data_dir):
+        index.insert(doc)
+        manifest[_relpath_of(doc, data_dir)]["doc_ids"].append(doc.doc_id)
+
+    return manifest, {"added": added, "changed": changed, "deleted": deleted}
+
+
+# Writes to a sibling directory and swaps it in with renames, so a crash leaves
+# either the old or the new index on disk, never a half-written one.
+def persist_index(index, manifest, index_dir=INDEX_DIR):
+    tmp_dir = f"{index_dir}.tmp"
+    backup_dir = f"{index_dir}.old"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    index.storage_context.persist(persist_dir=tmp_dir)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+        file.flush()
+        os.fsync(file.fileno())
+
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    if os.path.exists(index_dir):
+        os.rename(index_dir, backup_dir)
+    os.rename(tmp_dir, index_dir)
+    shutil.rmtree(backup_dir, ignore_errors=True)
+
+
+def recover_index_dir(index_dir=INDEX_DIR):
+    # A crash between the two renames in persist_index leaves only the backup
+    backup_dir = f"{index_dir}.old"
+    if not os.path.exists(index_dir) and os.path.exists(backup_dir):
+        os.rename(backup_dir, index_dir)
+    shutil.rmtree(f"{index_dir}.tmp", ignore_errors=True)
+
+
+def _stored_format(index_dir=INDEX_DIR):
+    return "mmap" if os.path.exists(persist_paths(index_dir)[0]) else "json"
+
+
+def load_index(index_dir=INDEX_DIR):
+    if _stored_format(index_dir) == "mmap":
+        vector_store = MmapVectorStore.from_persist_dir(index_dir, **_store_options())
+        if LOCAL_VECTOR_FORMAT == "json":
+            vector_store = vector_store.to_simple()
+    else:
+        vector_store = SimpleVectorStore.from_persist_dir(index_dir)
+        # Switching formats converts in memory; the next persist writes the new layout
+        if LOCAL_VECTOR_FORMAT == "mmap":
+            vector_store = MmapVectorStore.from_simple(vector_store, dtype=LOCAL_VECTOR_DTYPE, **_store_options())
+    storage_context = StorageContext.from_defaults(persist_dir=index_dir, vector_store=vector_store)
+    return load_index_from_storage(storage_context)
+
+
+# Loads ./index and brings it up to date with ./data, or builds it from scratch.
+# Returns the index and a summary of what was re-embedded.
+def load_or_refresh_index(data_dir=DATA_DIR, index_dir=INDEX_DIR):
+    recover_index_dir(index_dir)
+    if not os.path.exists(index_dir):
+        index, manifest = build_index(data_dir)
+        persist_index(index, manifest, index_dir)
+        return index, {"added": sorted(manifest), "changed": [], "deleted": []}
+
+    index = load_index(index_dir)
+    manifest = load_manifest(index, index_dir, data_dir)
+    manifest, changes = refresh_index(index, manifest, data_dir)
+    stale = not os.path.exists(os.path.join(index_dir, MANIFEST_FILE)) or _stored_format(index_dir) != LOCAL_VECTOR_FORMAT
+    if any(changes.values()) or stale:
+        persist_index(index, manifest, index_dir)
+    return index, changes
@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+PROFILE_CACHE_ENABLED = os.getenv("PROFILE_CACHE_ENABLED", "true").lower() == "true"
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60"))
+# Each process has its own cache, so a write made by another worker (or by the other app)
+# is only seen after a check: a cached profile that hasn't been checked for this many
+# seconds is compared with the row's updated_at before it is served. Writes made by this
+# process are always visible immediately; 0 disables the check.
+PROFILE_CACHE_REVALIDATE_SECONDS = float(os.getenv("PROFILE_CACHE_REVALIDATE_SECONDS", "5"))
+
+
+class _Entry:
+    __slots__ = ("profile", "expires_at", "validated_at")
+
+    def __init__(self, profile: dict, expires_at: float):
+        self.profile = profile
+        self.expires_at = expires_at
+        self.validated_at = time.monotonic()
+
+
+# Profiles keyed by user id, each with its own expiry, bounded to max_entries by LRU.
+# Writers call write() with the row they got back so the next read sees it at once.
+# get_or_load and aget_or_load take the functions that read the profile (and, for
+# revalidation, just its updated_at), so the Streamlit app and the FastAPI service can
+# both use this class. Each process still gets its own instance; nothing is shared.
+class ProfileCache:
+    def __init__(self, max_entries: int = PROFILE_CACHE_MAX_ENTRIES, ttl: float = PROFILE_CACHE_TTL_SECONDS,
+                 revalidate_after: float = PROFILE_CACHE_REVALIDATE_SECONDS, enabled: bool = PROFILE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str):
+        profile, _ = self._lookup(user_id)
+        self._record(profile is not None)
+        return profile
+
+    def get_or_load(self, user_id: str, load, load_version=None):
+        if not self.enabled:
+            return load(user_id)
+        profile, check = self._lookup(user_id)
+        if profile is not None and check and load_version is not None:
+            profile = self._revalidate(user_id, profile, load_version(user_id))
+        self._record(profile is not None)
+        if profile is None:
+            profile = load(user_id)
+            self.write(user_id, profile)
+        return profile
+
+    async def aget_or_load(self, user_id: str, load, load_version=None):
+        if not self.enabled:
+            return await load(user_id)
+        profile, check = self._lookup(user_id)
+        if profile is not None and check and load_version is not None:
+            profile = self._revalidate(user_id, profile, await load_version(user_id))
+        self._record(profile is not None)
+        if profile is None:
+            profile = await load(user_id)
+            self.write(user_id, profile)
+        return profile
+
+    def put(self, user_id: str, profile: dict, ttl: float = None):
+        if not self.enabled or self.max_entries <= 0:
+            return
+        entry = _Entry(dict(profile), time.monotonic() + (self.ttl if ttl is None else ttl))
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # Write-through: cache the row a write returned, or forget the user if it returned none
+    def write(self, user_id: str, profile):
+        if profile:
+            self.put(user_id, profile)
+        else:
+            self.invalidate(user_id)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, user_id: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None, False
+            if entry.expires_at <= now:
+                del self._entries[user_id]
+                self.expirations += 1
+                return None, False
+            self._entries.move_to_end(user_id)
+            check = self.revalidate_after > 0 and now - entry.validated_at >= self.revalidate_after
+            # Callers get a copy so they can't change the cached row by accident
+            return dict(entry.profile), check
+
+    def _revalidate(self, user_id: str, profile: dict, updated_at):
+        if updated_at is not None and updated_at == profile.get("updated_at"):
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    entry.validated_at = time.monotonic()
+            return profile
+        # Another worker changed (or deleted) the row since it was cached
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.stale += 1
+        return None
+
+    def _record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "stale": self.stale,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_profile_cache = None
+_profile_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> ProfileCache:
+    global _profile_cache
+    with _profile_cache_lock:
+        if _profile_cache is None:
+            _profile_cache = ProfileCache()
+        return _profile_cache
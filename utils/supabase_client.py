@@ -1,9 +1,16 @@
 import os
+import httpx
 import streamlit as st
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from utils.profile_cache import get_profile_cache
 
-@st.cache_resource
-def init_supabase():
+# One keep-alive connection pool per process, shared by every session's client
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_HTTP_MAX_CONNECTIONS", "100"))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_HTTP_MAX_KEEPALIVE", "20"))
+SUPABASE_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_HTTP_TIMEOUT = float(os.environ.get("SUPABASE_HTTP_TIMEOUT", "10"))
+
+def get_credentials():
     url = os.environ.get("SUPABASE_URL") or st.secrets.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_KEY") or st.secrets.get("SUPABASE_KEY")
     
@@ -11,32 +18,54 @@ def init_supabase():
         st.error("Supabase URL and API key must be set in environment variables or Streamlit secrets.")
         st.stop()
     
-    return create_client(url, key)
+    return url, key
 
-supabase: Client = init_supabase()
+def create_http_client():
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=SUPABASE_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=SUPABASE_HTTP_TIMEOUT,
+    )
 
-# Function to check if the profile exists for a user
-def check_profile_exists(user_id):
-    try:
-        response = supabase.from_("profiles").select("*").eq("user_id", user_id).execute()
-        return len(response.data) > 0
-    except Exception as e:
-        st.error(f"Failed to check profile existence: {str(e)}")
-        return False
+@st.cache_resource
+def get_http_client():
+    return create_http_client()
+
+def create_session_client(url, key, http_client):
+    # Each client keeps its own auth session in memory; sessions are refreshed on demand
+    # by auth.get_session() instead of by a timer thread per browser session
+    options = ClientOptions(httpx_client=http_client, auto_refresh_token=False)
+    return create_client(url, key, options=options)
+
+# Client for the current browser session. Auth state (and the user's token on PostgREST
+# requests) stays with the session in st.session_state; connections come from the shared pool.
+def get_supabase() -> Client:
+    if "supabase_client" not in st.session_state:
+        url, key = get_credentials()
+        st.session_state.supabase_client = create_session_client(url, key, get_http_client())
+    return st.session_state.supabase_client
+
+def _fetch_profile_updated_at(user_id):
+    response = get_supabase().from_("profiles").select("updated_at").eq("user_id", user_id).execute()
+    return response.data[0]["updated_at"] if response.data else None
+
+# Loads the user's profile, creating it with defaults if it doesn't exist, in a single
+# request to the get_or_create_profile function from sql/init.sql. Served from the
+# this process's profile cache when possible.
+def get_or_create_profile(user_id, email=None):
+    def load(user_id):
+        response = get_supabase().rpc("get_or_create_profile", {"user_id": user_id, "email": email}).execute()
+        return response.data or None
 
-# Function to insert initial profile data
-def insert_initial_profile(user_id, full_name="New User", bio="This is your bio."):
     try:
-        supabase.from_("profiles").insert({
-            "user_id": user_id,
-            "full_name": full_name,
-            "bio": bio
-        }).execute()
-        st.success("Initial profile created successfully!")
+        return get_profile_cache().get_or_load(user_id, load, _fetch_profile_updated_at)
     except Exception as e:
-        st.error(f"Failed to insert initial profile data: {str(e)}")
+        st.error(f"Failed to load profile data: {str(e)}")
+        return None
 
 # Main function to check and create profile if necessary
 def ensure_profile_exists(user):
-    if not check_profile_exists(user.id):
-        insert_initial_profile(user.id)
\ No newline at end of file
+    return get_or_create_profile(user.id, user.email)
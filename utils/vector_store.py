@@ -0,0 +1,364 @@
+import os
+import sys
+import json
+import argparse
+from typing import Any, List, Optional
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.simple import SimpleVectorStore, SimpleVectorStoreData
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import node_to_metadata_dict, build_metadata_filter_fn
+
+# Embeddings live in <name>.npy (memory-mapped on load), ids and metadata in <name>.meta.json
+FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ("float32", "float16")
+# "none" scans the stored matrix; "float16"/"int8" scan a smaller in-memory copy and
+# re-rank the best rerank_factor * top_k candidates against the full-precision rows
+SUPPORTED_QUANTIZATION = ("none", "float16", "int8")
+# Rows scored per block when the scan matrix has to be widened to float32
+SCAN_BLOCK_ROWS = 16384
+VECTOR_STORE_NAME = "default__vector_store"
+
+
+def _paths(persist_path: str):
+    base = persist_path[:-len(".json")] if persist_path.endswith(".json") else persist_path
+    return f"{base}.npy", f"{base}.meta.json"
+
+
+def persist_paths(persist_dir: str):
+    return _paths(os.path.join(persist_dir, f"{VECTOR_STORE_NAME}.json"))
+
+
+# Drop-in replacement for SimpleVectorStore that keeps embeddings in one numpy matrix
+# instead of a dict of float lists. Loading memory-maps the matrix, so opening an index
+# costs the same whatever its size; pages are read as queries touch them. Queries are
+# scored with one matrix product and top-k is selected with argpartition.
+class MmapVectorStore(BasePydanticVectorStore):
+    stores_text: bool = False
+    dtype: str = "float32"
+    quantization: str = "none"
+    rerank_factor: int = 4
+
+    _matrix: np.ndarray = PrivateAttr()
+    _ids: List[str] = PrivateAttr()
+    _ref_doc_ids: List[str] = PrivateAttr()
+    _metadata: List[dict] = PrivateAttr()
+    _rows: dict = PrivateAttr()
+    # (matrix, norms, scan) built on first query; one attribute so concurrent queries
+    # never see norms from one build and the scan matrix from another
+    _prepared: Optional[tuple] = PrivateAttr(default=None)
+
+    def __init__(self, dtype: str = "float32", quantization: str = "none", rerank_factor: int = 4, **kwargs: Any):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}, expected one of {SUPPORTED_DTYPES}")
+        if quantization not in SUPPORTED_QUANTIZATION:
+            raise ValueError(f"Unsupported quantization {quantization}, expected one of {SUPPORTED_QUANTIZATION}")
+        super().__init__(dtype=dtype, quantization=quantization, rerank_factor=max(rerank_factor, 1), **kwargs)
+        self._set_rows(np.zeros((0, 0), dtype=dtype), [], [], [])
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    def _set_rows(self, matrix, ids, ref_doc_ids, metadata):
+        self._matrix = matrix
+        self._ids = ids
+        self._ref_doc_ids = ref_doc_ids
+        self._metadata = metadata
+        self._rows = {node_id: row for row, node_id in enumerate(ids)}
+        self._prepared = None
+
+    def _keep(self, rows: List[int]):
+        self._set_rows(
+            np.ascontiguousarray(self._matrix[rows]) if len(self._ids) else self._matrix,
+            [self._ids[row] for row in rows],
+            [self._ref_doc_ids[row] for row in rows],
+            [self._metadata[row] for row in rows],
+        )
+
+    # Not __len__: StorageContext tests stores for truthiness, and an empty store must not be falsy
+    @property
+    def num_vectors(self) -> int:
+        return len(self._ids)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        # Re-adding a node replaces it, as in SimpleVectorStore
+        new_ids = {node.node_id for node in nodes}
+        if new_ids & self._rows.keys():
+            self._keep([row for row, node_id in enumerate(self._ids) if node_id not in new_ids])
+
+        embeddings = np.asarray([node.get_embedding() for node in nodes], dtype=self.dtype)
+        matrix = embeddings if not len(self._ids) else np.vstack([self._matrix, embeddings])
+        metadata = []
+        for node in nodes:
+            node_metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+            node_metadata.pop("_node_content", None)
+            metadata.append(node_metadata)
+        self._set_rows(
+            matrix,
+            self._ids + [node.node_id for node in nodes],
+            self._ref_doc_ids + [node.ref_doc_id or "None" for node in nodes],
+            self._metadata + metadata,
+        )
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._keep([row for row, ref in enumerate(self._ref_doc_ids) if ref != ref_doc_id])
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        filter_fn = build_metadata_filter_fn(lambda node_id: self._metadata[self._rows[node_id]], filters)
+        node_id_set = set(node_ids) if node_ids is not None else None
+        self._keep([
+            row for row, node_id in enumerate(self._ids)
+            if not ((node_id_set is None or node_id in node_id_set) and filter_fn(node_id))
+        ])
+
+    def clear(self) -> None:
+        self._set_rows(np.zeros((0, 0), dtype=self.dtype), [], [], [])
+
+    def get(self, text_id: str) -> List[float]:
+        return self._matrix[self._rows[text_id]].astype(np.float32).tolist()
+
+    def _candidate_rows(self, query: VectorStoreQuery) -> Optional[np.ndarray]:
+        if query.node_ids is None and query.filters is None:
+            return None
+        filter_fn = build_metadata_filter_fn(lambda node_id: self._metadata[self._rows[node_id]], query.filters)
+        if query.node_ids is not None:
+            rows = [self._rows[node_id] for node_id in query.node_ids if node_id in self._rows]
+        else:
+            rows = range(len(self._ids))
+        return np.asarray([row for row in rows if filter_fn(self._ids[row])], dtype=np.int64)
+
+    def _prepare(self) -> tuple:
+        prepared = self._prepared
+        if prepared is not None:
+            return prepared
+        matrix = self._matrix
+        full = matrix if matrix.dtype == np.float32 else matrix.astype(np.float32)
+        norms = np.maximum(np.linalg.norm(full, axis=1), 1e-12)
+        if self.quantization == "none":
+            # A float32 store is scanned in place (memory-mapped); float16 is widened once
+            scan = full
+        elif self.quantization == "float16":
+            # Quantized rows are unit-normalised, so their products are already cosine scores
+            scan = (full / norms[:, None]).astype(np.float16)
+        else:
+            scan = np.clip(np.rint(full / norms[:, None] * 127), -127, 127).astype(np.int8)
+        prepared = (matrix, norms, scan)
+        # Queries racing here build the same arrays, but a build from rows that an add or
+        # delete has since replaced is used only by this query, never cached
+        if self._matrix is matrix:
+            self._prepared = prepared
+        return prepared
+
+    def _scan_scores(self, norms: np.ndarray, scan: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        if self.quantization == "none":
+            return (scan @ queries.T) / norms[:, None]
+        # Widen block by block so the temporary float32 copy stays small
+        scale = 1 / 127 if self.quantization == "int8" else 1.0
+        scores = np.empty((scan.shape[0], queries.shape[0]), dtype=np.float32)
+        for start in range(0, scan.shape[0], SCAN_BLOCK_ROWS):
+            block = scan[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            scores[start:start + SCAN_BLOCK_ROWS] = (block @ queries.T) * scale
+        return scores
+
+    @staticmethod
+    def _exact_scores(matrix: np.ndarray, norms: np.ndarray, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return (matrix[rows].astype(np.float32) @ query) / norms[rows]
+
+    # Scores every query against every row in one product and returns, per query, the
+    # top_k row numbers and cosine scores in descending order
+    def top_k(self, query_embeddings, top_k: int):
+        matrix, norms, scan = self._prepare()
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = self._scan_scores(norms, scan, queries)
+
+        candidates = top_k if self.quantization == "none" else top_k * self.rerank_factor
+        rows = _top_rows(scores, candidates)
+        results = []
+        for column, query in enumerate(queries):
+            query_rows = rows[:, column]
+            if self.quantization == "none":
+                query_scores = scores[query_rows, column]
+            else:
+                query_scores = self._exact_scores(matrix, norms, query_rows, query)
+                order = np.argsort(-query_scores, kind="stable")[:top_k]
+                query_rows, query_scores = query_rows[order], query_scores[order]
+            results.append((query_rows, query_scores))
+        return results
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"Invalid query mode: {query.mode}")
+        if not self._ids:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+
+        rows = self._candidate_rows(query)
+        if rows is None:
+            [(top, scores)] = self.top_k(query.query_embedding, query.similarity_top_k)
+        else:
+            # Filtered queries only touch their candidate rows, so score those exactly
+            matrix, norms, _ = self._prepare()
+            embedding = np.asarray(query.query_embedding, dtype=np.float32)
+            scores = self._exact_scores(matrix, norms, rows, embedding / max(np.linalg.norm(embedding), 1e-12))
+            order = _top_rows(scores[:, None], query.similarity_top_k)[:, 0]
+            top, scores = rows[order], scores[order]
+        return VectorStoreQueryResult(similarities=scores.tolist(), ids=[self._ids[row] for row in top])
+
+    # Answers several unfiltered queries with a single matrix product
+    def query_many(self, query_embeddings, similarity_top_k: int) -> List[VectorStoreQueryResult]:
+        if not self._ids:
+            return [VectorStoreQueryResult(similarities=[], ids=[]) for _ in query_embeddings]
+        return [
+            VectorStoreQueryResult(similarities=scores.tolist(), ids=[self._ids[row] for row in rows])
+            for rows, scores in self.top_k(query_embeddings, similarity_top_k)
+        ]
+
+    def persist(self, persist_path: str, fs=None) -> None:
+        matrix_path, meta_path = _paths(persist_path)
+        os.makedirs(os.path.dirname(matrix_path) or ".", exist_ok=True)
+        np.save(matrix_path, np.ascontiguousarray(self._matrix, dtype=self.dtype))
+        with open(meta_path, "w") as file:
+            json.dump({
+                "format": FORMAT_VERSION,
+                "dtype": self.dtype,
+                "ids": self._ids,
+                "ref_doc_ids": self._ref_doc_ids,
+                "metadata": self._metadata,
+            }, file, separators=(",", ":"))
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, mmap: bool = True, **kwargs: Any) -> "MmapVectorStore":
+        matrix_path, meta_path = _paths(persist_path)
+        with open(meta_path) as file:
+            meta = json.load(file)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store format {meta.get('format')} in {meta_path}")
+        matrix = np.load(matrix_path, mmap_mode="r" if mmap else None)
+        if matrix.shape[0] != len(meta["ids"]):
+            raise ValueError(f"{matrix_path} has {matrix.shape[0]} rows but {meta_path} lists {len(meta['ids'])} ids")
+        store = cls(dtype=meta["dtype"], **kwargs)
+        store._set_rows(matrix, meta["ids"], meta["ref_doc_ids"], meta["metadata"])
+        return store
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, mmap: bool = True, **kwargs: Any) -> "MmapVectorStore":
+        return cls.from_persist_path(os.path.join(persist_dir, f"{VECTOR_STORE_NAME}.json"), mmap=mmap, **kwargs)
+
+    @classmethod
+    def from_simple(cls, simple: SimpleVectorStore, dtype: str = "float32", **kwargs: Any) -> "MmapVectorStore":
+        data = simple.data
+        ids = list(data.embedding_dict)
+        store = cls(dtype=dtype, **kwargs)
+        matrix = np.asarray([data.embedding_dict[node_id] for node_id in ids], dtype=dtype)
+        store._set_rows(
+            matrix if ids else np.zeros((0, 0), dtype=dtype),
+            ids,
+            [data.text_id_to_ref_doc_id.get(node_id, "None") for node_id in ids],
+            [(data.metadata_dict or {}).get(node_id, {}) for node_id in ids],
+        )
+        return store
+
+    def to_simple(self) -> SimpleVectorStore:
+        return SimpleVectorStore(data=SimpleVectorStoreData(
+            embedding_dict={node_id: self.get(node_id) for node_id in self._ids},
+            text_id_to_ref_doc_id=dict(zip(self._ids, self._ref_doc_ids)),
+            metadata_dict=dict(zip(self._ids, self._metadata)),
+        ))
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    # argpartition finds the k best rows per column in linear time; only those k get sorted
+    k = min(k, scores.shape[0])
+    if k < scores.shape[0]:
+        rows = np.argpartition(-scores, k - 1, axis=0)[:k]
+    else:
+        rows = np.broadcast_to(np.arange(scores.shape[0])[:, None], scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, rows, axis=0), axis=0, kind="stable")
+    return np.take_along_axis(rows, order, axis=0)
+
+
+# Checks that the binary store holds the same nodes as the JSON one and ranks them the same
+def verify_round_trip(simple: SimpleVectorStore, store: MmapVectorStore, queries: int = 10) -> List[str]:
+    problems = []
+    restored = store.to_simple().data
+    original = simple.data
+    if list(restored.embedding_dict) != list(original.embedding_dict):
+        problems.append("node ids differ")
+    if restored.text_id_to_ref_doc_id != original.text_id_to_ref_doc_id:
+        problems.append("ref doc ids differ")
+    if restored.metadata_dict != (original.metadata_dict or {}):
+        problems.append("metadata differs")
+
+    # float16 keeps ~3 significant digits
+    atol = 1e-3 if store.dtype == "float16" else 1e-6
+    for node_id, embedding in original.embedding_dict.items():
+        if node_id not in restored.embedding_dict or not np.allclose(restored.embedding_dict[node_id], embedding, atol=atol):
+            problems.append(f"embedding of {node_id} differs")
+            break
+
+    for node_id in list(original.embedding_dict)[:queries]:
+        query = VectorStoreQuery(query_embedding=original.embedding_dict[node_id], similarity_top_k=5)
+        if simple.query(query).ids[:1] != store.query(query).ids[:1]:
+            problems.append(f"top result for {node_id} differs")
+    return problems
+
+
+# Rewrites default__vector_store.json in persist_dir as .npy + .meta.json
+def convert_json_store(persist_dir: str, dtype: str = "float32", keep_json: bool = False) -> MmapVectorStore:
+    json_path = os.path.join(persist_dir, f"{VECTOR_STORE_NAME}.json")
+    simple = SimpleVectorStore.from_persist_path(json_path)
+    store = MmapVectorStore.from_simple(simple, dtype=dtype)
+    store.persist(json_path)
+
+    problems = verify_round_trip(simple, MmapVectorStore.from_persist_path(json_path))
+    if problems:
+        for path in _paths(json_path):
+            os.remove(path)
+        raise ValueError(f"Converted store does not match {json_path}: {'; '.join(problems)}")
+    if not keep_json:
+        os.remove(json_path)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a local index's JSON vector store to the memory-mapped format")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="write .npy + .meta.json next to the JSON store")
+    convert.add_argument("persist_dir", nargs="?", default="./index")
+    convert.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    convert.add_argument("--keep-json", action="store_true", help="leave the JSON store in place")
+    verify = subparsers.add_parser("verify", help="compare a converted store against its JSON original")
+    verify.add_argument("persist_dir", nargs="?", default="./index")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        store = convert_json_store(args.persist_dir, args.dtype, args.keep_json)
+        matrix_path, _ = persist_paths(args.persist_dir)
+        print(f"Converted {store.num_vectors} vectors to {matrix_path} ({args.dtype})")
+        return 0
+
+    json_path = os.path.join(args.persist_dir, f"{VECTOR_STORE_NAME}.json")
+    problems = verify_round_trip(SimpleVectorStore.from_persist_path(json_path), MmapVectorStore.from_persist_dir(args.persist_dir))
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())